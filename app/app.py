@@ -1,15 +1,24 @@
 # app.py (Versi Akhir: Gabungan Demo & Laporan dengan Fungsi Reset)
 
-from flask import Flask, render_template, request, flash, redirect, url_for, g, Response
+from flask import Flask, render_template, request, flash, redirect, url_for, g, Response, jsonify
 import subprocess
 import os
 import sys
 import sqlite3
 from datetime import datetime
-import io
-import csv
+
+# Modul dikongsi (db_schema dll.) terletak dalam folder face_recognition/ semasa pembangunan;
+# dalam pemasangan, semua fail berada dalam satu folder dan laluan ini diabaikan.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'face_recognition'))
+from db_schema import connect
+import attendance_rollups
+import attendance_export
+import attendance_feed
+import enroll_worker
+import metrics
 
 app = Flask(__name__)
+metrics.instrument_flask(app)   # Kependaman setiap laluan + /metrics (matikan dengan DCAS_METRICS=0)
 app.config['SECRET_KEY'] = 'kunci-rahsia-super-selamat-untuk-projek-dcas'
 DATABASE = "attendance_system.db"
 
@@ -21,12 +30,14 @@ ALLOWED_SCRIPTS = {
     "enroll_student.py": "Daftarkan Pelajar",
     "delete_student.py": "Padam Pelajar"
 }
+# Skrip yang dihantar kepada pekerja panas (enroll_worker.py) jika ia sedang berjalan
+WORKER_JOBS = {"enroll_student.py": "enroll", "delete_student.py": "delete"}
 
 # --- Fungsi Utiliti Pangkalan Data ---
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
+        db = g._database = connect(DATABASE)
         db.row_factory = sqlite3.Row
     return db
 
@@ -52,7 +63,18 @@ def modify_db(query, args=()):
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', job_id=request.args.get('kerja'))
+
+# Status kerja pekerja untuk ditinjau oleh panel
+@app.route('/kerja/<job_id>')
+def job_status(job_id):
+    try:
+        job = enroll_worker.job_status(job_id)
+    except OSError as e:
+        return jsonify({"status": "tidak diketahui", "mesej": f"Pekerja tidak dapat dihubungi: {e}"}), 503
+    if "kod" in job:   # Ditolak pekerja (cth. 404: kerja tidak diketahui atau telah luput) - status muktamad
+        return jsonify({"status": "gagal", "berjaya": False, "mesej": job.get("mesej") or "Kerja tidak ditemui."}), job["kod"]
+    return jsonify(job)
 
 @app.route('/run_script', methods=['POST'])
 def run_script():
@@ -75,6 +97,15 @@ def run_script():
         if not no_matrik:
             flash("No. Matrik diperlukan untuk memadam.", "error"); return redirect(url_for('index'))
         command.append(no_matrik)
+    if script_name in WORKER_JOBS:
+        try:
+            job = enroll_worker.submit_job(WORKER_JOBS[script_name], nama_pelajar=nama_pelajar, no_matrik=no_matrik)
+            if "kod" in job:
+                flash(job.get("mesej", "Kerja ditolak oleh pekerja."), "error"); return redirect(url_for('index'))
+            flash(f"'{ALLOWED_SCRIPTS[script_name]}' sedang diproses (kerja {job['id']}).", "success")
+            return redirect(url_for('index', kerja=job['id']))
+        except OSError:
+            pass   # Pekerja tidak berjalan: guna cara lama (subprocess) di bawah
     try:
         if script_name in GUI_SCRIPTS:
             my_env = os.environ.copy(); my_env["DISPLAY"] = ":0"
@@ -97,12 +128,7 @@ def run_script():
 def dashboard():
     all_students = query_db("SELECT id_pelajar, nama_pelajar, no_matrik FROM pelajar ORDER BY nama_pelajar ASC")
     today_str = datetime.now().strftime('%Y-%m-%d')
-    todays_attendance_records = query_db("""
-        SELECT p.id_pelajar, p.nama_pelajar, p.no_matrik, MIN(k.masa_masuk) as masa_masuk_pertama 
-        FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
-        WHERE date(k.masa_masuk) = ? 
-        GROUP BY p.id_pelajar ORDER BY masa_masuk_pertama ASC
-    """, (today_str,))
+    todays_attendance_records = attendance_rollups.first_arrivals(get_db(), today_str)
     attended_today_ids = {record['id_pelajar'] for record in todays_attendance_records}
     return render_template('dashboard.html', 
                            all_students=all_students, 
@@ -110,28 +136,47 @@ def dashboard():
                            attended_today_ids=attended_today_ids,
                            current_date=datetime.now().strftime('%A, %d %B %Y'))
 
+# Eksport CSV penstriman: ?mula=YYYY-MM-DD&akhir=YYYY-MM-DD&no_matrik=...&gzip=1 (lalai: hari ini)
 @app.route('/download_csv')
 def download_csv():
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    attendance_data = query_db("""
-        SELECT p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', k.masa_masuk) as waktu_masuk
-        FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
-        WHERE date(k.masa_masuk) = ? ORDER BY k.masa_masuk ASC
-    """, (today_str,))
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Bil.', 'Nama Pelajar', 'No Matrik', 'Waktu Masuk'])
-    for i, row in enumerate(attendance_data):
-        cw.writerow([i+1, row['nama_pelajar'], row['no_matrik'], row['waktu_masuk']])
-    output = si.getvalue()
-    return Response(output, mimetype="text/csv",
-                    headers={"Content-disposition": f"attachment; filename=kehadiran_{today_str}.csv"})
+    try:
+        mula, akhir, no_matrik = attendance_export.parse_range(request.args)
+    except ValueError as e:
+        flash(f"Julat tarikh tidak sah: {e}", "error"); return redirect(url_for('dashboard'))
+    compress = request.args.get('gzip') == '1'
+    filename = attendance_export.export_filename(mula, akhir, no_matrik, compress)
+    return Response(attendance_export.iter_csv(DATABASE, mula, akhir, no_matrik, compress=compress),
+                    mimetype="application/gzip" if compress else "text/csv",
+                    headers={"Content-disposition": f"attachment; filename={filename}"})
+
+# Suapan langsung (Server-Sent Events) untuk dashboard; semua pelanggan berkongsi satu suapan
+@app.route('/laporan/stream')
+def attendance_stream():
+    feed = attendance_feed.get_feed(DATABASE)
+    return Response(feed.stream(request.headers.get('Last-Event-ID')), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Laporan sejarah (kadar kehadiran semester, kiraan harian, trend mingguan) - hanya jadual ringkasan
+@app.route('/laporan/sejarah')
+def history_report():
+    try:
+        mula, akhir = attendance_export.parse_history_range(request.args)
+    except ValueError as e:
+        flash(f"Julat tarikh tidak sah: {e}", "error"); return redirect(url_for('dashboard'))
+    db = get_db()
+    class_days, student_rates = attendance_rollups.student_rates(db, mula, akhir)
+    return render_template('laporan_sejarah.html', mula=mula, akhir=akhir, class_days=class_days,
+                           student_rates=student_rates,
+                           daily_counts=attendance_rollups.daily_counts(db, mula, akhir),
+                           weekly_trend=attendance_rollups.weekly_trend(db, mula, akhir),
+                           back_url=url_for('dashboard'),
+                           export_url=url_for('download_csv', mula=mula, akhir=akhir))
 
 # [BARU] Laluan (Route) untuk butang Reset
 @app.route('/reset_today', methods=['POST'])
 def reset_today_attendance():
     today_str = datetime.now().strftime('%Y-%m-%d')
-    modify_db("DELETE FROM kehadiran WHERE date(masa_masuk) = ?", (today_str,))
+    modify_db("DELETE FROM kehadiran WHERE tarikh = ?", (today_str,))
     flash('Semua rekod kehadiran untuk hari ini telah berjaya direset.', 'success')
     # Halakan pengguna kembali ke halaman laporan
     return redirect(url_for('dashboard'))
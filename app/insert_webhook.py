@@ -1,12 +1,17 @@
 import sys
 import json
-import sqlite3
+import os
 from datetime import datetime
 
+# Modul dikongsi (db_schema dll.) terletak dalam folder face_recognition/ semasa pembangunan;
+# dalam pemasangan, semua fail berada dalam satu folder dan laluan ini diabaikan.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'face_recognition'))
+from db_schema import connect
+
 DB_PATH = "/home/iwanzack/AI-DCAS/attendance_system.db"
 
 def insert_log(device_name, event, message, payload):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO device_log (device_name, event, message, payload)
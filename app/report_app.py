@@ -1,8 +1,16 @@
-from flask import Flask, render_template, Response, g, redirect, url_for, flash
+from flask import Flask, render_template, Response, g, redirect, url_for, flash, request
 import sqlite3
 from datetime import datetime
-import io
-import csv
+import os
+import sys
+
+# Modul dikongsi (db_schema dll.) terletak dalam folder face_recognition/ semasa pembangunan;
+# dalam pemasangan, semua fail berada dalam satu folder dan laluan ini diabaikan.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'face_recognition'))
+from db_schema import connect
+import attendance_rollups
+import attendance_export
+import attendance_feed
 
 DATABASE = "attendance_system.db"
 
@@ -15,7 +23,7 @@ app.secret_key = 'kunci_rahsia_yang_selamat_dan_rawak'
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
+        db = g._database = connect(DATABASE)
         db.row_factory = sqlite3.Row
     return db
 
@@ -41,16 +49,7 @@ def modify_db(query, args=()):
 def dashboard():
     all_students = query_db("SELECT id_pelajar, nama_pelajar, no_matrik FROM pelajar ORDER BY nama_pelajar ASC")
     today_str = datetime.now().strftime('%Y-%m-%d')
-    todays_attendance_records = query_db("""
-        SELECT 
-            p.id_pelajar, p.nama_pelajar, p.no_matrik, 
-            MIN(k.masa_masuk) as masa_masuk_pertama 
-        FROM kehadiran k
-        JOIN pelajar p ON k.id_pelajar = p.id_pelajar
-        WHERE date(k.masa_masuk) = ? 
-        GROUP BY p.id_pelajar
-        ORDER BY masa_masuk_pertama ASC
-    """, (today_str,))
+    todays_attendance_records = attendance_rollups.first_arrivals(get_db(), today_str)
     attended_today_ids = {record['id_pelajar'] for record in todays_attendance_records}
     return render_template('dashboard.html', 
                            all_students=all_students, 
@@ -58,28 +57,42 @@ def dashboard():
                            attended_today_ids=attended_today_ids,
                            current_date=datetime.now().strftime('%A, %d %B %Y'))
 
+# Eksport CSV penstriman (masuk pertama sahaja): ?mula=...&akhir=...&no_matrik=...&gzip=1
 @app.route('/download_attendance_csv')
 def download_attendance_csv():
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    attendance_data = query_db("""
-        SELECT p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', MIN(k.masa_masuk)) as waktu_masuk
-        FROM kehadiran k
-        JOIN pelajar p ON k.id_pelajar = p.id_pelajar
-        WHERE date(k.masa_masuk) = ?
-        GROUP BY p.id_pelajar
-        ORDER BY k.masa_masuk ASC
-    """, (today_str,))
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Bil.', 'Nama Pelajar', 'No Matrik', 'Waktu Masuk'])
-    for i, row in enumerate(attendance_data):
-        cw.writerow([i+1, row['nama_pelajar'], row['no_matrik'], row['waktu_masuk']])
-    output = si.getvalue()
-    si.close()
+    try:
+        mula, akhir, no_matrik = attendance_export.parse_range(request.args)
+    except ValueError as e:
+        flash(f"Julat tarikh tidak sah: {e}", "error"); return redirect(url_for('dashboard'))
+    compress = request.args.get('gzip') == '1'
+    filename = attendance_export.export_filename(mula, akhir, no_matrik, compress)
     return Response(
-        output,
-        mimetype="text/csv",
-        headers={"Content-disposition": f"attachment; filename=kehadiran_{today_str}.csv"})
+        attendance_export.iter_csv(DATABASE, mula, akhir, no_matrik, first_only=True, compress=compress),
+        mimetype="application/gzip" if compress else "text/csv",
+        headers={"Content-disposition": f"attachment; filename={filename}"})
+
+# Suapan langsung (Server-Sent Events) untuk dashboard; semua pelanggan berkongsi satu suapan
+@app.route('/stream')
+def attendance_stream():
+    feed = attendance_feed.get_feed(DATABASE)
+    return Response(feed.stream(request.headers.get('Last-Event-ID')), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Laporan sejarah - hanya membaca jadual ringkasan (lihat attendance_rollups.py)
+@app.route('/sejarah')
+def history_report():
+    try:
+        mula, akhir = attendance_export.parse_history_range(request.args)
+    except ValueError as e:
+        flash(f"Julat tarikh tidak sah: {e}", "error"); return redirect(url_for('dashboard'))
+    db = get_db()
+    class_days, student_rates = attendance_rollups.student_rates(db, mula, akhir)
+    return render_template('laporan_sejarah.html', mula=mula, akhir=akhir, class_days=class_days,
+                           student_rates=student_rates,
+                           daily_counts=attendance_rollups.daily_counts(db, mula, akhir),
+                           weekly_trend=attendance_rollups.weekly_trend(db, mula, akhir),
+                           back_url=url_for('dashboard'),
+                           export_url=url_for('download_attendance_csv', mula=mula, akhir=akhir))
 
 # [BARU] Laluan (Route) untuk butang Reset
 @app.route('/reset_today', methods=['POST'])
@@ -91,7 +104,7 @@ def reset_today_attendance():
     today_str = datetime.now().strftime('%Y-%m-%d')
     
     # Laksanakan arahan DELETE pada pangkalan data
-    modify_db("DELETE FROM kehadiran WHERE date(masa_masuk) = ?", (today_str,))
+    modify_db("DELETE FROM kehadiran WHERE tarikh = ?", (today_str,))
     
     # Hantar mesej maklum balas kepada pengguna
     flash('Semua rekod kehadiran untuk hari ini telah berjaya direset.', 'success')
@@ -0,0 +1,165 @@
+"""
+attendance_committer.py - Penulis kehadiran latar belakang (write-behind) untuk AttendanceSystem
+
+Gelung pengecaman hanya menyerahkan acara kehadiran kepada submit() yang tidak
+menyekat. Thread latar belakang menggunakan satu sambungan SQLite yang kekal,
+mengumpul acara dalam tetingkap masa yang kecil dan melakukan satu INSERT
+berkelompok + satu commit (group commit) ke jadual 'kehadiran'.
+
+Setiap acara ditulis dahulu ke fail spool (JSON satu baris) sebelum diserahkan,
+jadi acara yang belum di-commit tidak hilang jika program ranap. Spool dimainkan
+semula semasa permulaan dan dikosongkan apabila semua acara telah di-commit.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from db_schema import connect, tarikh_of
+import metrics
+
+INSERT_SQL = "INSERT INTO kehadiran(id_pelajar, masa_masuk, tarikh) VALUES (?, ?, ?)"
+COMMIT_LATENCY = metrics.histogram("dcas_db_commit_saat", "Masa INSERT berkelompok + commit ke jadual kehadiran")
+EVENTS_COMMITTED = metrics.counter("dcas_kehadiran_dicommit_total", "Acara kehadiran yang disimpan")
+EVENTS_DROPPED = metrics.counter("dcas_kehadiran_dibuang_total", "Acara kehadiran yang ditolak pangkalan data secara kekal")
+# Untuk main semula spool: elak rekod berganda jika ranap berlaku selepas commit tetapi sebelum spool dikosongkan
+REPLAY_SQL = """INSERT INTO kehadiran(id_pelajar, masa_masuk, tarikh) SELECT ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM kehadiran WHERE id_pelajar = ? AND masa_masuk = ?)"""
+
+_BUSY_CODES = (5, 6)   # SQLITE_BUSY, SQLITE_LOCKED
+
+
+def _is_busy(error):
+    """True jika ralat ialah SQLITE_BUSY/SQLITE_LOCKED (termasuk kod lanjutan)."""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is None: return "locked" in str(error) or "busy" in str(error)   # Python < 3.11
+    return (code & 0xFF) in _BUSY_CODES
+
+
+class AttendanceCommitter:
+    def __init__(self, db_name, spool_path="kehadiran_spool.jsonl", commit_window=0.2, max_batch=200,
+                 retry_delay=1.0, max_retries=30, on_committed=None):
+        self.db_name = db_name
+        self.spool_path = spool_path
+        self.commit_window = commit_window    # Tempoh (saat) untuk mengumpul acara sebelum commit
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries        # Cubaan semula maksimum apabila DB sibuk/dikunci
+        self.on_committed = on_committed      # Panggilan balik(senarai acara) selepas acara disimpan
+        self.events_committed = 0
+        self.batches_committed = 0
+        self._queue = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._spool = None
+        self._outstanding = 0                 # Acara dalam spool yang belum di-commit
+        self._thread = None
+
+    def start(self):
+        self._replay_spool()
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="attendance-committer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, student_id, masa_masuk=None, **extra):
+        """Rekod acara kehadiran tanpa menyekat. Acara ditulis ke spool sebelum dimasukkan ke baris gilir.
+        Medan tambahan (cth. bilik=...) dibawa ke on_committed tetapi tidak ditulis ke 'kehadiran'."""
+        event = {"id_pelajar": student_id, "masa_masuk": masa_masuk or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **extra}
+        with self._spool_lock:
+            self._spool.write(json.dumps(event) + "\n"); self._spool.flush()
+            self._outstanding += 1
+        self._queue.put(event)
+        return event
+
+    def close(self, timeout=10):
+        """Commit semua acara yang tertunggak dan hentikan thread."""
+        if self._thread is None: return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        with self._spool_lock:
+            self._spool.close()
+
+    def _replay_spool(self):
+        if not os.path.exists(self.spool_path) or os.path.getsize(self.spool_path) == 0: return
+        events = []
+        with open(self.spool_path, encoding='utf-8') as f:
+            for line in f:
+                try: events.append(json.loads(line))
+                except ValueError: continue   # Baris terakhir mungkin separuh ditulis semasa ranap
+        conn = connect(self.db_name)
+        try:
+            with conn:
+                conn.executemany(REPLAY_SQL, [(e["id_pelajar"], e["masa_masuk"], tarikh_of(e["masa_masuk"]), e["id_pelajar"], e["masa_masuk"]) for e in events])
+            open(self.spool_path, 'w').close()
+            print(f"♻️ {len(events)} acara kehadiran dari spool telah dimainkan semula.")
+        except sqlite3.Error as e:
+            print(f"❌ Gagal memainkan semula spool kehadiran: {e}")
+        finally:
+            conn.close()
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None: return None
+        batch, deadline = [first], time.monotonic() + self.commit_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try: event = self._queue.get(timeout=remaining)
+            except queue.Empty: break
+            if event is None:
+                self._queue.put(None); break
+            batch.append(event)
+        return batch
+
+    def _execute(self, conn, batch):
+        """INSERT dalam satu transaksi. Hanya DB sibuk/dikunci dicuba semula (paling banyak max_retries kali);
+        ralat lain (cth. DB baca sahaja, ralat I/O, lajur tiada) dinaikkan terus."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with COMMIT_LATENCY.time(), conn:
+                    conn.executemany(INSERT_SQL, [(e["id_pelajar"], e["masa_masuk"], tarikh_of(e["masa_masuk"])) for e in batch])
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == self.max_retries: raise
+                print(f"❌ DB sibuk semasa merekod kehadiran ({len(batch)} acara, cuba semula {attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(self.retry_delay)
+
+    def _commit(self, conn, batch):
+        """Pulangkan acara yang disimpan. Jika kelompok ditolak secara kekal (cth. IntegrityError kerana pelajar
+        telah dipadam), acara dimasukkan satu demi satu dan hanya acara yang rosak dibuang."""
+        try:
+            self._execute(conn, batch); committed = batch
+        except sqlite3.Error as e:
+            print(f"⚠️ Kelompok {len(batch)} acara ditolak ({e}); merekod satu demi satu.")
+            committed = []
+            for event in batch:
+                try:
+                    self._execute(conn, [event]); committed.append(event)
+                except sqlite3.Error as e:
+                    EVENTS_DROPPED.inc()
+                    print(f"❌ Acara kehadiran dibuang {event}: {e}")
+        EVENTS_COMMITTED.inc(len(committed))
+        return committed
+
+    def _run(self):
+        conn = connect(self.db_name)
+        try:
+            while True:
+                batch = self._collect_batch()
+                if batch is None: break
+                committed = self._commit(conn, batch)
+                self.events_committed += len(committed); self.batches_committed += 1
+                with self._spool_lock:
+                    self._outstanding -= len(batch)
+                    if self._outstanding == 0 and not self._spool.closed:
+                        self._spool.seek(0); self._spool.truncate()
+                if self.on_committed and committed:
+                    try: self.on_committed(committed)
+                    except Exception as e: print(f"⚠️ Ralat dalam panggilan balik commit: {e}")
+        finally:
+            conn.close()
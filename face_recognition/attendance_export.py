@@ -0,0 +1,95 @@
+"""
+attendance_export.py - Eksport CSV kehadiran secara penstriman (streaming) untuk julat tarikh
+
+Baris dibaca terus dari kursor SQLite (fetchmany) dan dihantar kepada respons Flask dalam
+kepingan kecil, jadi penggunaan memori kekal malar tanpa mengira saiz julat, dan bait
+pertama dihantar serta-merta. Pilihan gzip memampatkan kepingan semasa dijana.
+
+Penjana membuka sambungan sendiri kerana sambungan 'g' Flask ditutup sebelum respons
+penstriman selesai dihantar.
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta
+
+from db_schema import connect
+
+CHUNK_SIZE = 64 * 1024
+FETCH_SIZE = 1000
+
+# Semua imbasan (satu baris bagi setiap rekod 'kehadiran')
+SCANS_SQL = """
+    SELECT k.tarikh, p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', k.masa_masuk)
+    FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+    WHERE k.tarikh BETWEEN ? AND ? {student_filter} ORDER BY k.tarikh ASC, k.masa_masuk ASC
+"""
+# Masuk pertama sahaja, dari jadual ringkasan kehadiran_harian
+FIRST_ARRIVALS_SQL = """
+    SELECT k.tarikh, p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', k.masa_masuk_pertama)
+    FROM kehadiran_harian k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+    WHERE k.tarikh BETWEEN ? AND ? {student_filter} ORDER BY k.tarikh ASC, k.masa_masuk_pertama ASC
+"""
+HEADER = ['Bil.', 'Tarikh', 'Nama Pelajar', 'No Matrik', 'Waktu Masuk']
+
+
+def parse_range(args, today=None):
+    """Baca 'mula', 'akhir' dan 'no_matrik' dari parameter pertanyaan; lalai ialah hari ini. ValueError jika tidak sah."""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    mula, akhir = args.get('mula') or today, args.get('akhir') or args.get('mula') or today
+    # Dinormalkan kepada YYYY-MM-DD berlapik sifar: 'tarikh BETWEEN ? AND ?' ialah perbandingan teks
+    mula, akhir = (datetime.strptime(value, '%Y-%m-%d').date() for value in (mula, akhir))
+    if mula > akhir: raise ValueError("Tarikh mula selepas tarikh akhir.")
+    return mula.isoformat(), akhir.isoformat(), (args.get('no_matrik') or '').strip() or None
+
+
+def parse_history_range(args, weeks=16, today=None):
+    """Julat laporan sejarah: 'akhir' lalai hari ini, 'mula' lalai 'weeks' minggu sebelumnya. ValueError jika tidak sah."""
+    akhir = args.get('akhir') or today or datetime.now().strftime('%Y-%m-%d')
+    mula = args.get('mula') or (datetime.strptime(akhir, '%Y-%m-%d') - timedelta(weeks=weeks)).strftime('%Y-%m-%d')
+    mula, akhir, _ = parse_range({'mula': mula, 'akhir': akhir})
+    return mula, akhir
+
+
+def export_filename(mula, akhir, no_matrik=None, compress=False):
+    name = f"kehadiran_{mula}" if mula == akhir else f"kehadiran_{mula}_{akhir}"
+    if no_matrik: name += f"_{no_matrik}"
+    return name + (".csv.gz" if compress else ".csv")
+
+
+def iter_csv(db_name, mula, akhir, no_matrik=None, first_only=False, compress=False):
+    """Penjana bait CSV (atau gzip) untuk Response(...) Flask."""
+    sql = (FIRST_ARRIVALS_SQL if first_only else SCANS_SQL).format(
+        student_filter="AND p.no_matrik = ?" if no_matrik else "")
+    params = (mula, akhir, no_matrik) if no_matrik else (mula, akhir)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None   # wbits=31: format gzip
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain(sync=False):
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0); buffer.truncate()
+        if not compressor: return data
+        return compressor.compress(data) + (compressor.flush(zlib.Z_SYNC_FLUSH) if sync else b"")
+
+    conn = connect(db_name)
+    try:
+        cursor = conn.execute(sql, params)
+        writer.writerow(HEADER)
+        yield drain(sync=True)   # Bait pertama dihantar serta-merta
+        count = 0
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows: break
+            for row in rows:
+                count += 1
+                writer.writerow((count,) + tuple(row))
+            if buffer.tell() >= CHUNK_SIZE:
+                chunk = drain()
+                if chunk: yield chunk
+        tail = drain()
+        if compressor: tail += compressor.flush()
+        if tail: yield tail
+    finally:
+        conn.close()
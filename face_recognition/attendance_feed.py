@@ -0,0 +1,158 @@
+"""
+attendance_feed.py - Suapan perubahan kehadiran yang dikongsi untuk dashboard langsung (SSE)
+
+Satu thread latar belakang bagi setiap proses memegang satu sambungan SQLite dan menyemak
+PRAGMA data_version (seperti roster_watcher.py). Hanya apabila ia berubah, rekod
+'kehadiran' baharu (id_kehadiran > terakhir) dibaca dan pelajar yang baru hadir hari ini
+diterbitkan sebagai acara 'hadir'. Reset, padam atau pertukaran hari menerbitkan
+'snapshot' penuh. Keadaan hari ini disimpan dalam memori, jadi pelanggan baharu menerima
+snapshot tanpa sebarang pertanyaan pangkalan data; N dashboard = satu suapan.
+
+Format acara (text/event-stream):
+    id: <seq>
+    event: hadir | snapshot
+    data: {...JSON...}
+"""
+
+import json
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+from db_schema import connect
+from attendance_rollups import first_arrivals
+
+NEW_ROWS_SQL = """
+    SELECT k.id_kehadiran, k.tarikh, p.id_pelajar, p.nama_pelajar, p.no_matrik, k.masa_masuk
+    FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+    WHERE k.id_kehadiran > ? ORDER BY k.id_kehadiran ASC
+"""
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed(db_name):
+    """Suapan tunggal bagi setiap pangkalan data dalam proses ini (dimulakan pada panggilan pertama)."""
+    with _feeds_lock:
+        feed = _feeds.get(db_name)
+        if feed is None:
+            feed = _feeds[db_name] = AttendanceFeed(db_name).start()
+        return feed
+
+
+class AttendanceFeed:
+    def __init__(self, db_name, poll_interval=0.5, history=1000, keepalive=15.0):
+        self.db_name = db_name
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive        # Komen ': keepalive' supaya proksi tidak menutup sambungan
+        self.events = deque(maxlen=history)
+        self.seq = 0
+        self.today = None
+        self.present = {}                 # id_pelajar -> rekod masuk pertama hari ini
+        self.scans_today = 0
+        self.last_id = 0
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._data_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="attendance-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(self.poll_interval + 1)
+
+    def _run(self):
+        conn = connect(self.db_name)
+        try:
+            while True:
+                try:
+                    self.poll(conn)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Ralat suapan kehadiran: {e}")
+                if self._stop.wait(self.poll_interval): break
+        finally:
+            conn.close()
+
+    def poll(self, conn):
+        today = datetime.now().strftime('%Y-%m-%d')
+        if today != self.today: return self._reload(conn, today)
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version: return
+        self._data_version = version
+        arrivals, scans = [], 0
+        for id_kehadiran, tarikh, id_pelajar, nama, no_matrik, masa_masuk in conn.execute(NEW_ROWS_SQL, (self.last_id,)):
+            self.last_id = id_kehadiran
+            if tarikh != today: continue   # Cth. spool lama dimain semula untuk hari sebelumnya
+            scans += 1
+            if id_pelajar not in self.present and id_pelajar not in {a["id_pelajar"] for a in arrivals}:
+                arrivals.append({"id_pelajar": id_pelajar, "nama_pelajar": nama, "no_matrik": no_matrik, "masa_masuk": masa_masuk})
+        row = conn.execute("SELECT bilangan_imbasan FROM ringkasan_harian WHERE tarikh = ?", (today,)).fetchone()
+        if (row[0] if row else 0) != self.scans_today + scans:
+            return self._reload(conn, today)   # Ada rekod dipadam (reset / padam pelajar)
+        with self._cond:
+            self.scans_today += scans
+            for record in arrivals:
+                self.present[record["id_pelajar"]] = record
+                self._publish("hadir", record)
+
+    def _reload(self, conn, today):
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        records = [{"id_pelajar": r[0], "nama_pelajar": r[1], "no_matrik": r[2], "masa_masuk": r[3]}
+                   for r in first_arrivals(conn, today)]
+        row = conn.execute("SELECT bilangan_imbasan FROM ringkasan_harian WHERE tarikh = ?", (today,)).fetchone()
+        last_id = conn.execute("SELECT COALESCE(MAX(id_kehadiran), 0) FROM kehadiran").fetchone()[0]
+        with self._cond:
+            self.today, self.last_id, self.scans_today = today, last_id, row[0] if row else 0
+            self.present = {r["id_pelajar"]: r for r in records}
+            self._publish("snapshot", self._snapshot_data())
+
+    def _snapshot_data(self):
+        return {"tarikh": self.today, "rekod": sorted(self.present.values(), key=lambda r: r["masa_masuk"])}
+
+    def _publish(self, event, data):
+        # Dipanggil dengan self._cond dipegang
+        self.seq += 1
+        self.events.append((self.seq, event, json.dumps(data, ensure_ascii=False)))
+        self._cond.notify_all()
+
+    @staticmethod
+    def _format(seq, event, payload):
+        return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n"
+
+    def stream(self, last_event_id=None):
+        """Penjana acara SSE untuk satu pelanggan. Sambung semula dengan Last-Event-ID jika masih dalam sejarah."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.today is not None, timeout=self.keepalive)
+            oldest = self.events[0][0] if self.events else self.seq + 1
+            try: cursor = int(last_event_id) if last_event_id else None
+            except ValueError: cursor = None
+            if cursor is None or cursor < oldest - 1 or cursor > self.seq:
+                cursor = self.seq
+                first = self._format(self.seq, "snapshot", json.dumps(self._snapshot_data(), ensure_ascii=False))
+            else:
+                first = None
+            self.subscribers += 1
+        try:
+            if first: yield first
+            while not self._stop.is_set():
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self.seq > cursor, timeout=self.keepalive):
+                        pending = None
+                    elif self.events and self.events[0][0] > cursor + 1:
+                        # Pelanggan terlalu ketinggalan: hantar snapshot penuh
+                        pending = [(self.seq, "snapshot", json.dumps(self._snapshot_data(), ensure_ascii=False))]
+                    else:
+                        pending = [e for e in self.events if e[0] > cursor]
+                if pending is None:
+                    yield ": keepalive\n\n"; continue
+                cursor = pending[-1][0]
+                yield "".join(self._format(*e) for e in pending)
+        finally:
+            with self._cond: self.subscribers -= 1
@@ -0,0 +1,112 @@
+"""
+attendance_rollups.py - Laporan sejarah kehadiran daripada jadual ringkasan (rollup)
+
+Jadual ringkasan (kehadiran_harian, ringkasan_harian, ringkasan_pelajar) dicipta oleh
+migrasi db_schema dan dikemas kini oleh trigger SQLite setiap kali rekod 'kehadiran'
+ditambah atau dipadam, jadi laporan semester tidak perlu mengimbas jadual mentah.
+
+- rebuild() membina semula semua ringkasan daripada 'kehadiran' (satu transaksi).
+- verify() membandingkan ringkasan dengan agregat sebenar dan memulangkan percanggahan.
+- daily_counts() / student_rates() / weekly_trend() hanya membaca jadual ringkasan.
+
+CARA GUNA:
+$ python attendance_rollups.py verify
+$ python attendance_rollups.py rebuild
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from db_schema import connect, ROLLUP_REBUILD
+
+DB_NAME = "attendance_system.db"
+
+# Agregat sebenar dari 'kehadiran' bagi setiap jadual ringkasan (lajur mengikut susunan jadual)
+EXPECTED = {
+    "kehadiran_harian": """SELECT tarikh, id_pelajar, MIN(masa_masuk), COUNT(*) FROM kehadiran GROUP BY tarikh, id_pelajar""",
+    "ringkasan_harian": """SELECT tarikh, COUNT(DISTINCT id_pelajar), COUNT(*) FROM kehadiran GROUP BY tarikh""",
+    "ringkasan_pelajar": """SELECT id_pelajar, COUNT(DISTINCT tarikh), COUNT(*) FROM kehadiran GROUP BY id_pelajar""",
+}
+
+
+def rebuild(conn):
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in ROLLUP_REBUILD: conn.execute(statement)
+    return conn.execute("SELECT COUNT(*) FROM kehadiran_harian").fetchone()[0]
+
+
+def verify(conn, limit=20):
+    """Pulangkan {jadual: [(arah, baris), ...]} bagi baris yang tidak sepadan; kosong jika tepat."""
+    problems = {}
+    for table, expected in EXPECTED.items():
+        rows = [("hilang/salah", row) for row in conn.execute(f"{expected} EXCEPT SELECT * FROM {table} LIMIT {limit}")]
+        rows += [("berlebihan/salah", row) for row in conn.execute(f"SELECT * FROM {table} EXCEPT {expected} LIMIT {limit}")]
+        if rows: problems[table] = rows
+    return problems
+
+
+def first_arrivals(conn, tarikh):
+    """Senarai masuk pertama bagi satu hari (menggantikan MIN(masa_masuk) ... GROUP BY)."""
+    return conn.execute("""
+        SELECT p.id_pelajar, p.nama_pelajar, p.no_matrik, k.masa_masuk_pertama
+        FROM kehadiran_harian k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+        WHERE k.tarikh = ? ORDER BY k.masa_masuk_pertama ASC
+    """, (tarikh,)).fetchall()
+
+
+def daily_counts(conn, mula, akhir):
+    return conn.execute("""
+        SELECT tarikh, bilangan_hadir, bilangan_imbasan FROM ringkasan_harian
+        WHERE tarikh BETWEEN ? AND ? ORDER BY tarikh ASC
+    """, (mula, akhir)).fetchall()
+
+
+def student_rates(conn, mula, akhir):
+    """Kadar kehadiran setiap pelajar: hari hadir / hari kelas (hari dengan sekurang-kurangnya satu imbasan)."""
+    class_days = conn.execute("SELECT COUNT(*) FROM ringkasan_harian WHERE tarikh BETWEEN ? AND ?", (mula, akhir)).fetchone()[0]
+    rows = conn.execute("""
+        SELECT p.id_pelajar, p.nama_pelajar, p.no_matrik, COALESCE(k.hari_hadir, 0) AS hari_hadir
+        FROM pelajar p LEFT JOIN (SELECT id_pelajar, COUNT(*) AS hari_hadir FROM kehadiran_harian
+                                  WHERE tarikh BETWEEN ? AND ? GROUP BY id_pelajar) k ON k.id_pelajar = p.id_pelajar
+        ORDER BY p.nama_pelajar ASC
+    """, (mula, akhir)).fetchall()
+    return class_days, [dict(zip(("id_pelajar", "nama_pelajar", "no_matrik", "hari_hadir"), row),
+                             kadar=(row[3] / class_days * 100 if class_days else 0.0)) for row in rows]
+
+
+def weekly_trend(conn, mula, akhir):
+    """Purata kehadiran harian bagi setiap minggu ISO dan perubahan berbanding minggu sebelumnya."""
+    weeks = {}
+    for tarikh, hadir, _ in daily_counts(conn, mula, akhir):
+        year, week, _ = datetime.strptime(tarikh, '%Y-%m-%d').isocalendar()
+        weeks.setdefault(f"{year}-M{week:02d}", []).append(hadir)
+    trend, previous = [], None
+    for minggu, counts in weeks.items():
+        purata = sum(counts) / len(counts)
+        trend.append({"minggu": minggu, "hari_kelas": len(counts), "purata_hadir": purata,
+                      "perubahan": (purata - previous) if previous is not None else None})
+        previous = purata
+    return trend
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bina semula atau sahkan jadual ringkasan kehadiran")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "rebuild":
+        print(f"✅ Ringkasan dibina semula: {rebuild(conn)} rekod pelajar-hari.")
+    problems = verify(conn)
+    conn.close()
+    if not problems:
+        print("✅ Jadual ringkasan sepadan dengan data mentah 'kehadiran'.")
+        sys.exit(0)
+    for table, rows in problems.items():
+        print(f"❌ {table}: {len(rows)} percanggahan (contoh)")
+        for direction, row in rows[:5]: print(f"   {direction}: {row}")
+    print("Jalankan 'python attendance_rollups.py rebuild' untuk membetulkan.")
+    sys.exit(1)
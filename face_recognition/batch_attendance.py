@@ -0,0 +1,305 @@
+"""
+batch_attendance.py - Pemprosesan kelompok rakaman kuliah untuk audit kehadiran
+
+Apabila rekod kehadiran dipertikaikan, atau sistem langsung tidak berjalan semasa kuliah,
+rakaman boleh diproses semula tanpa paparan dan pada kelajuan penuh CPU (bukan masa
+sebenar seperti AttendanceSystem.run). Sumber yang disokong:
+  - fail video (.mp4/.avi/...)    masa diambil daripada FPS video
+  - rakaman stream .mjpeg         (cth. bench_mjpeg.py --record), masa = indeks / --frame-fps
+  - folder frame (.jpg/.png)      disusun mengikut nama, masa = indeks / --frame-fps
+
+Rakaman dibahagikan kepada cebisan (--chunk-seconds) yang diproses merentasi process pool.
+Setiap pekerja membuka sumbernya sendiri (video: lompat terus ke frame pertama cebisan dan
+grab() tanpa nyahkod warna bagi frame yang tidak disampel), jadi hanya keputusan padanan
+yang dihantar balik ke proses utama.
+
+Galeri dan peraturan padanan sama seperti sistem langsung: AttendanceSystem.load_known_faces_from_db,
+GalleryMatcher (FACE_MATCHING_TOLERANCE) dan QualityGate. Liveness (kelipan) tidak disemak kerana
+frame disampel jarang; sebagai ganti, pelajar hanya dikira hadir jika dipadankan dalam sekurang-
+kurangnya --min-hits frame berbeza. Padanan dinyahduakan bagi setiap pelajar (masa pertama,
+masa terakhir, bilangan frame, jarak terbaik).
+
+Laporan ditulis ke --report (.csv atau .json). Dengan --commit-date, kehadiran ditulis ke jadual
+'kehadiran' pada tarikh itu (masa masuk = waktu pertama dilihat); pelajar yang sudah mempunyai
+rekod pada tarikh tersebut tidak ditulis semula.
+
+CARA GUNA:
+$ python batch_attendance.py kuliah_0800.mp4 --start "2026-03-02 08:00:00" --workers 8
+$ python batch_attendance.py rakaman.mjpeg --frame-fps 15 --commit-date 2026-03-02 --report audit.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from db_schema import connect, tarikh_of
+from detection_governor import QualityGate
+from face_detectors import DETECTORS, get_detector
+from fake_mjpeg_server import IMAGE_EXTENSIONS, RECORDING_EXTENSIONS
+from gallery_matcher import GalleryMatcher
+from mjpeg_reader import MJPEGReader
+from recognize_faces import AttendanceSystem
+
+REPORT_HEADER = ['Bil.', 'Nama Pelajar', 'No Matrik', 'Masa Pertama', 'Masa Terakhir', 'Bilangan Frame', 'Jarak Terbaik', 'Sumber']
+# Tulis hanya jika pelajar belum mempunyai rekod pada tarikh itu (indeks idx_kehadiran_tarikh_pelajar)
+AUDIT_INSERT_SQL = """INSERT INTO kehadiran(id_pelajar, masa_masuk, tarikh) SELECT ?, ?, ?
+                      WHERE NOT EXISTS (SELECT 1 FROM kehadiran WHERE tarikh = ? AND id_pelajar = ?)"""
+
+_worker = {}   # Keadaan setiap proses pekerja (diisi oleh _init_worker)
+
+
+def _init_worker(matrix, infos, tolerance, scale, model, gate):
+    import face_recognition
+    matcher = GalleryMatcher(tolerance=tolerance)
+    matcher.build(matrix, infos)
+    _worker.update(face_recognition=face_recognition, matcher=matcher, scale=scale, detector=get_detector(model),
+                   gate=QualityGate(*gate) if gate else None)
+
+
+def _iter_task_frames(task):
+    kind, payload = task["jenis"], task["muatan"]
+    if kind == "video":
+        path, start, stop, step = payload
+        cap = cv2.VideoCapture(path)
+        try:
+            if start: cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            for index in range(start, stop):
+                if (index - start) % step:
+                    if not cap.grab(): break
+                    continue
+                ret, frame = cap.read()
+                if not ret: break
+                yield index, frame
+        finally:
+            cap.release()
+    elif kind == "folder":
+        for index, path in payload:
+            frame = cv2.imread(path)
+            if frame is not None: yield index, frame
+    else:   # "jpeg": bait JPEG daripada rakaman .mjpeg
+        for index, jpg in payload:
+            frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None: yield index, frame
+
+
+def process_chunk(task):
+    """Dijalankan dalam proses pekerja. Pulangkan (id sumber, frame dianalisis, wajah, ditolak, padanan)."""
+    fr, matcher, scale, gate = _worker["face_recognition"], _worker["matcher"], _worker["scale"], _worker["gate"]
+    frames = faces = rejected = 0
+    hits = []   # (indeks frame, id pelajar, jarak)
+    for index, frame in _iter_task_frames(task):
+        frames += 1
+        small = frame if scale == 1 else cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb_small_frame = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        boxes = _worker["detector"].detect(rgb_small_frame)
+        faces += len(boxes)
+        if gate:
+            passed = [box for box in boxes if gate.check(rgb_small_frame, box) is None]
+            rejected += len(boxes) - len(passed); boxes = passed
+        if not boxes: continue
+        for info, distance in matcher.match(fr.face_encodings(rgb_small_frame, boxes)):
+            if info is not None: hits.append((index, info["id"], distance))
+    return task["sumber"], frames, faces, rejected, hits
+
+
+def plan_source(source_id, path, sample_fps, frame_fps, chunk_seconds):
+    """Pulangkan (penerangan sumber, senarai tugasan) bagi satu video, rakaman .mjpeg atau folder frame."""
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        if not files: raise ValueError(f"Tiada gambar dalam '{path}'.")
+        kind, fps, n_frames, mtime = "folder", frame_fps, len(files), os.path.getmtime(files[0])
+    elif path.lower().endswith(RECORDING_EXTENSIONS):
+        kind, fps, n_frames, mtime = "jpeg", frame_fps, None, os.path.getmtime(path)
+    else:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened(): raise ValueError(f"Gagal membuka video '{path}'.")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); cap.release()
+        if n_frames <= 0: raise ValueError(f"Bilangan frame video '{path}' tidak diketahui.")
+        kind, mtime = "video", os.path.getmtime(path)
+    step = max(1, round(fps / sample_fps)) if sample_fps else 1
+    chunk = max(step, int(chunk_seconds * fps) // step * step)   # Sempadan cebisan sejajar dengan langkah sampel
+    tasks = []
+    if kind == "video":
+        tasks = [{"sumber": source_id, "jenis": kind, "muatan": (path, start, min(start + chunk, n_frames), step)}
+                 for start in range(0, n_frames, chunk)]
+    elif kind == "folder":
+        sampled = list(enumerate(files))[::step]
+        per_task = max(1, chunk // step)
+        tasks = [{"sumber": source_id, "jenis": kind, "muatan": sampled[i:i + per_task]} for i in range(0, len(sampled), per_task)]
+    else:
+        # Rakaman .mjpeg tidak boleh dilompati: dibaca secara berurutan, hanya JPEG yang disampel disimpan
+        with open(path, 'rb') as f:
+            reader = MJPEGReader(iter(lambda: f.read(65536), b''))
+            sampled = [(i, jpg) for i, jpg in enumerate(reader.iter_jpegs()) if i % step == 0]
+            n_frames = reader.frames_parsed
+        if not sampled: raise ValueError(f"Tiada frame JPEG dalam '{path}'.")
+        per_task = max(1, chunk // step)
+        tasks = [{"sumber": source_id, "jenis": kind, "muatan": sampled[i:i + per_task]} for i in range(0, len(sampled), per_task)]
+    info = {"laluan": path, "jenis": kind, "fps": fps, "bilangan_frame": n_frames, "langkah_sampel": step,
+            "tempoh_s": n_frames / fps, "mtime": mtime}
+    return info, tasks
+
+
+def assign_start_times(sources, start=None):
+    """
+    Tetapkan waktu mula setiap sumber. Dengan --start, sumber pertama bermula pada waktu itu dan
+    sumber seterusnya menyambung selepas tempoh sumber sebelumnya (rakaman yang dipecahkan kepada
+    beberapa fail). Tanpa --start, waktu mula dianggarkan daripada masa ubah suai fail.
+    """
+    cursor = start
+    for source in sources:
+        if cursor is not None:
+            source["mula"] = cursor; cursor += timedelta(seconds=source["tempoh_s"])
+        elif source["jenis"] == "folder":
+            source["mula"] = datetime.fromtimestamp(source["mtime"])   # Masa frame pertama
+        else:
+            source["mula"] = datetime.fromtimestamp(source["mtime"]) - timedelta(seconds=source["tempoh_s"])
+
+
+def merge_hits(sources, results, infos, min_hits=2):
+    """Nyahduakan padanan bagi setiap pelajar merentasi semua sumber. Pulangkan (diterima, ditolak)."""
+    students = {}
+    for source_id, hits in results:
+        source = sources[source_id]
+        for index, student_id, distance in hits:
+            seen_at = source["mula"] + timedelta(seconds=index / source["fps"])
+            entry = students.setdefault(student_id, {"frames": set(), "pertama": seen_at, "terakhir": seen_at,
+                                                     "jarak_terbaik": distance, "sumber": source["laluan"]})
+            entry["frames"].add((source_id, index))   # Satu frame dikira sekali walaupun beberapa wajah dipadankan
+            if seen_at < entry["pertama"]: entry["pertama"], entry["sumber"] = seen_at, source["laluan"]
+            entry["terakhir"] = max(entry["terakhir"], seen_at)
+            entry["jarak_terbaik"] = min(entry["jarak_terbaik"], distance)
+    accepted, rejected = [], []
+    for student_id, entry in students.items():
+        info = infos.get(student_id, {"nama": f"ID {student_id}", "no_matrik": "N/A"})
+        row = {"id": student_id, "nama": info["nama"], "no_matrik": info["no_matrik"],
+               "masa_pertama": entry["pertama"].strftime('%Y-%m-%d %H:%M:%S'),
+               "masa_terakhir": entry["terakhir"].strftime('%Y-%m-%d %H:%M:%S'),
+               "bilangan_frame": len(entry["frames"]), "jarak_terbaik": round(float(entry["jarak_terbaik"]), 4),
+               "sumber": entry["sumber"]}
+        (accepted if row["bilangan_frame"] >= min_hits else rejected).append(row)
+    accepted.sort(key=lambda row: row["masa_pertama"]); rejected.sort(key=lambda row: row["masa_pertama"])
+    return accepted, rejected
+
+
+def write_report(path, accepted, rejected, summary):
+    if path.lower().endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"ringkasan": summary, "hadir": accepted, "tidak_cukup_bukti": rejected}, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_HEADER)
+        for i, row in enumerate(accepted, 1):
+            writer.writerow([i, row["nama"], row["no_matrik"], row["masa_pertama"], row["masa_terakhir"],
+                             row["bilangan_frame"], row["jarak_terbaik"], row["sumber"]])
+
+
+def commit_attendance(db_name, accepted, commit_date):
+    """Tulis kehadiran pada commit_date (objek date; masa masuk = waktu pertama dilihat). Pulangkan (ditulis, sudah_ada)."""
+    conn = connect(db_name)
+    written = 0
+    try:
+        with conn:
+            for row in accepted:
+                seen = datetime.strptime(row["masa_pertama"], '%Y-%m-%d %H:%M:%S')
+                masa_masuk = datetime.combine(commit_date, seen.time()).strftime('%Y-%m-%d %H:%M:%S')
+                cursor = conn.execute(AUDIT_INSERT_SQL, (row["id"], masa_masuk, tarikh_of(masa_masuk), tarikh_of(masa_masuk), row["id"]))
+                written += cursor.rowcount
+    finally:
+        conn.close()
+    return written, len(accepted) - written
+
+
+def run_batch(paths, db_name="attendance_system.db", workers=None, sample_fps=2.0, frame_fps=1.0, chunk_seconds=30.0,
+              scale=None, model=None, min_hits=2, start=None, report_path="laporan_audit_kehadiran.csv", commit_date=None):
+    system = AttendanceSystem()
+    system.DB_NAME = db_name
+    system.load_known_faces_from_db()
+    if not len(system.matcher): print("❌ KRITIKAL: Tiada data wajah sah."); return None
+    scale = scale or system.DETECTION_SCALE
+    model = model or system.DETECTION_MODEL
+
+    sources, tasks = [], []
+    for path in paths:
+        info, source_tasks = plan_source(len(sources), path, sample_fps, frame_fps, chunk_seconds)
+        sources.append(info); tasks.extend(source_tasks)
+        print(f"🎞️ {path}: {info['bilangan_frame']} frame, {info['tempoh_s']:.0f} s, setiap frame ke-{info['langkah_sampel']} "
+              f"dianalisis ({len(source_tasks)} cebisan)")
+    assign_start_times(sources, start)
+
+    gate = (system.QUALITY_MIN_FACE, system.QUALITY_MIN_SHARPNESS, system.QUALITY_MAX_YAW) if system.QUALITY_GATE else None
+    matrix = np.array(system.matcher.matrix, dtype=np.float32)   # Salinan biasa (bukan memmap) untuk dihantar ke pekerja
+    init_args = (matrix, system.matcher.infos, system.FACE_MATCHING_TOLERANCE, scale, model, gate)
+    t0 = time.perf_counter()
+    results, frames, faces, rejected_faces = [], 0, 0, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(process_chunk, task) for task in tasks]
+        for i, future in enumerate(as_completed(futures), 1):
+            source_id, n_frames, n_faces, n_rejected, hits = future.result()
+            results.append((source_id, hits))
+            frames += n_frames; faces += n_faces; rejected_faces += n_rejected
+            if i % 10 == 0 or i == len(futures):
+                print(f"   ... {i}/{len(futures)} cebisan, {frames} frame ({frames / (time.perf_counter() - t0):.1f} frame/s)")
+    elapsed = time.perf_counter() - t0
+
+    infos = {info["id"]: info for info in system.known_face_info_all}
+    accepted, rejected = merge_hits(sources, results, infos, min_hits)
+    duration = sum(source["tempoh_s"] for source in sources)
+    summary = {"sumber": [{k: (v.strftime('%Y-%m-%d %H:%M:%S') if k == "mula" else v) for k, v in s.items() if k != "mtime"}
+                          for s in sources],
+               "frame_dianalisis": frames, "wajah_dikesan": faces, "wajah_ditolak_kualiti": rejected_faces,
+               "masa_proses_s": round(elapsed, 2), "kelajuan_berbanding_masa_sebenar": round(duration / elapsed, 1) if elapsed else None,
+               "min_padanan": min_hits, "toleransi": system.FACE_MATCHING_TOLERANCE, "skala_pengesanan": scale,
+               "dijana_pada": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    if commit_date:
+        written, existing = commit_attendance(db_name, accepted, commit_date)
+        summary.update(tarikh_commit=commit_date.isoformat(), rekod_ditulis=written, rekod_sudah_ada=existing)
+    if report_path: write_report(report_path, accepted, rejected, summary)
+    return accepted, rejected, summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Audit kehadiran daripada rakaman kuliah (tanpa paparan, process pool)")
+    parser.add_argument("sources", nargs="+", help="Fail video, rakaman .mjpeg atau folder frame (mengikut turutan masa)")
+    parser.add_argument("--db", default="attendance_system.db", help="Pangkalan data pelajar / kehadiran")
+    parser.add_argument("--workers", type=int, default=None, help="Bilangan proses pekerja (lalai: semua teras CPU)")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="Bilangan frame dianalisis setiap saat rakaman (0 = semua)")
+    parser.add_argument("--frame-fps", type=float, default=1.0, help="Kadar frame bagi folder frame dan rakaman .mjpeg")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0, help="Tempoh rakaman bagi setiap tugasan pekerja (saat)")
+    parser.add_argument("--scale", type=float, default=None, help="Skala pengesanan (lalai: DETECTION_SCALE sistem langsung)")
+    parser.add_argument("--model", choices=list(DETECTORS), default=None, help="Pengesan wajah (lalai: DETECTION_MODEL sistem langsung)")
+    parser.add_argument("--min-hits", type=int, default=2, help="Bilangan frame minimum untuk dikira hadir")
+    parser.add_argument("--start", help="Waktu mula rakaman 'YYYY-MM-DD HH:MM:SS' (lalai: dianggar dari masa fail)")
+    parser.add_argument("--commit-date", help="Tulis kehadiran ke jadual 'kehadiran' pada tarikh ini (YYYY-MM-DD)")
+    parser.add_argument("--report", default="laporan_audit_kehadiran.csv", help="Fail laporan (.csv atau .json)")
+    args = parser.parse_args()
+    try:
+        start = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S') if args.start else None
+        commit_date = datetime.strptime(args.commit_date, '%Y-%m-%d').date() if args.commit_date else None
+    except ValueError as e:
+        print(f"❌ Format tarikh/masa tidak sah: {e}"); sys.exit(2)
+    try:
+        outcome = run_batch(args.sources, args.db, args.workers, args.sample_fps, args.frame_fps, args.chunk_seconds,
+                            args.scale, args.model, max(1, args.min_hits), start, args.report, commit_date)
+    except ValueError as e:
+        print(f"❌ {e}"); sys.exit(1)
+    if outcome is None: sys.exit(1)
+    accepted, rejected, summary = outcome
+    print(f"\n📋 {len(accepted)} pelajar hadir ({summary['frame_dianalisis']} frame dalam {summary['masa_proses_s']} s, "
+          f"{summary['kelajuan_berbanding_masa_sebenar']}x masa sebenar):")
+    for row in accepted:
+        print(f"- {row['nama']} ({row['no_matrik']}) @ {row['masa_pertama']} [{row['bilangan_frame']} frame, jarak {row['jarak_terbaik']}]")
+    if rejected: print(f"❔ {len(rejected)} pelajar dipadankan kurang daripada {summary['min_padanan']} frame (lihat laporan .json).")
+    if args.commit_date: print(f"💾 {summary['rekod_ditulis']} rekod ditulis ke 'kehadiran' pada {summary['tarikh_commit']} "
+                               f"({summary['rekod_sudah_ada']} sudah ada).")
+    if args.report: print(f"📄 Laporan: {args.report}")
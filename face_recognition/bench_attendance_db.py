@@ -0,0 +1,103 @@
+"""
+bench_attendance_db.py - Penanda aras pertanyaan laporan kehadiran (skema lama lwn skema berindeks)
+
+Menjana pangkalan data sementara dengan skema asal dan N rekod 'kehadiran', mengukur
+pertanyaan dashboard/CSV/reset dengan WHERE date(masa_masuk) = ?, kemudian menjalankan
+migrasi db_schema (lajur 'tarikh' + indeks meliputi + WAL) dan mengukur pertanyaan baharu.
+
+CARA GUNA:
+$ python bench_attendance_db.py --rows 10000000 --students 2000 --days 365
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db_schema import connect
+
+LEGACY_SCHEMA = (
+    """CREATE TABLE pelajar (id_pelajar INTEGER PRIMARY KEY AUTOINCREMENT, nama_pelajar TEXT NOT NULL,
+       no_matrik TEXT UNIQUE NOT NULL, path_encoding_wajah TEXT)""",
+    """CREATE TABLE kehadiran (id_kehadiran INTEGER PRIMARY KEY AUTOINCREMENT, id_pelajar INTEGER NOT NULL,
+       masa_masuk DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (id_pelajar) REFERENCES pelajar(id_pelajar))""",
+)
+LEGACY_QUERIES = {
+    "dashboard": """SELECT p.id_pelajar, p.nama_pelajar, p.no_matrik, MIN(k.masa_masuk) as masa_masuk_pertama
+        FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+        WHERE date(k.masa_masuk) = ? GROUP BY p.id_pelajar ORDER BY masa_masuk_pertama ASC""",
+    "csv": """SELECT p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', k.masa_masuk) as waktu_masuk
+        FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+        WHERE date(k.masa_masuk) = ? ORDER BY k.masa_masuk ASC""",
+    "kiraan_reset": "SELECT COUNT(*) FROM kehadiran WHERE date(masa_masuk) = ?",
+}
+NEW_QUERIES = {
+    "dashboard": """SELECT p.id_pelajar, p.nama_pelajar, p.no_matrik, k.masa_masuk_pertama
+        FROM (SELECT id_pelajar, MIN(masa_masuk) AS masa_masuk_pertama FROM kehadiran
+              WHERE tarikh = ? GROUP BY id_pelajar) k
+        JOIN pelajar p ON k.id_pelajar = p.id_pelajar ORDER BY k.masa_masuk_pertama ASC""",
+    "csv": """SELECT p.nama_pelajar, p.no_matrik, strftime('%H:%M:%S', k.masa_masuk) as waktu_masuk
+        FROM kehadiran k JOIN pelajar p ON k.id_pelajar = p.id_pelajar
+        WHERE k.tarikh = ? ORDER BY k.masa_masuk ASC""",
+    "kiraan_reset": "SELECT COUNT(*) FROM kehadiran WHERE tarikh = ?",
+}
+
+
+def build_legacy_db(path, rows, students, days):
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA: conn.execute(statement)
+    conn.executemany("INSERT INTO pelajar(nama_pelajar, no_matrik) VALUES (?, ?)",
+                     ((f"PELAJAR {i}", f"M{i:06d}") for i in range(students)))
+    start, rng = datetime(2026, 1, 1, 8, 0, 0), random.Random(0)
+
+    def generate():
+        for i in range(rows):
+            ts = start + timedelta(days=i * days // rows, seconds=rng.randrange(8 * 3600))
+            yield rng.randrange(1, students + 1), ts.strftime('%Y-%m-%d %H:%M:%S')
+
+    conn.executemany("INSERT INTO kehadiran(id_pelajar, masa_masuk) VALUES (?, ?)", generate())
+    conn.commit(); conn.close()
+    return (start + timedelta(days=days // 2)).strftime('%Y-%m-%d')
+
+
+def time_queries(conn, queries, day, repeat):
+    results = {}
+    for name, sql in queries.items():
+        plan = " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (day,)))
+        start = time.perf_counter()
+        for _ in range(repeat): n = len(conn.execute(sql, (day,)).fetchall())
+        results[name] = ((time.perf_counter() - start) / repeat * 1000, n, plan)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Penanda aras pertanyaan laporan kehadiran")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", help="Simpan pangkalan data yang dijana di laluan ini")
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"🔄 Menjana {args.rows:,} rekod kehadiran di {path} ...")
+    t0 = time.perf_counter(); day = build_legacy_db(path, args.rows, args.students, args.days)
+    print(f"   siap dalam {time.perf_counter() - t0:.1f} s; tarikh ujian {day}")
+
+    legacy_conn = sqlite3.connect(path)
+    legacy = time_queries(legacy_conn, LEGACY_QUERIES, day, args.repeat); legacy_conn.close()
+    t0 = time.perf_counter(); conn = connect(path)
+    print(f"🛠️ Migrasi skema (lajur tarikh + indeks + WAL): {time.perf_counter() - t0:.1f} s")
+    new = time_queries(conn, NEW_QUERIES, day, args.repeat)
+
+    print(f"\n{'pertanyaan':<14}{'lama (ms)':>12}{'baharu (ms)':>14}{'kelajuan':>10}  baris")
+    for name in LEGACY_QUERIES:
+        (old_ms, n_old, old_plan), (new_ms, n_new, new_plan) = legacy[name], new[name]
+        print(f"{name:<14}{old_ms:>12.1f}{new_ms:>14.2f}{old_ms / new_ms:>9.0f}x  {n_old}/{n_new}")
+        print(f"   lama  : {old_plan}\n   baharu: {new_plan}")
+    conn.close()
+    if not args.keep: shutil.rmtree(os.path.dirname(path))
@@ -0,0 +1,137 @@
+"""
+bench_detectors.py - Penanda aras kelajuan dan recall pengesan wajah (face_detectors.py)
+
+Setiap pengesan dijalankan pada set gambar berlabel tempatan pada skala pengesanan yang sama
+seperti recognize_faces.py (--scale), dan melaporkan:
+  - imej sesaat, purata dan p95 masa pengesanan (ms)
+  - recall: wajah berlabel yang dijumpai (IoU >= --iou dengan kotak yang dikesan)
+  - positif palsu setiap imej (kotak yang tidak sepadan dengan mana-mana label)
+Akhir sekali, pengesan terpantas dengan recall >= --min-recall dicadangkan.
+
+Set berlabel (pilih satu):
+  --images folder --labels anotasi.json   {"nama_fail.jpg": [[x, y, w, h], ...]} pada resolusi penuh
+  --dataset dataset                       gambar pendaftaran (dataset/<Nama>/*.jpg): setiap gambar
+                                          dianggap mengandungi tepat satu wajah tanpa kotak
+
+Ambang IoU lalai (0.4) lebih longgar daripada biasa kerana setiap pengesan melukis kotak dengan
+cara berbeza (kotak dlib HOG lebih ketat daripada Haar/SSD).
+
+CARA GUNA:
+$ python bench_detectors.py --images dewan_kuliah --labels anotasi.json --scale 0.25
+$ python bench_detectors.py --dataset dataset --detectors hog,haar,yunet --out pengesan.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_detectors import DETECTORS, create_detector
+from face_tracker import box_iou
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def load_labelled(images_dir, labels_path):
+    with open(labels_path, encoding='utf-8') as f:
+        labels = json.load(f)
+    samples = []
+    for name, rects in sorted(labels.items()):
+        path = os.path.join(images_dir, name)
+        if os.path.exists(path):
+            samples.append((path, [(y, x + w, y + h, x) for x, y, w, h in rects]))
+    return samples
+
+
+def load_dataset(dataset_dir):
+    samples = []
+    for root, _, files in sorted(os.walk(dataset_dir)):
+        samples.extend((os.path.join(root, name), None) for name in sorted(files) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return samples
+
+
+def match_boxes(detected, truth, iou_threshold):
+    """Pulangkan (label dijumpai, positif palsu). truth=None: satu wajah tanpa kotak."""
+    if truth is None:
+        return min(len(detected), 1), max(0, len(detected) - 1)
+    unmatched, found = list(detected), 0
+    for box in truth:
+        if not unmatched: break
+        best = max(unmatched, key=lambda d: box_iou(d, box))
+        if box_iou(best, box) >= iou_threshold:
+            found += 1; unmatched.remove(best)
+    return found, len(unmatched)
+
+
+def bench_detector(name, images, iou_threshold):
+    detector = create_detector(name)
+    detector.detect(images[0][1])   # Panaskan (muat model / peruntukan pertama)
+    times, found, labelled, false_positives, detections = [], 0, 0, 0, 0
+    for scale, rgb, truth in images:
+        t0 = time.perf_counter()
+        boxes = detector.detect(rgb)
+        times.append((time.perf_counter() - t0) * 1000)
+        full_res = [(int(t / scale), int(r / scale), int(b / scale), int(l / scale)) for t, r, b, l in boxes]
+        hit, fp = match_boxes(full_res, truth, iou_threshold)
+        found += hit; false_positives += fp; detections += len(boxes)
+        labelled += 1 if truth is None else len(truth)
+    times = np.asarray(times)
+    total_s = times.sum() / 1000
+    return {"pengesan": name, "imej": len(images), "imej_sesaat": round(len(images) / total_s, 1) if total_s else None,
+            "kotak_sesaat": round(detections / total_s, 1) if total_s else None,
+            "purata_ms": round(float(times.mean()), 2), "p95_ms": round(float(np.percentile(times, 95)), 2),
+            "recall": round(found / labelled, 3) if labelled else None,
+            "positif_palsu_setiap_imej": round(false_positives / len(images), 3)}
+
+
+def prepare_images(samples, scale):
+    images = []
+    for path, truth in samples:
+        image = cv2.imread(path)
+        if image is None: continue
+        small = image if scale == 1 else cv2.resize(image, (0, 0), fx=scale, fy=scale)
+        images.append((scale, cv2.cvtColor(small, cv2.COLOR_BGR2RGB), truth))
+    return images
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Penanda aras pengesan wajah")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="Folder gambar berlabel (perlukan --labels)")
+    source.add_argument("--dataset", help="Folder gambar pendaftaran (satu wajah setiap gambar)")
+    parser.add_argument("--labels", help="JSON {nama_fail: [[x, y, w, h], ...]}")
+    parser.add_argument("--detectors", default=",".join(DETECTORS), help="Senarai pengesan dipisahkan koma")
+    parser.add_argument("--scale", type=float, default=0.25, help="Skala pengesanan (seperti DETECTION_SCALE)")
+    parser.add_argument("--iou", type=float, default=0.4, help="IoU minimum untuk dikira sepadan dengan label")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Recall minimum untuk cadangan pengesan")
+    parser.add_argument("--out", help="Tulis keputusan ke fail JSON")
+    args = parser.parse_args()
+    if args.images and not args.labels: parser.error("--images memerlukan --labels.")
+
+    samples = load_labelled(args.images, args.labels) if args.images else load_dataset(args.dataset)
+    images = prepare_images(samples, args.scale)
+    if not images: parser.error("Tiada gambar ditemui.")
+    print(f"🖼️ {len(images)} gambar pada skala {args.scale:g}")
+    print(f"{'pengesan':<8} {'imej/s':>8} {'kotak/s':>8} {'purata ms':>10} {'p95 ms':>8} {'recall':>7} {'FP/imej':>8}")
+    results = []
+    for name in [n.strip() for n in args.detectors.split(",") if n.strip()]:
+        try:
+            result = bench_detector(name, images, args.iou)
+        except (ImportError, OSError, RuntimeError, ValueError, cv2.error) as e:   # Tiada dlib / fail model
+            print(f"{name:<8} ⚠️ dilangkau: {e}"); continue
+        results.append(result)
+        print(f"{name:<8} {result['imej_sesaat']:>8} {result['kotak_sesaat']:>8} {result['purata_ms']:>10} "
+              f"{result['p95_ms']:>8} {result['recall']:>7} {result['positif_palsu_setiap_imej']:>8}")
+    good = [r for r in results if r["recall"] is not None and r["recall"] >= args.min_recall]
+    if good:
+        best = max(good, key=lambda r: r["imej_sesaat"] or 0)
+        print(f"\n✅ Cadangan: '{best['pengesan']}' (terpantas dengan recall >= {args.min_recall:g}). "
+              f"Tetapkan DETECTION_MODEL / FACE_DETECTOR atau guna --detector {best['pengesan']}.")
+    else:
+        print(f"\n❗ Tiada pengesan mencapai recall {args.min_recall:g}.")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({"skala": args.scale, "iou": args.iou, "bilangan_imej": len(images), "keputusan": results}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,100 @@
+"""
+bench_mjpeg.py - Penanda aras mikro untuk penghurai dan penyahkod MJPEG
+
+Membandingkan kaedah lama dalam AttendanceSystem.run (byte_data += chunk, find dari
+awal, PIL -> np.array -> cvtColor) dengan MJPEGReader (imbasan berperingkat,
+cv2.imdecode, pilihan nyahkod skala dikurangkan) pada stream yang telah dirakam.
+
+CARA GUNA:
+  # Rakam 30 saat stream sebenar ke fail
+  $ python bench_mjpeg.py --record http://192.168.10.1:8000/video --seconds 30 rakaman.mjpeg
+  # Jalankan penanda aras pada satu atau lebih rakaman
+  $ python bench_mjpeg.py rakaman.mjpeg
+  # Tanpa rakaman: jana stream sintetik
+  $ python bench_mjpeg.py --synthetic 200
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import cv2
+import numpy as np
+import requests
+from PIL import Image
+
+from mjpeg_reader import MJPEGReader
+
+
+def record_stream(url, seconds, out_path):
+    stream = requests.get(url, stream=True, timeout=10)
+    deadline = time.time() + seconds; total = 0
+    with open(out_path, 'wb') as f:
+        for chunk in stream.iter_content(chunk_size=65536):
+            f.write(chunk); total += len(chunk)
+            if time.time() >= deadline: break
+    stream.close()
+    print(f"✅ {total / 1e6:.1f} MB dirakam ke {out_path}")
+
+
+def synthetic_stream(n_frames, width=1280, height=720):
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur((rng.random((height, width, 3)) * 255).astype(np.uint8), (0, 0), 5)
+    parts = []
+    for i in range(n_frames):
+        frame = np.roll(base, i * 4, axis=1)
+        jpg = cv2.imencode('.jpg', frame)[1].tobytes()
+        parts.append(b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpg + b'\r\n')
+    return b''.join(parts)
+
+
+def chunked(data, chunk_size):
+    view = memoryview(data)
+    for i in range(0, len(data), chunk_size):
+        yield view[i:i + chunk_size]
+
+
+def legacy_frames(chunks):
+    # Salinan logik asal dalam AttendanceSystem.run
+    byte_data = b''
+    for chunk in chunks:
+        byte_data += chunk; start = byte_data.find(b'\xff\xd8'); end = byte_data.find(b'\xff\xd9')
+        if start == -1 or end == -1 or end <= start: continue
+        jpg = byte_data[start:end+2]; byte_data = byte_data[end+2:]
+        try: yield cv2.cvtColor(np.array(Image.open(BytesIO(jpg))), cv2.COLOR_RGB2BGR)
+        except Exception: continue
+
+
+def run_case(name, frames_iter):
+    start = time.perf_counter(); n = 0
+    for _ in frames_iter: n += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {n:>6} frame  {elapsed:>7.3f} s  {n / elapsed if elapsed else 0:>8.1f} fps")
+
+
+def bench(data, label):
+    print(f"\n📼 {label}: {len(data) / 1e6:.1f} MB")
+    run_case("lama (4 KB, PIL)", legacy_frames(chunked(data, 4096)))
+    run_case("lama (64 KB, PIL)", legacy_frames(chunked(data, 65536)))
+    run_case("MJPEGReader (4 KB, penuh)", MJPEGReader(chunked(data, 4096)).iter_frames())
+    for scale in (1, 2, 4):
+        run_case(f"MJPEGReader (64 KB, 1/{scale})", MJPEGReader(chunked(data, 65536), decode_scale=scale).iter_frames())
+    run_case("MJPEGReader (64 KB, huraian sahaja)", MJPEGReader(chunked(data, 65536)).iter_jpegs())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Penanda aras penghurai MJPEG")
+    parser.add_argument("files", nargs="*", help="Fail rakaman stream MJPEG")
+    parser.add_argument("--record", metavar="URL", help="Rakam stream dari URL ke fail pertama")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Jana N frame sintetik 1280x720")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.files: parser.error("Sila berikan nama fail output untuk rakaman.")
+        record_stream(args.record, args.seconds, args.files[0])
+    else:
+        if args.synthetic: bench(synthetic_stream(args.synthetic), f"sintetik ({args.synthetic} frame)")
+        for path in args.files:
+            with open(path, 'rb') as f: bench(f.read(), path)
+        if not args.synthetic and not args.files: parser.print_help()
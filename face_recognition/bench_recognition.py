@@ -0,0 +1,256 @@
+"""
+bench_recognition.py - Penanda aras hujung-ke-hujung AttendanceSystem tanpa kamera Pi
+
+Memainkan semula rakaman (folder gambar, video atau .mjpeg) melalui FakeMJPEGServer pada
+FPS terkawal, menjalankan AttendanceSystem dalam mod headless terhadapnya dan mengukur:
+  - FPS berterusan (frame dianalisis / masa)
+  - masa setiap peringkat: decode, detect, encode, landmarks, match, commit
+  - frame dibuang (di sumber kerana klien ketinggalan, dalam pipeline, atau dilangkau gabenor)
+  - masa dari kemunculan pertama pelajar hingga baris 'kehadiran' disimpan
+
+Pangkalan data dan stor encoding disalin ke direktori sementara supaya data sebenar tidak
+disentuh. Keputusan ditulis ke fail JSON (--out); --compare membandingkan dengan keputusan
+lama untuk mengesan regresi antara versi.
+
+Kemunculan pertama diambil daripada fail kebenaran JSON {"no_matrik": indeks_frame} jika
+diberi (--truth); jika tidak, frame pertama pelajar itu dipadankan digunakan.
+
+Nota: masa peringkat detect/encode/landmarks hanya direkodkan dalam proses ini, jadi
+guna mod biasa atau --pipeline dengan thread pool (bukan --processes).
+
+CARA GUNA:
+$ python bench_recognition.py --source rakaman.mjpeg --fps 15 --out hasil_v2.json
+$ python bench_recognition.py --source kelas.mp4 --pipeline --truth kebenaran.json --compare hasil_v1.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+import face_recognition
+import face_detectors
+from db_schema import connect
+from fake_mjpeg_server import FakeMJPEGServer, load_source, synthetic_jpegs
+from gallery_matcher import GalleryMatcher
+from mjpeg_reader import MJPEGReader
+from recognize_faces import AttendanceSystem
+
+STAGES = ("decode", "detect", "encode", "landmarks", "match", "commit")
+COMPARE_KEYS = ("fps_berterusan", "frame_dibuang", "kependaman_kehadiran_p50_s", "kependaman_kehadiran_maks_s")
+
+
+class StageTimings:
+    def __init__(self):
+        self.samples = defaultdict(list)   # peringkat -> senarai ms
+
+    def add(self, stage, ms):
+        self.samples[stage].append(ms)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try: return fn(*args, **kwargs)
+            finally: self.add(stage, (time.perf_counter() - t0) * 1000)
+        return timed
+
+    def summary(self):
+        result = {}
+        for stage in STAGES:
+            values = np.asarray(self.samples.get(stage, ()), dtype=np.float64)
+            result[stage] = {"bilangan": int(values.size), "jumlah_ms": round(float(values.sum()), 2),
+                             "purata_ms": round(float(values.mean()), 3) if values.size else None,
+                             "p50_ms": round(float(np.percentile(values, 50)), 3) if values.size else None,
+                             "p95_ms": round(float(np.percentile(values, 95)), 3) if values.size else None}
+        return result
+
+
+class BenchSystem(AttendanceSystem):
+    """AttendanceSystem yang merekod indeks frame sumber, kemunculan pertama dan masa commit."""
+
+    def __init__(self, timings, sent_at, truth=None):
+        super().__init__()
+        self.timings, self.sent_at, self.truth = timings, sent_at, truth or {}
+        self.reader = None
+        self.frames_received = self.frames_analyzed = 0
+        self.first_seen = {}            # id_pelajar -> indeks frame pertama dipadankan
+        self.submitted_at, self.committed_at = {}, {}
+        self.first_frame_at = self.last_frame_at = None   # FPS berterusan tidak termasuk masa permulaan
+        self._source_index = OrderedDict()   # id(frame) -> indeks frame sumber (X-Frame-Index)
+
+    def iter_stream_frames(self, stream):
+        self.reader = MJPEGReader(stream.iter_content(chunk_size=self.MJPEG_CHUNK_SIZE), decode_scale=self.DECODE_SCALE)
+        decoded = 0.0
+        for headers, frame in self.reader.iter_parts():
+            self.frames_received += 1
+            if self.first_frame_at is None: self.first_frame_at = time.perf_counter()
+            self.timings.add("decode", (self.reader.decode_time - decoded) * 1000); decoded = self.reader.decode_time
+            self._source_index[id(frame)] = int(headers.get("x-frame-index", -1))
+            while len(self._source_index) > 256: self._source_index.popitem(last=False)
+            yield frame
+
+    def analyze_tracked(self, rgb_small_frame):
+        self.frames_analyzed += 1
+        return super().analyze_tracked(rgb_small_frame)
+
+    def process_faces(self, face_locations, face_encodings, rgb_small_frame):
+        self.frames_analyzed += 1
+        return super().process_faces(face_locations, face_encodings, rgb_small_frame)
+
+    def present_frame(self, frame, detections):
+        index = self._source_index.pop(id(frame), -1)
+        self.last_frame_at = time.perf_counter()
+        for track in self.tracker.tracks:
+            if track.info is not None and track.misses == 0: self.first_seen.setdefault(track.info["id"], index)
+        return super().present_frame(frame, detections)
+
+    def record_attendance(self, student_id):
+        recorded = super().record_attendance(student_id)
+        if recorded: self.submitted_at[student_id] = time.monotonic()
+        return recorded
+
+    def _on_attendance_committed(self, events):
+        now = time.monotonic()
+        for event in events:
+            student_id = event["id_pelajar"]
+            self.committed_at.setdefault(student_id, now)
+            if student_id in self.submitted_at: self.timings.add("commit", (now - self.submitted_at[student_id]) * 1000)
+        super()._on_attendance_committed(events)
+
+    def attendance_latencies(self):
+        """Pulangkan {no_matrik: saat dari kemunculan pertama hingga baris kehadiran disimpan}."""
+        info_by_id = {info["id"]: info for info in self.known_face_info_all}
+        latencies = {}
+        for student_id, committed in self.committed_at.items():
+            no_matrik = info_by_id[student_id]["no_matrik"] if student_id in info_by_id else str(student_id)
+            index = self.truth.get(no_matrik, self.first_seen.get(student_id))
+            if index is None or index not in self.sent_at: continue
+            latencies[no_matrik] = round(committed - self.sent_at[index], 3)
+        missed = sorted(m for m in self.truth if m not in latencies)
+        return latencies, missed
+
+
+def instrument(timings):
+    """Balut fungsi peringkat supaya setiap panggilan dimasa (hanya dalam proses ini)."""
+    for cls in (face_detectors.DlibDetector, face_detectors.HaarDetector, face_detectors.SSDDetector, face_detectors.YuNetDetector):
+        cls.detect = timings.wrap("detect", cls.detect)
+    face_recognition.face_encodings = timings.wrap("encode", face_recognition.face_encodings)
+    face_recognition.face_landmarks = timings.wrap("landmarks", face_recognition.face_landmarks)
+    GalleryMatcher.match = timings.wrap("match", GalleryMatcher.match)
+
+
+def copy_database(db_name, store_path, workdir):
+    db_copy = os.path.join(workdir, os.path.basename(db_name))
+    # Sumber dibuka baca sahaja: tiada migrasi atau pertukaran mod WAL pada DB sebenar
+    src, dst = sqlite3.connect(f"file:{os.path.abspath(db_name)}?mode=ro", uri=True), sqlite3.connect(db_copy)
+    try: src.backup(dst)
+    finally: src.close(); dst.close()
+    connect(db_copy).close()   # Migrasi salinan sahaja
+    store_copy = os.path.join(workdir, os.path.basename(store_path))
+    if os.path.exists(store_path): shutil.copyfile(store_path, store_copy)
+    return db_copy, store_copy
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(frames, args):
+    timings = StageTimings()
+    instrument(timings)
+    workdir = tempfile.mkdtemp(prefix="bench_pengecaman_")
+    server = FakeMJPEGServer(frames, fps=args.fps, loop=False, realtime=not args.no_realtime).start()
+    truth = None
+    if args.truth:
+        with open(args.truth, encoding="utf-8") as f: truth = json.load(f)
+    try:
+        system = BenchSystem(timings, server.sent_at, truth)
+        system.DB_NAME, system.ENCODING_STORE_PATH = copy_database(args.db, system.ENCODING_STORE_PATH, workdir)
+        system.SPOOL_PATH = os.path.join(workdir, "spool.jsonl")
+        system.GOVERNOR_LOG_PATH = os.path.join(workdir, "governor_log.jsonl")
+        system.RELAY_URL = "http://127.0.0.1:9/trigger-relay"   # Tiada relay sebenar semasa penanda aras
+        system.STREAM_URL, system.HEADLESS = server.url, True
+        system.DECODE_SCALE, system.ADAPTIVE_DETECTION = args.decode_scale, not args.fixed_scale
+        system.DETECTION_MODEL = args.detector
+        system.tracker.detect_every = system.DETECT_EVERY_N_FRAMES = max(1, args.detect_every)
+        start = time.perf_counter()
+        system.run(pipelined=args.pipeline, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        latencies, missed = system.attendance_latencies()
+        analyzed = system.frames_analyzed
+        streaming = system.last_frame_at - system.first_frame_at if system.first_frame_at and system.last_frame_at else 0
+        values = sorted(latencies.values())
+        return {
+            "versi": git_revision(), "masa": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "konfigurasi": {"sumber": args.source or "sintetik", "fps_sumber": args.fps, "pipeline": args.pipeline,
+                            "pengesan": args.detector, "pekerja": args.workers, "decode_scale": args.decode_scale, "detect_every": args.detect_every,
+                            "gabenor": not args.fixed_scale, "skala_akhir": system.DETECTION_SCALE, "pelajar": len(system.matcher)},
+            "tempoh_s": round(elapsed, 3),
+            "frame_sumber": len(frames), "frame_dihantar": server.frames_sent, "frame_diterima": system.frames_received,
+            "frame_dianalisis": analyzed,
+            "fps_berterusan": round(analyzed / streaming, 2) if streaming else None,
+            "frame_dibuang": len(frames) - analyzed,
+            "frame_dibuang_sumber": server.frames_skipped,
+            "peringkat": timings.summary(),
+            "kependaman_kehadiran_s": latencies,
+            "kependaman_kehadiran_p50_s": values[len(values) // 2] if values else None,
+            "kependaman_kehadiran_maks_s": values[-1] if values else None,
+            "tidak_direkod": missed,
+            "gerbang_kualiti": dict(system.quality_gate.counts),
+        }
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(result, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f: baseline = json.load(f)
+    print(f"\n📊 Perbandingan dengan {baseline_path} (versi {baseline.get('versi')}):")
+    rows = [(key, baseline.get(key), result.get(key)) for key in COMPARE_KEYS]
+    rows += [(f"{stage}.purata_ms", baseline.get("peringkat", {}).get(stage, {}).get("purata_ms"),
+              result["peringkat"][stage]["purata_ms"]) for stage in STAGES]
+    for key, old, new in rows:
+        change = f"{(new - old) / old * 100:+.1f}%" if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old else "-"
+        print(f"  {key:<30} {old!s:>10} -> {new!s:>10}  {change}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Penanda aras hujung-ke-hujung sistem pengecaman")
+    parser.add_argument("--source", help="Folder gambar, fail video atau rakaman .mjpeg (lalai: frame sintetik)")
+    parser.add_argument("--synthetic", type=int, default=150, help="Bilangan frame sintetik jika tiada --source")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--fps", type=float, default=15.0, help="Kadar main semula sumber")
+    parser.add_argument("--no-realtime", action="store_true", help="Jangan langkau frame di sumber (ukur daya pemprosesan maksimum)")
+    parser.add_argument("--db", default="attendance_system.db", help="Pangkalan data sumber (disalin, tidak diubah)")
+    parser.add_argument("--truth", help="Fail JSON {no_matrik: indeks frame kemunculan pertama}")
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--decode-scale", type=int, choices=[1, 2, 4, 8], default=1)
+    parser.add_argument("--detect-every", type=int, default=5)
+    parser.add_argument("--fixed-scale", action="store_true", help="Matikan gabenor pengesanan")
+    parser.add_argument("--detector", choices=list(face_detectors.DETECTORS), default=face_detectors.DEFAULT_DETECTOR)
+    parser.add_argument("--out", default="hasil_bench_pengecaman.json", help="Fail keputusan JSON")
+    parser.add_argument("--compare", metavar="JSON", help="Bandingkan dengan keputusan penanda aras terdahulu")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db): parser.error(f"Pangkalan data '{args.db}' tidak ditemui.")
+    frames = load_source(args.source, args.width) if args.source else synthetic_jpegs(args.synthetic, width=args.width)
+    print(f"📼 {len(frames)} frame pada {args.fps:g} fps")
+    result = run_benchmark(frames, args)
+    with open(args.out, "w", encoding="utf-8") as f: json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ {result['fps_berterusan']} fps berterusan, {result['frame_dibuang']} frame dibuang, "
+          f"kependaman kehadiran p50 {result['kependaman_kehadiran_p50_s']} s. Keputusan: {args.out}")
+    for stage, stats in result["peringkat"].items():
+        if stats["bilangan"]: print(f"  {stage:<10} {stats['bilangan']:>6} x  purata {stats['purata_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms")
+    if args.compare: compare(result, args.compare)
@@ -0,0 +1,145 @@
+"""
+bulk_enroll.py - Pendaftaran pukal pelajar (contohnya satu ambilan baharu)
+
+Sumber roster (pilih satu):
+  --manifest roster.csv   CSV dengan lajur 'nama_pelajar,no_matrik' (lajur 'folder' pilihan).
+                          Folder gambar dicari di dataset/ menggunakan peraturan nama yang
+                          sama seperti capture_images.py.
+  --dataset dataset       Setiap subfolder dinamakan '<NO_MATRIK>__<Nama>'.
+
+Gambar yang belum ada dalam manifest encoding folder pelajar (encodings.jsonl, lihat
+enrollment_cache.py; ditulis juga oleh capture_images.py) di-encode merentasi process pool,
+semua baris 'pelajar' ditulis dalam satu transaksi dan kegagalan dilaporkan bagi setiap
+pelajar. Setiap encoding ditambah ke manifest sebaik sahaja siap, jadi jika terganggu,
+jalankan semula arahan yang sama untuk menyambung tanpa meng-encode semula.
+
+CARA GUNA:
+$ python bulk_enroll.py --manifest ambilan_2026.csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import enrollment_cache
+from encoding_store import EncodingStore, DEFAULT_STORE_PATH
+from db_schema import connect
+
+DB_NAME = "attendance_system.db"
+DATASET_BASE_DIR = "dataset"
+IMAGE_EXTENSIONS = enrollment_cache.IMAGE_EXTENSIONS
+
+
+def encode_image(image_path):
+    """Dijalankan dalam proses pekerja. Pulangkan (laluan, encoding atau None, ralat)."""
+    import face_recognition
+    try:
+        encoding = enrollment_cache.encode_image(face_recognition, image_path)
+    except Exception as e:
+        return image_path, None, str(e)
+    return image_path, encoding, None if encoding is not None else "Tiada wajah dikesan"
+
+
+def roster_from_manifest(manifest_path):
+    students = []
+    with open(manifest_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            nama, no_matrik = (row.get('nama_pelajar') or '').strip(), (row.get('no_matrik') or '').strip()
+            if not nama or not no_matrik: continue
+            folder = (row.get('folder') or '').strip() or re.sub(r'[\s\W]+', '_', nama)
+            students.append({"nama": nama, "no_matrik": no_matrik, "folder": os.path.join(DATASET_BASE_DIR, folder)})
+    return students
+
+
+def roster_from_dataset(dataset_dir):
+    students = []
+    for entry in sorted(os.listdir(dataset_dir)):
+        path = os.path.join(dataset_dir, entry)
+        if not os.path.isdir(path) or '__' not in entry: continue
+        no_matrik, nama = entry.split('__', 1)
+        students.append({"nama": nama.replace('_', ' '), "no_matrik": no_matrik, "folder": path})
+    return students
+
+
+def bulk_enroll(students, workers=None):
+    conn = connect(DB_NAME)
+    existing = {row[0] for row in conn.execute("SELECT no_matrik FROM pelajar")}
+    failures, seen = {}, set()
+    pending_students = []
+    for student in students:
+        no_matrik = student["no_matrik"]
+        if no_matrik in existing or no_matrik in seen:
+            failures[no_matrik] = "Nombor matrik sudah wujud."; continue
+        seen.add(no_matrik)
+        if not os.path.isdir(student["folder"]):
+            failures[no_matrik] = f"Folder gambar '{student['folder']}' tidak ditemui."; continue
+        student["images"] = [os.path.join(student["folder"], f) for f in sorted(os.listdir(student["folder"])) if f.lower().endswith(IMAGE_EXTENSIONS)]
+        if not student["images"]:
+            failures[no_matrik] = "Tiada gambar ditemui."; continue
+        pending_students.append(student)
+
+    # Hanya gambar tanpa rekod sah dalam manifest folder di-encode; hasil ditambah ke manifest satu demi satu
+    todo, cached = [], 0
+    for student in pending_students:
+        manifest = enrollment_cache.load_manifest(student["folder"])
+        for path in student["images"]:
+            if enrollment_cache.cached_record(manifest, path) is None: todo.append(path)
+            else: cached += 1
+    print(f"🔄 {len(pending_students)} pelajar, {len(todo)} gambar perlu di-encode ({cached} dari manifest).")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(encode_image, path) for path in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            path, encoding, error = future.result()
+            if error: print(f"Amaran: {path}: {error}", file=sys.stderr)
+            if encoding is not None or error == "Tiada wajah dikesan":
+                enrollment_cache.append_manifest(os.path.dirname(path), [(path, encoding)])
+            if i % 100 == 0: print(f"   ... {i}/{len(todo)} gambar")
+
+    rows, vectors = [], []
+    for student in pending_students:
+        # Purata dimuktamadkan daripada manifest (sama seperti enroll_student.py)
+        encoding, _ = enrollment_cache.representative_encoding(student["folder"], student["images"])
+        if encoding is None:
+            failures[student["no_matrik"]] = "Tiada wajah dikesan dalam mana-mana gambar."; continue
+        rows.append(student); vectors.append(encoding)
+
+    enrolled = 0
+    if rows:
+        ids, appended = [], False
+        try:
+            cursor = conn.cursor()
+            for student in rows:
+                cursor.execute("INSERT INTO pelajar(nama_pelajar, no_matrik, path_encoding_wajah) VALUES(?,?,?)",
+                               (student["nama"], student["no_matrik"], DEFAULT_STORE_PATH))
+                ids.append(cursor.lastrowid)
+            EncodingStore(DEFAULT_STORE_PATH).append_many(ids, vectors); appended = True
+            conn.commit(); enrolled = len(rows)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            conn.rollback()
+            if appended:
+                store = EncodingStore(DEFAULT_STORE_PATH)
+                for student_id in ids: store.delete(student_id)
+            for student in rows: failures[student["no_matrik"]] = f"Ralat pangkalan data: {e}"
+    conn.close()
+    return enrolled, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pendaftaran pukal pelajar")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="CSV dengan lajur nama_pelajar,no_matrik[,folder]")
+    source.add_argument("--dataset", help="Folder dengan subfolder '<NO_MATRIK>__<Nama>'")
+    parser.add_argument("--workers", type=int, default=None, help="Bilangan proses pekerja (lalai: semua teras CPU)")
+    args = parser.parse_args()
+
+    students = roster_from_manifest(args.manifest) if args.manifest else roster_from_dataset(args.dataset)
+    enrolled, failures = bulk_enroll(students, workers=args.workers)
+    print(f"\n✅ {enrolled} pelajar berjaya didaftarkan.")
+    if failures:
+        print(f"❌ {len(failures)} pelajar gagal:")
+        for no_matrik, reason in failures.items(): print(f"- {no_matrik}: {reason}")
+    sys.exit(0 if not failures else 1)
@@ -2,14 +2,63 @@ import cv2
 import os
 import re
 import sys
+import requests
+from mjpeg_reader import stream_frames
+from face_detectors import DEFAULT_DETECTOR, get_detector
+from enrollment_cache import CaptureWriter, FrameSelector, next_image_index
 
 # ==================== KONFIGURASI ====================
 STREAM_URL = "http://192.168.10.1:8000/video"
 DATASET_PATH = "dataset"
 IMAGES_TO_CAPTURE = 30
-HAAR_CASCADE_PATH = 'haarcascade_frontalface_default.xml'
+FACE_DETECTOR = DEFAULT_DETECTOR   # Pengesan yang sama dengan DETECTION_MODEL recognize_faces.py (face_detectors.py)
+DETECTION_SCALE = 0.5              # Pengesanan pada frame dikecilkan; kotak diskalakan semula ke resolusi penuh
+MIN_FACE_SIZE = 100                # Saiz wajah minimum (piksel resolusi penuh)
+CROP_MARGIN = 0.25                 # Jidar di sekeliling kotak supaya face_encodings dapat mengesan semula wajah
+MIN_SHARPNESS = 60.0               # Keratan kabur (varians Laplacian rendah) tidak disimpan
+MIN_DIFFERENCE = 10.0              # Keratan mesti cukup berbeza daripada keratan yang sudah disimpan
+MIN_CAPTURE_INTERVAL = 0.2         # Jarak masa minimum antara dua gambar (saat)
+ENCODE_DURING_CAPTURE = True       # Kira encoding semasa tangkapan (enroll_student.py hanya memuktamadkan)
+USE_MJPEG_READER = True   # Guna pembaca MJPEG berperingkat (False = cv2.VideoCapture)
 # =====================================================
 
+def _video_capture_frames(video_capture):
+    try:
+        while True:
+            ret, frame = video_capture.read()
+            if not ret:
+                print("⚠️ Gagal membaca frame.")
+                return
+            yield frame
+    finally:
+        video_capture.release()
+
+def open_frame_source():
+    """Pulangkan penjana frame BGR daripada STREAM_URL, atau None jika sambungan gagal."""
+    if USE_MJPEG_READER:
+        try:
+            return stream_frames(STREAM_URL)
+        except requests.exceptions.RequestException:
+            return None
+    video_capture = cv2.VideoCapture(STREAM_URL)
+    if not video_capture.isOpened():
+        return None
+    return _video_capture_frames(video_capture)
+
+def detect_faces(face_detector, frame):
+    """Kesan wajah seperti recognize_faces.py (RGB dikecilkan); pulangkan (x, y, w, h) pada resolusi penuh."""
+    small = cv2.resize(frame, (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE) if DETECTION_SCALE != 1 else frame
+    faces = []
+    for top, right, bottom, left in face_detector.detect(cv2.cvtColor(small, cv2.COLOR_BGR2RGB)):
+        x, y = int(left / DETECTION_SCALE), int(top / DETECTION_SCALE)
+        w, h = int((right - left) / DETECTION_SCALE), int((bottom - top) / DETECTION_SCALE)
+        if min(w, h) >= MIN_FACE_SIZE: faces.append((x, y, w, h))
+    return faces
+
+def crop_with_margin(frame, x, y, w, h):
+    mx, my = int(w * CROP_MARGIN), int(h * CROP_MARGIN)
+    return frame[max(0, y - my):y + h + my, max(0, x - mx):x + w + mx]
+
 def capture_student_images(student_name):
     # Bersihkan nama untuk folder
     safe_folder_name = re.sub(r'[\s\W]+', '_', student_name)
@@ -17,15 +66,15 @@ def capture_student_images(student_name):
     os.makedirs(student_path, exist_ok=True)
     print(f"✅ Folder untuk '{student_name}' telah disediakan di '{student_path}'")
 
-    if not os.path.exists(HAAR_CASCADE_PATH):
-        print(f"❌ Ralat: Fail '{HAAR_CASCADE_PATH}' tidak dijumpai.")
+    try:
+        face_detector = get_detector(FACE_DETECTOR)
+    except (OSError, RuntimeError, ValueError, cv2.error) as e:
+        print(f"❌ Ralat: Pengesan '{FACE_DETECTOR}' gagal dimuatkan: {e}")
         return
-    face_detector = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
 
     print(f"🔄 Cuba menyambung ke stream video di {STREAM_URL}...")
-    video_capture = cv2.VideoCapture(STREAM_URL)
-
-    if not video_capture.isOpened():
+    frames = open_frame_source()
+    if frames is None:
         print("❌ Gagal menyambung ke stream video.")
         return
 
@@ -34,44 +83,52 @@ def capture_student_images(student_name):
 
     img_count = 0
     capture_started = False
-
-    while True:
-        ret, frame = video_capture.read()
-        if not ret:
-            print("⚠️ Gagal membaca frame.")
-            break
-
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_detector.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(100, 100))
-
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-
-            if capture_started:
-                img_count += 1
-                face_image_path = os.path.join(student_path, f"{img_count}.jpg")
-                cv2.imwrite(face_image_path, gray_frame[y:y+h, x:x+w])
-                print(f"✔️ Gambar ke-{img_count} berjaya disimpan!")
-
-        status_text = f"Simpan: {img_count}/{IMAGES_TO_CAPTURE}" if capture_started else "Tekan 's' untuk mula"
-        cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        cv2.imshow('Tangkapan Gambar Pelajar', frame)
-
-        if img_count >= IMAGES_TO_CAPTURE:
-            print(f"\n✅ {IMAGES_TO_CAPTURE} gambar telah berjaya ditangkap.")
-            break
-
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            print("⏹️ Proses dihentikan.")
-            break
-        elif key == ord('s') and not capture_started:
-            print("🚀 Memulakan proses tangkapan gambar...")
-            capture_started = True
-
-    video_capture.release()
-    cv2.destroyAllWindows()
-    print("Sila jalankan 'enroll_student.py' untuk daftar wajah.")
+    start_index = next_image_index(student_path)
+    if start_index > 1:
+        print(f"ℹ️ {start_index - 1} gambar sedia ada; gambar baharu ditambah selepasnya.")
+    selector = FrameSelector(MIN_SHARPNESS, MIN_DIFFERENCE, MIN_CAPTURE_INTERVAL)
+    # Gambar ditulis dan di-encode oleh thread latar belakang; gelung paparan tidak menunggu cakera atau dlib
+    writer = CaptureWriter(student_path, start_index, encode=ENCODE_DURING_CAPTURE)
+
+    try:
+        for frame in frames:
+            faces = detect_faces(face_detector, frame)
+            if capture_started and faces:
+                # Hanya wajah terbesar (pelajar yang sedang didaftarkan) dipertimbangkan
+                crop = crop_with_margin(frame, *max(faces, key=lambda f: f[2] * f[3]))
+                if selector.consider(crop):
+                    img_count += 1
+                    path = writer.submit(crop.copy())
+                    print(f"✔️ Gambar ke-{img_count} diterima ({os.path.basename(path)})")
+
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+
+            status_text = f"Simpan: {img_count}/{IMAGES_TO_CAPTURE}" if capture_started else "Tekan 's' untuk mula"
+            cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            cv2.imshow('Tangkapan Gambar Pelajar', frame)
+
+            if img_count >= IMAGES_TO_CAPTURE:
+                print(f"\n✅ {IMAGES_TO_CAPTURE} gambar telah berjaya ditangkap.")
+                break
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                print("⏹️ Proses dihentikan.")
+                break
+            elif key == ord('s') and not capture_started:
+                print("🚀 Memulakan proses tangkapan gambar...")
+                capture_started = True
+    finally:
+        frames.close()
+        cv2.destroyAllWindows()
+        print("⏳ Menunggu penulisan gambar selesai...")
+        writer.close()
+
+    print("🔍 Pemilihan frame: " + ", ".join(f"{k}={v}" for k, v in selector.counts.items()))
+    if ENCODE_DURING_CAPTURE:
+        print(f"🧮 {writer.encoded} encoding dikira semasa tangkapan ({writer.no_face} gambar tanpa wajah).")
+    print("Sila jalankan 'enroll_student.py' untuk daftar wajah (tambah --kemas-kini untuk pelajar yang sudah berdaftar).")
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -0,0 +1,140 @@
+"""
+db_schema.py - Sambungan SQLite dan migrasi skema yang dikongsi oleh semua penulis dan pembaca
+
+- connect() menggunakan pragma yang sama di semua tempat: mod WAL (pembaca tidak
+  menyekat penulis pengecam wajah), synchronous=NORMAL dan busy_timeout.
+- ensure_schema() menambah lajur 'tarikh' (YYYY-MM-DD) pada jadual 'kehadiran' supaya
+  tapisan harian boleh menggunakan indeks (WHERE tarikh = ?) dan bukannya
+  WHERE date(masa_masuk) = ? yang memaksa imbasan penuh jadual.
+- Migrasi 2 menambah jadual ringkasan (rollup) yang dikemas kini oleh trigger setiap kali
+  'kehadiran' ditambah atau dipadam (lihat attendance_rollups.py):
+    kehadiran_harian   - masuk pertama dan bilangan imbasan bagi setiap pelajar setiap hari
+    ringkasan_harian   - bilangan pelajar hadir dan imbasan bagi setiap hari
+    ringkasan_pelajar  - bilangan hari hadir dan imbasan bagi setiap pelajar
+  Jadual 'kehadiran' dianggap tambah/padam sahaja; UPDATE pada baris sedia ada tidak
+  dipantulkan (gunakan attendance_rollups.py rebuild jika perlu).
+"""
+
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 2
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",   # ~16 MB
+)
+# Bina semula semua jadual ringkasan daripada data mentah 'kehadiran'
+ROLLUP_REBUILD = (
+    "DELETE FROM kehadiran_harian",
+    "DELETE FROM ringkasan_harian",
+    "DELETE FROM ringkasan_pelajar",
+    """INSERT INTO kehadiran_harian (tarikh, id_pelajar, masa_masuk_pertama, bilangan_imbasan)
+       SELECT tarikh, id_pelajar, MIN(masa_masuk), COUNT(*) FROM kehadiran GROUP BY tarikh, id_pelajar""",
+    """INSERT INTO ringkasan_harian (tarikh, bilangan_hadir, bilangan_imbasan)
+       SELECT tarikh, COUNT(*), SUM(bilangan_imbasan) FROM kehadiran_harian GROUP BY tarikh""",
+    """INSERT INTO ringkasan_pelajar (id_pelajar, hari_hadir, bilangan_imbasan)
+       SELECT id_pelajar, COUNT(*), SUM(bilangan_imbasan) FROM kehadiran_harian GROUP BY id_pelajar""",
+)
+MIGRATIONS = {
+    1: (
+        "ALTER TABLE kehadiran ADD COLUMN tarikh TEXT",
+        "UPDATE kehadiran SET tarikh = date(masa_masuk) WHERE tarikh IS NULL",
+        # Jaring keselamatan untuk penulis yang tidak mengisi 'tarikh' secara eksplisit
+        """CREATE TRIGGER IF NOT EXISTS kehadiran_isi_tarikh AFTER INSERT ON kehadiran
+           WHEN NEW.tarikh IS NULL
+           BEGIN UPDATE kehadiran SET tarikh = date(NEW.masa_masuk) WHERE id_kehadiran = NEW.id_kehadiran; END""",
+        # Indeks meliputi (covering) untuk laporan harian: tarikh -> pelajar -> masa masuk
+        "CREATE INDEX IF NOT EXISTS idx_kehadiran_tarikh_pelajar ON kehadiran(tarikh, id_pelajar, masa_masuk)",
+        # Untuk padam pelajar (manual cascade) dan semakan rekod berganda semasa main semula spool
+        "CREATE INDEX IF NOT EXISTS idx_kehadiran_pelajar_masa ON kehadiran(id_pelajar, masa_masuk)",
+    ),
+    2: (
+        """CREATE TABLE IF NOT EXISTS kehadiran_harian (
+               tarikh TEXT NOT NULL, id_pelajar INTEGER NOT NULL, masa_masuk_pertama TEXT NOT NULL,
+               bilangan_imbasan INTEGER NOT NULL, PRIMARY KEY (tarikh, id_pelajar)) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_kehadiran_harian_pelajar ON kehadiran_harian(id_pelajar, tarikh)",
+        """CREATE TABLE IF NOT EXISTS ringkasan_harian (
+               tarikh TEXT PRIMARY KEY, bilangan_hadir INTEGER NOT NULL, bilangan_imbasan INTEGER NOT NULL) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS ringkasan_pelajar (
+               id_pelajar INTEGER PRIMARY KEY, hari_hadir INTEGER NOT NULL, bilangan_imbasan INTEGER NOT NULL)""",
+        # 'tarikh' mungkin masih NULL di sini jika penulis bergantung pada kehadiran_isi_tarikh
+        """CREATE TRIGGER IF NOT EXISTS kehadiran_rollup_tambah AFTER INSERT ON kehadiran
+           BEGIN
+               INSERT OR IGNORE INTO ringkasan_harian VALUES (COALESCE(NEW.tarikh, date(NEW.masa_masuk)), 0, 0);
+               INSERT OR IGNORE INTO ringkasan_pelajar VALUES (NEW.id_pelajar, 0, 0);
+               UPDATE ringkasan_harian SET bilangan_imbasan = bilangan_imbasan + 1,
+                   bilangan_hadir = bilangan_hadir + NOT EXISTS (SELECT 1 FROM kehadiran_harian
+                       WHERE tarikh = COALESCE(NEW.tarikh, date(NEW.masa_masuk)) AND id_pelajar = NEW.id_pelajar)
+                   WHERE tarikh = COALESCE(NEW.tarikh, date(NEW.masa_masuk));
+               UPDATE ringkasan_pelajar SET bilangan_imbasan = bilangan_imbasan + 1,
+                   hari_hadir = hari_hadir + NOT EXISTS (SELECT 1 FROM kehadiran_harian
+                       WHERE tarikh = COALESCE(NEW.tarikh, date(NEW.masa_masuk)) AND id_pelajar = NEW.id_pelajar)
+                   WHERE id_pelajar = NEW.id_pelajar;
+               INSERT INTO kehadiran_harian VALUES (COALESCE(NEW.tarikh, date(NEW.masa_masuk)), NEW.id_pelajar, NEW.masa_masuk, 1)
+                   ON CONFLICT (tarikh, id_pelajar) DO UPDATE SET bilangan_imbasan = bilangan_imbasan + 1,
+                       masa_masuk_pertama = min(masa_masuk_pertama, excluded.masa_masuk_pertama);
+           END""",
+        # Reset harian dan padam pelajar: masuk pertama dikira semula melalui indeks meliputi
+        """CREATE TRIGGER IF NOT EXISTS kehadiran_rollup_padam AFTER DELETE ON kehadiran
+           BEGIN
+               UPDATE kehadiran_harian SET bilangan_imbasan = bilangan_imbasan - 1,
+                   masa_masuk_pertama = COALESCE((SELECT MIN(masa_masuk) FROM kehadiran
+                       WHERE tarikh = OLD.tarikh AND id_pelajar = OLD.id_pelajar), masa_masuk_pertama)
+                   WHERE tarikh = OLD.tarikh AND id_pelajar = OLD.id_pelajar;
+               UPDATE ringkasan_harian SET bilangan_imbasan = bilangan_imbasan - 1,
+                   bilangan_hadir = bilangan_hadir - EXISTS (SELECT 1 FROM kehadiran_harian
+                       WHERE tarikh = OLD.tarikh AND id_pelajar = OLD.id_pelajar AND bilangan_imbasan = 0)
+                   WHERE tarikh = OLD.tarikh;
+               UPDATE ringkasan_pelajar SET bilangan_imbasan = bilangan_imbasan - 1,
+                   hari_hadir = hari_hadir - EXISTS (SELECT 1 FROM kehadiran_harian
+                       WHERE tarikh = OLD.tarikh AND id_pelajar = OLD.id_pelajar AND bilangan_imbasan = 0)
+                   WHERE id_pelajar = OLD.id_pelajar;
+               DELETE FROM kehadiran_harian WHERE tarikh = OLD.tarikh AND id_pelajar = OLD.id_pelajar AND bilangan_imbasan <= 0;
+               DELETE FROM ringkasan_harian WHERE tarikh = OLD.tarikh AND bilangan_imbasan <= 0;
+               DELETE FROM ringkasan_pelajar WHERE id_pelajar = OLD.id_pelajar AND bilangan_imbasan <= 0;
+           END""",
+    ) + ROLLUP_REBUILD,
+}
+
+_migrated = set()
+_migrate_lock = threading.Lock()   # Thread Flask / pengecam dalam proses yang sama tidak bermigrasi serentak
+
+
+def connect(db_name, **kwargs):
+    """Buka sambungan dengan pragma piawai dan pastikan skema terkini (sekali bagi setiap proses)."""
+    conn = sqlite3.connect(db_name, **kwargs)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if db_name not in _migrated:
+        with _migrate_lock:
+            if db_name not in _migrated:
+                ensure_schema(conn)
+                _migrated.add(db_name)
+    return conn
+
+
+def ensure_schema(conn):
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION: return
+    with conn:
+        # BEGIN IMMEDIATE mengambil kunci tulis sebelum membaca versi, jadi proses lain (cth. app dan
+        # pengecam yang bermula serentak pada DB v0) menunggu dan kemudian melihat skema yang sudah dimigrasi
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION: return
+        has_kehadiran = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='kehadiran'").fetchone()
+        if not has_kehadiran: return
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(kehadiran)")}
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            for statement in MIGRATIONS[target]:
+                if statement.startswith("ALTER TABLE kehadiran ADD COLUMN tarikh") and "tarikh" in columns: continue
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    conn.execute("ANALYZE")
+
+
+def tarikh_of(masa_masuk):
+    """Nilai lajur 'tarikh' bagi cap masa 'YYYY-MM-DD HH:MM:SS'."""
+    return masa_masuk[:10]
@@ -1,13 +1,15 @@
 import sqlite3
+from db_schema import connect
 import os
 import sys
+from encoding_store import EncodingStore
 
 DB_NAME = "attendance_system.db"
 
 def create_connection(db_file):
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
+        conn = connect(db_file)
     except sqlite3.Error as e:
         print(f"DB Error: {e}", file=sys.stderr)
     return conn
@@ -47,8 +49,14 @@ def delete_student_by_no_matrik(no_matrik_to_delete):
         if pelajar_deleted_count > 0:
             message = f"Kejayaan: Pelajar '{no_matrik_to_delete}' dan {kehadiran_deleted_count} rekod kehadiran berjaya dipadam."
             
-            # Cuba padam fail encoding
-            if path_encoding_to_delete and os.path.exists(path_encoding_to_delete):
+            # Encoding dalam stor ditanda sebagai dipadam (tombstone); fail .npy lama dipadam terus
+            if path_encoding_to_delete and not path_encoding_to_delete.endswith('.npy') and os.path.exists(path_encoding_to_delete):
+                try:
+                    if EncodingStore(path_encoding_to_delete).delete(student_id):
+                        message += " Encoding wajah juga berjaya dipadam dari stor."
+                except (OSError, ValueError) as e:
+                    print(f"Amaran: Gagal memadam encoding dari stor '{path_encoding_to_delete}': {e}", file=sys.stderr)
+            elif path_encoding_to_delete and os.path.exists(path_encoding_to_delete):
                 try:
                     os.remove(path_encoding_to_delete)
                     message += " Fail encoding juga berjaya dipadam."
@@ -0,0 +1,139 @@
+"""
+detection_governor.py - Gabenor skala pengesanan / kekerapan frame dan gerbang kualiti wajah
+
+DetectionGovernor menala tiga tombol supaya purata masa analisis setiap frame kekal dalam
+bajet (target_ms), berdasarkan masa peringkat yang diukur dan saiz wajah yang dilihat:
+    skala        DETECTION_SCALE (wajah kecil/jauh -> naik; wajah besar atau lebih bajet -> turun)
+    detect_every pengesanan HOG penuh setiap N frame (penjejak mengisi frame di antaranya)
+    skip         analisis hanya setiap N frame (frame lain dipaparkan dengan keputusan terakhir)
+Keputusan dibuat sekali bagi setiap tetingkap frame. Setiap penilaian ditulis ke log JSONL
+(jika log_path diberi) dan setiap perubahan dicetak, supaya ambang boleh ditala.
+
+QualityGate menolak wajah yang tidak berbaloi di-encode (encoding 128-d adalah peringkat
+paling mahal): terlalu kecil, kabur (varians Laplacian rendah) atau terlalu menoleh
+(anggaran kasar daripada landmark liveness frame sebelumnya, jika ada).
+"""
+
+import json
+import statistics
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+
+class QualityGate:
+    def __init__(self, min_size=20, min_sharpness=30.0, max_yaw=0.35):
+        self.min_size = min_size            # Tinggi wajah minimum pada skala pengesanan (piksel)
+        self.min_sharpness = min_sharpness  # Varians Laplacian minimum (kabur jika lebih rendah)
+        self.max_yaw = max_yaw              # |anjakan hidung dari tengah mata| / jarak mata
+        self.counts = Counter()
+
+    @staticmethod
+    def sharpness(rgb_small_frame, box):
+        top, right, bottom, left = box
+        crop = rgb_small_frame[max(0, top):bottom, max(0, left):right]
+        if crop.size == 0: return 0.0
+        return float(cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var())
+
+    @staticmethod
+    def yaw(landmarks):
+        """Anggaran kasar pusingan kepala: 0 = menghadap kamera, ~0.5 = profil."""
+        left_eye, right_eye = np.mean(landmarks['left_eye'], axis=0), np.mean(landmarks['right_eye'], axis=0)
+        eye_distance = abs(right_eye[0] - left_eye[0])
+        if eye_distance < 1: return 1.0
+        nose_x = np.mean(landmarks['nose_tip'], axis=0)[0]
+        return abs(nose_x - (left_eye[0] + right_eye[0]) / 2) / eye_distance
+
+    def check(self, rgb_small_frame, box, landmarks=None):
+        """Pulangkan None jika wajah lulus, atau sebab penolakan ('kecil', 'kabur', 'pose')."""
+        reason = None
+        if box[2] - box[0] < self.min_size:
+            reason = "kecil"
+        elif self.sharpness(rgb_small_frame, box) < self.min_sharpness:
+            reason = "kabur"
+        elif landmarks is not None and self.yaw(landmarks) > self.max_yaw:
+            reason = "pose"
+        self.counts[reason or "lulus"] += 1
+        return reason
+
+
+class DetectionGovernor:
+    def __init__(self, scales=(0.2, 0.25, 0.33, 0.5), scale=0.25, target_ms=80.0, min_face=40, window=30,
+                 detect_every=5, max_detect_every=10, max_skip=4, log_path=None):
+        self.scales = sorted(scales)
+        self.index = min(range(len(self.scales)), key=lambda i: abs(self.scales[i] - scale))
+        self.target_ms = target_ms          # Bajet purata masa analisis setiap frame
+        self.min_face = min_face            # Tinggi wajah minimum yang dikesan HOG dengan baik (piksel skala pengesanan)
+        self.window = window
+        self.min_detect_every = detect_every
+        self.detect_every = detect_every
+        self.max_detect_every = max(detect_every, max_detect_every)
+        self.max_skip = max_skip
+        self.skip = 1
+        self.log_path = log_path
+        self.decisions = 0
+        self._reset_window()
+
+    @property
+    def scale(self):
+        return self.scales[self.index]
+
+    def _reset_window(self):
+        self.frame_ms, self.detect_ms, self.face_heights = [], [], []
+
+    def observe(self, frame_ms, detect_ms=None, face_heights=()):
+        """Rekod satu frame yang dianalisis. Pulangkan dict keputusan apabila tetingkap penuh, jika tidak None."""
+        self.frame_ms.append(frame_ms)
+        if detect_ms is not None: self.detect_ms.append(detect_ms)
+        self.face_heights.extend(face_heights)
+        if len(self.frame_ms) < self.window: return None
+        decision = self.decide()
+        self._reset_window()
+        return decision
+
+    def _fits(self, index, mean_frame, mean_detect):
+        # Anggaran kos pada skala lain: masa HOG berkadar dengan luas imej (skala^2)
+        ratio = (self.scales[index] / self.scale) ** 2
+        return mean_frame + mean_detect * (ratio - 1) / self.detect_every <= self.target_ms * 0.9
+
+    def decide(self):
+        mean_frame = statistics.fmean(self.frame_ms)
+        mean_detect = statistics.fmean(self.detect_ms) if self.detect_ms else mean_frame
+        heights = self.face_heights
+        median_face = statistics.median(heights) if heights else None
+        # Saiz wajah terkecil jika skala diturunkan satu langkah
+        smallest_down = min(heights) * self.scales[self.index - 1] / self.scale if heights and self.index > 0 else None
+        before = (self.scale, self.detect_every, self.skip)
+        reason = "kekal"
+        if mean_frame > self.target_ms:
+            if self.index > 0 and (smallest_down is None or smallest_down >= self.min_face * 1.2):
+                self.index -= 1; reason = "lebih bajet: turunkan skala"
+            elif self.detect_every < self.max_detect_every:
+                self.detect_every += 1; reason = "lebih bajet: kurangkan kekerapan pengesanan"
+            elif self.skip < self.max_skip:
+                self.skip += 1; reason = "lebih bajet: langkau frame"
+        elif (median_face is None or median_face < self.min_face * 1.5) and self.index < len(self.scales) - 1 \
+                and self._fits(self.index + 1, mean_frame, mean_detect):
+            self.index += 1; reason = "wajah kecil: naikkan skala" if heights else "tiada wajah: cuba skala lebih besar"
+        elif smallest_down is not None and smallest_down >= self.min_face * 3:
+            self.index -= 1; reason = "wajah besar: turunkan skala"
+        elif mean_frame < self.target_ms * 0.6:
+            if self.skip > 1:
+                self.skip -= 1; reason = "bajet berlebihan: kurangkan langkauan"
+            elif self.detect_every > self.min_detect_every:
+                self.detect_every -= 1; reason = "bajet berlebihan: lebih kerap mengesan"
+        decision = {"masa": time.strftime('%Y-%m-%d %H:%M:%S'), "sebab": reason,
+                    "skala": self.scale, "detect_every": self.detect_every, "skip": self.skip,
+                    "skala_lama": before[0], "purata_frame_ms": round(mean_frame, 2),
+                    "purata_pengesanan_ms": round(mean_detect, 2) if self.detect_ms else None,
+                    "median_wajah_px": median_face, "bilangan_wajah": len(heights), "bajet_ms": self.target_ms}
+        self.decisions += 1
+        if (self.scale, self.detect_every, self.skip) != before:
+            print(f"⚙️ Gabenor: {reason} | skala {before[0]:g}->{self.scale:g}, detect_every {before[1]}->{self.detect_every}, "
+                  f"skip {before[2]}->{self.skip} | frame {mean_frame:.1f} ms / bajet {self.target_ms:g} ms")
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+        return decision
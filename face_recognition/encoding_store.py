@@ -0,0 +1,268 @@
+"""
+encoding_store.py - Stor encoding wajah tunggal yang dipetakan ke memori (memory-mapped)
+
+Menggantikan satu fail encodings/<no_matrik>.npy bagi setiap pelajar dengan satu fail:
+
+    [pengepala 64 bait][id_pelajar int64 x kapasiti][hidup uint8 x kapasiti]
+    [skala float32 x kapasiti][matriks dtype x kapasiti x dim]
+
+- Pendaftaran menambah (append) satu baris; kapasiti digandakan apabila penuh.
+- Pemadaman hanya menanda baris sebagai mati (tombstone); 'compact' menuntut semula ruang.
+- Matriks boleh disimpan sebagai float32, float16 atau int8 (dikuantum dengan skala per baris).
+- Pengecam memetakan fail tanpa salinan (np.memmap) semasa permulaan.
+
+CARA GUNA:
+$ python encoding_store.py migrate      # Pindahkan fail .npy sedia ada ke dalam stor
+$ python encoding_store.py compact      # Buang baris yang telah dipadam
+$ python encoding_store.py info
+"""
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+from db_schema import connect
+
+try:
+    import fcntl
+except ImportError:  # Windows: tiada penguncian fail antara proses
+    fcntl = None
+
+DEFAULT_STORE_PATH = "encodings.dcas"
+MAGIC, VERSION = b'DCASENC1', 1
+HEADER = struct.Struct('<8sIIIQQ')   # magic, versi, dim, kod dtype, bilangan baris, kapasiti
+HEADER_SIZE = 64
+DTYPES = {0: np.float32, 1: np.float16, 2: np.int8}
+DTYPE_CODES = {'float32': 0, 'float16': 1, 'int8': 2}
+
+
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class EncodingStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, dtype='float32', dim=128, initial_capacity=256):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, DTYPE_CODES[dtype], dim, initial_capacity)
+        self._read_header()
+
+    # ------------------------------------------------------------------ susun atur fail
+    def _create(self, path, dtype_code, dim, capacity):
+        layout = self._layout(dtype_code, dim, capacity)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, dim, dtype_code, 0, capacity).ljust(HEADER_SIZE, b'\0'))
+            f.truncate(layout['end'])
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _layout(dtype_code, dim, capacity):
+        ids = HEADER_SIZE
+        alive = ids + 8 * capacity
+        scales = _align(alive + capacity, 4)
+        matrix = _align(scales + 4 * capacity)
+        end = matrix + capacity * dim * np.dtype(DTYPES[dtype_code]).itemsize
+        return {'ids': ids, 'alive': alive, 'scales': scales, 'matrix': matrix, 'end': end}
+
+    def _read_header(self):
+        with open(self.path, 'rb') as f:
+            magic, version, dim, dtype_code, count, capacity = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{self.path}' bukan fail stor encoding yang sah.")
+        self.dim, self.dtype_code, self.count, self.capacity = dim, dtype_code, count, capacity
+        self.dtype = DTYPES[dtype_code]
+        self.layout = self._layout(dtype_code, dim, capacity)
+
+    def _columns(self, mode='r'):
+        lay, cap = self.layout, self.capacity
+        mm = np.memmap(self.path, dtype=np.uint8, mode=mode)
+        ids = mm[lay['ids']:lay['alive']].view(np.int64)
+        alive = mm[lay['alive']:lay['alive'] + cap]
+        scales = mm[lay['scales']:lay['scales'] + 4 * cap].view(np.float32)
+        matrix = mm[lay['matrix']:lay['end']].view(self.dtype).reshape(cap, self.dim)
+        return mm, ids, alive, scales, matrix
+
+    def _write_count(self, count):
+        with open(self.path, 'r+b') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.dim, self.dtype_code, count, self.capacity))
+            f.flush(); os.fsync(f.fileno())
+        self.count = count
+
+    def _lock(self):
+        lock_file = open(self.path + ".lock", 'a')
+        if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    # ------------------------------------------------------------------ operasi
+    def _quantize(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if self.dtype is np.int8:
+            scales = np.maximum(np.abs(encodings).max(axis=1), 1e-12) / 127.0
+            return np.round(encodings / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return encodings.astype(self.dtype), np.ones(len(encodings), dtype=np.float32)
+
+    def append_many(self, student_ids, encodings):
+        """Tambah beberapa baris sekaligus (satu fsync). Baris hanya kelihatan selepas kiraan pengepala dikemas kini."""
+        student_ids = list(student_ids)
+        if not student_ids: return
+        lock = self._lock()
+        try:
+            self._read_header()
+            self._append_locked(student_ids, encodings)
+        finally:
+            lock.close()
+
+    def _append_locked(self, student_ids, encodings):
+        if self.count + len(student_ids) > self.capacity:
+            self._rewrite(max(self.capacity * 2, self.count + len(student_ids)), keep_dead=True)
+        values, scales = self._quantize(encodings)
+        mm, ids_col, alive_col, scales_col, matrix = self._columns('r+')
+        start, end = self.count, self.count + len(student_ids)
+        ids_col[start:end] = student_ids; scales_col[start:end] = scales
+        matrix[start:end] = values; alive_col[start:end] = 1
+        mm.flush(); del mm, ids_col, alive_col, scales_col, matrix
+        self._write_count(end)
+
+    def append(self, student_id, encoding):
+        self.append_many([student_id], [encoding])
+
+    def replace(self, student_id, encoding):
+        """
+        Gantikan encoding pelajar (daftar semula): baris baharu ditambah dahulu, kemudian baris lama
+        ditanda mati. Jika terganggu di antaranya, lookup() tetap memulangkan baris terkini.
+        """
+        lock = self._lock()
+        try:
+            self._read_header()
+            self._append_locked([student_id], [encoding])
+            mm, ids_col, alive_col, _, _ = self._columns('r+')
+            old = np.flatnonzero((ids_col[:self.count - 1] == student_id) & (alive_col[:self.count - 1] == 1))
+            alive_col[old] = 0
+            mm.flush()
+            return len(old)
+        finally:
+            lock.close()
+
+    def delete(self, student_id):
+        """Tanda semua baris bagi pelajar ini sebagai dipadam. Pulangkan bilangan baris yang ditanda."""
+        lock = self._lock()
+        try:
+            self._read_header()
+            mm, ids_col, alive_col, _, _ = self._columns('r+')
+            hits = np.flatnonzero((ids_col[:self.count] == student_id) & (alive_col[:self.count] == 1))
+            alive_col[hits] = 0
+            mm.flush()
+            return len(hits)
+        finally:
+            lock.close()
+
+    def load(self):
+        """
+        Pulangkan (ids, matriks float32) bagi baris yang masih hidup. Bagi stor float32
+        tanpa baris mati, matriks ialah paparan terus ke atas fail yang dipetakan (tiada salinan).
+        """
+        self._read_header()
+        _, ids_col, alive_col, scales_col, matrix = self._columns('r')
+        n = self.count
+        live = np.flatnonzero(alive_col[:n])
+        if len(live) == n:
+            ids, values, scales = ids_col[:n], matrix[:n], scales_col[:n]
+        else:
+            ids, values, scales = ids_col[live], matrix[live], scales_col[live]
+        if self.dtype is np.int8:
+            values = values.astype(np.float32) * scales[:, None]
+        elif self.dtype is not np.float32:
+            values = values.astype(np.float32)
+        return np.asarray(ids), values
+
+    def lookup(self, student_ids):
+        """Pulangkan {id_pelajar: encoding float32} bagi baris hidup terkini pelajar yang diminta sahaja."""
+        self._read_header()
+        _, ids_col, alive_col, scales_col, matrix = self._columns('r')
+        n = self.count
+        rows = np.flatnonzero(np.isin(ids_col[:n], list(student_ids)) & (alive_col[:n] == 1))
+        found = {}
+        for row in rows:   # Baris kemudian menggantikan baris awal bagi id yang sama
+            vector = matrix[row].astype(np.float32)
+            found[int(ids_col[row])] = vector * scales_col[row] if self.dtype is np.int8 else vector
+        return found
+
+    def ids_since(self, row):
+        """Pulangkan (bilangan baris, {id pelajar}) bagi baris hidup yang ditambah selepas baris ke-'row'."""
+        self._read_header()
+        _, ids_col, alive_col, _, _ = self._columns('r')
+        n = self.count
+        if row >= n: return n, set()
+        return n, {int(sid) for sid in ids_col[row:n][alive_col[row:n] == 1]}
+
+    def stats(self):
+        self._read_header()
+        _, _, alive_col, _, _ = self._columns('r')
+        live = int(alive_col[:self.count].sum())
+        return {"baris": self.count, "hidup": live, "dipadam": self.count - live, "kapasiti": self.capacity,
+                "dtype": np.dtype(self.dtype).name, "saiz_bait": os.path.getsize(self.path)}
+
+    def compact(self):
+        """Tulis semula stor dengan hanya baris yang masih hidup."""
+        lock = self._lock()
+        try:
+            self._read_header()
+            _, _, alive_col, _, _ = self._columns('r')
+            live = int(alive_col[:self.count].sum()); del alive_col
+            self._rewrite(max(256, live), keep_dead=False)
+        finally:
+            lock.close()
+
+    def _rewrite(self, capacity, keep_dead):
+        _, ids_col, alive_col, scales_col, matrix = self._columns('r')
+        rows = np.arange(self.count) if keep_dead else np.flatnonzero(alive_col[:self.count])
+        tmp_path = self.path + ".compact"
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        self._create(tmp_path, self.dtype_code, self.dim, capacity)
+        new = EncodingStore.__new__(EncodingStore); new.path = tmp_path; new._read_header()
+        mm, n_ids, n_alive, n_scales, n_matrix = new._columns('r+')
+        k = len(rows)
+        n_ids[:k] = ids_col[rows]; n_alive[:k] = alive_col[rows]; n_scales[:k] = scales_col[rows]; n_matrix[:k] = matrix[rows]
+        mm.flush(); del mm, n_ids, n_alive, n_scales, n_matrix
+        new._write_count(k)
+        del ids_col, alive_col, scales_col, matrix
+        # Penggantian atomik: pembaca yang sudah memetakan fail lama terus melihat inode lama
+        os.replace(tmp_path, self.path)
+        self._read_header()
+
+
+def migrate_npy(db_name, store_path=DEFAULT_STORE_PATH, dtype='float32'):
+    """Pindahkan encoding .npy yang dirujuk oleh jadual 'pelajar' ke dalam stor dan kemas kini laluannya."""
+    conn = connect(db_name)
+    try:
+        rows = conn.execute("SELECT id_pelajar, path_encoding_wajah FROM pelajar").fetchall()
+        legacy = [(sid, path) for sid, path in rows if path and path.endswith('.npy') and os.path.exists(path)]
+        if not legacy:
+            print("Tiada fail .npy untuk dipindahkan."); return 0
+        store = EncodingStore(store_path, dtype=dtype)
+        store.append_many([sid for sid, _ in legacy], [np.load(path) for _, path in legacy])
+        with conn:
+            conn.executemany("UPDATE pelajar SET path_encoding_wajah = ? WHERE id_pelajar = ?", [(store_path, sid) for sid, _ in legacy])
+        print(f"✅ {len(legacy)} encoding dipindahkan ke '{store_path}'. Fail .npy asal tidak dipadam.")
+        return len(legacy)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "compact", "info"):
+        print("Penggunaan: python encoding_store.py migrate|compact|info [float32|float16|int8]", file=sys.stderr)
+        sys.exit(1)
+    command = sys.argv[1]
+    if command == "migrate":
+        migrate_npy("attendance_system.db", dtype=sys.argv[2] if len(sys.argv) > 2 else 'float32')
+    elif not os.path.exists(DEFAULT_STORE_PATH):
+        print(f"Stor '{DEFAULT_STORE_PATH}' tidak wujud.", file=sys.stderr); sys.exit(1)
+    elif command == "compact":
+        store = EncodingStore(DEFAULT_STORE_PATH); before = store.stats()["saiz_bait"]
+        store.compact(); print(f"✅ Stor dipadatkan: {before} -> {store.stats()['saiz_bait']} bait.")
+    else:
+        print(EncodingStore(DEFAULT_STORE_PATH).stats())
@@ -1,83 +1,96 @@
 import sqlite3
-import face_recognition
+from db_schema import connect
 import os
-import numpy as np
 import re
 import sys 
+from encoding_store import EncodingStore, DEFAULT_STORE_PATH
+import enrollment_cache
 
 DB_NAME = "attendance_system.db"
 DATASET_BASE_DIR = "dataset"
-ENCODINGS_DIR = "encodings"
+ENCODING_STORE_PATH = DEFAULT_STORE_PATH
 
 def create_connection(db_file):
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
+        conn = connect(db_file)
     except sqlite3.Error as e:
         print(f"DB Error: {e}", file=sys.stderr)
     return conn
 
 def get_representative_encoding(image_paths):
-    all_encodings = []
-    for image_path in image_paths:
-        try:
-            image = face_recognition.load_image_file(image_path)
-            encodings = face_recognition.face_encodings(image)
-            if encodings:
-                all_encodings.append(encodings[0])
-            else:
-                # Cetak amaran ke stderr supaya tidak mengganggu output kejayaan
-                print(f"Amaran: Tiada wajah dikesan dalam {image_path}", file=sys.stderr)
-        except Exception as e:
-            print(f"Amaran: Tidak dapat memproses {image_path}: {e}", file=sys.stderr)
-
-    if not all_encodings:
+    # Encoding yang sudah dikira semasa tangkapan (manifest folder) digunakan semula; hanya gambar baharu di-encode
+    if not image_paths:
         return None
-    return np.mean(all_encodings, axis=0)
+    encoding, stats = enrollment_cache.representative_encoding(os.path.dirname(image_paths[0]), image_paths)
+    print(f"Info: {stats.get('cache', 0)} encoding dari cache, {stats.get('baharu', 0)} gambar baharu di-encode.", file=sys.stderr)
+    return encoding
 
-def enroll_student_data(nama_pelajar, no_matrik):
-    """Fungsi ini melakukan logik pendaftaran dan mengembalikan (Berjaya?, Mesej)."""
+def enroll_student_data(nama_pelajar, no_matrik, update=False):
+    """Fungsi ini melakukan logik pendaftaran dan mengembalikan (Berjaya?, Mesej). update=True: daftar semula pelajar sedia ada."""
     conn = create_connection(DB_NAME)
     if not conn:
         return False, "Gagal menyambung ke pangkalan data."
 
     cursor = conn.cursor()
     cursor.execute("SELECT id_pelajar FROM pelajar WHERE no_matrik = ?", (no_matrik,))
-    if cursor.fetchone():
+    existing = cursor.fetchone()
+    if existing and not update:
         conn.close()
         return False, f"Ralat: Pelajar dengan nombor matrik '{no_matrik}' sudah wujud."
+    if update and not existing:
+        conn.close()
+        return False, f"Ralat: Pelajar dengan nombor matrik '{no_matrik}' tidak ditemui untuk dikemas kini."
 
     safe_folder_name = re.sub(r'[\s\W]+', '_', nama_pelajar)
     student_image_folder = os.path.join(DATASET_BASE_DIR, safe_folder_name)
     
     if not os.path.isdir(student_image_folder):
+        conn.close()
         return False, f"Ralat: Folder gambar '{student_image_folder}' tidak ditemui. Pastikan anda telah menjalankan 'Ambil Gambar Wajah' dahulu untuk '{nama_pelajar}'."
 
-    image_files = [os.path.join(student_image_folder, f) for f in os.listdir(student_image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    image_files = sorted(os.path.join(student_image_folder, f) for f in os.listdir(student_image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
     if not image_files:
+        conn.close()
         return False, f"Ralat: Tiada gambar ditemui dalam folder '{student_image_folder}'."
 
     representative_encoding = get_representative_encoding(image_files)
     if representative_encoding is None:
+        conn.close()
         return False, f"Gagal mendapatkan encoding wajah untuk '{nama_pelajar}'. Pastikan gambar yang diambil berkualiti dan jelas."
     
-    os.makedirs(ENCODINGS_DIR, exist_ok=True)
-    encoding_filepath = os.path.join(ENCODINGS_DIR, f"{no_matrik}.npy")
-    np.save(encoding_filepath, representative_encoding)
+    if existing:
+        return update_student_encoding(conn, existing[0], nama_pelajar, no_matrik, representative_encoding)
 
+    student_id = None
     try:
         sql = '''INSERT INTO pelajar(nama_pelajar, no_matrik, path_encoding_wajah) VALUES(?,?,?)'''
-        cursor.execute(sql, (nama_pelajar, no_matrik, encoding_filepath))
+        cursor.execute(sql, (nama_pelajar, no_matrik, ENCODING_STORE_PATH))
+        student_id = cursor.lastrowid
+        # Tambah encoding ke stor sebelum commit supaya baris 'pelajar' tidak wujud tanpa encoding
+        EncodingStore(ENCODING_STORE_PATH).append(student_id, representative_encoding)
         conn.commit()
         message = f"Kejayaan: Pelajar '{nama_pelajar}' ({no_matrik}) berjaya didaftarkan."
         conn.close()
         return True, message
-    except sqlite3.Error as e:
-        conn.close()
-        if os.path.exists(encoding_filepath):
-            os.remove(encoding_filepath)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        conn.rollback(); conn.close()
+        if student_id is not None and os.path.exists(ENCODING_STORE_PATH):
+            EncodingStore(ENCODING_STORE_PATH).delete(student_id)
         return False, f"Ralat pangkalan data: {e}"
 
+def update_student_encoding(conn, student_id, nama_pelajar, no_matrik, representative_encoding):
+    """Gantikan encoding pelajar sedia ada. RosterWatcher pengecam yang sedang berjalan mengesan baris stor baharu."""
+    try:
+        EncodingStore(ENCODING_STORE_PATH).replace(student_id, representative_encoding)
+        with conn:   # Pelajar lama mungkin masih merujuk fail .npy
+            conn.execute("UPDATE pelajar SET path_encoding_wajah = ? WHERE id_pelajar = ?", (ENCODING_STORE_PATH, student_id))
+        return True, f"Kejayaan: Encoding pelajar '{nama_pelajar}' ({no_matrik}) berjaya dikemas kini."
+    except (sqlite3.Error, OSError, ValueError) as e:
+        return False, f"Ralat semasa mengemas kini encoding: {e}"
+    finally:
+        conn.close()
+
 # ==============================================================================
 # BLOK UTAMA YANG DIJALANKAN APABILA DIPANGGIL OLEH app.py
 # ==============================================================================
@@ -86,16 +99,17 @@ if __name__ == '__main__':
     # sys.argv[0] = enroll_student.py (nama skrip)
     # sys.argv[1] = nama_pelajar
     # sys.argv[2] = no_matrik
-    if len(sys.argv) != 3:
+    # sys.argv[3] = --kemas-kini (pilihan: daftar semula dengan gambar tambahan)
+    if len(sys.argv) not in (3, 4) or (len(sys.argv) == 4 and sys.argv[3] != "--kemas-kini"):
         # Hantar mesej ralat ke stderr supaya Flask boleh tangkap sebagai ralat
-        print("Penggunaan: python enroll_student.py \"Nama Pelajar\" \"NoMatrik\"", file=sys.stderr)
+        print("Penggunaan: python enroll_student.py \"Nama Pelajar\" \"NoMatrik\" [--kemas-kini]", file=sys.stderr)
         sys.exit(1) # Keluar dengan kod ralat
 
     nama_pelajar_arg = sys.argv[1]
     no_matrik_arg = sys.argv[2]
     
     # Panggil fungsi utama dengan argumen yang diterima
-    success, message = enroll_student_data(nama_pelajar_arg, no_matrik_arg)
+    success, message = enroll_student_data(nama_pelajar_arg, no_matrik_arg, update=len(sys.argv) == 4)
 
     if success:
         # Jika berjaya, cetak mesej ke stdout. Flask akan tangkap ini sebagai mesej kejayaan.
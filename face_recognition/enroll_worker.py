@@ -0,0 +1,262 @@
+"""
+enroll_worker.py - Perkhidmatan pekerja 'panas' untuk pendaftaran dan pemadaman pelajar
+
+Sebelum ini panel kawalan (app.py) melancarkan enroll_student.py / delete_student.py dengan
+subprocess.run bagi setiap klik: setiap kali membayar kos import Python + dlib +
+face_recognition dan thread permintaan Flask tersekat sepanjang pendaftaran.
+
+Perkhidmatan ini dijalankan sekali, memuatkan model lebih awal dan menerima kerja melalui
+API HTTP tempatan:
+    POST /kerja            {"jenis": "enroll"|"reenroll"|"delete", "nama_pelajar": ..., "no_matrik": ...} -> 202 {"id": ...}
+    GET  /kerja/<id>       status dan keputusan satu kerja
+    GET  /kerja?had=20     kerja terkini
+Setiap jenis kerja mempunyai baris gilir dan had keserentakan sendiri. Status dan keputusan
+disimpan dalam SQLite (JOBS_DB) supaya UI boleh meninjau (poll) walaupun selepas restart;
+kerja yang belum selesai semasa perkhidmatan berhenti dijalankan semula apabila ia bermula.
+
+Fungsi klien (submit_job, job_status) tidak mengimport face_recognition, jadi selamat
+digunakan dari app.py.
+
+CARA GUNA:
+$ python enroll_worker.py --port 5057
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+from db_schema import connect
+
+WORKER_URL = "http://127.0.0.1:5057"
+JOBS_DB = "enroll_jobs.db"
+CONCURRENCY = {"enroll": 2, "reenroll": 1, "delete": 1}   # Had keserentakan bagi setiap jenis kerja
+MAX_PENDING = 50                           # Kerja menunggu maksimum bagi setiap jenis
+REQUIRED_FIELDS = {"enroll": ("nama_pelajar", "no_matrik"), "reenroll": ("nama_pelajar", "no_matrik"), "delete": ("no_matrik",)}
+
+JOBS_SCHEMA = """CREATE TABLE IF NOT EXISTS kerja (
+    id TEXT PRIMARY KEY, jenis TEXT NOT NULL, parameter TEXT NOT NULL, status TEXT NOT NULL,
+    berjaya INTEGER, mesej TEXT, dicipta TEXT NOT NULL, mula TEXT, tamat TEXT, tempoh_s REAL)"""
+JOB_COLUMNS = ("id", "jenis", "parameter", "status", "berjaya", "mesej", "dicipta", "mula", "tamat", "tempoh_s")
+
+
+# ------------------------------------------------------------------------------
+# Klien (digunakan oleh app.py)
+# ------------------------------------------------------------------------------
+def _request(method, path, payload=None, url=WORKER_URL, timeout=2.0):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        # Ralat aplikasi (400/409/503) mempunyai badan JSON dengan 'mesej'
+        return json.loads(e.read().decode('utf-8') or '{}') | {"kod": e.code}
+
+
+def submit_job(jenis, url=WORKER_URL, **params):
+    """Hantar kerja. Pulangkan dict kerja (dengan 'id'), atau dict dengan 'kod' jika ditolak. URLError jika pekerja tidak berjalan."""
+    return _request("POST", "/kerja", {"jenis": jenis, **params}, url=url)
+
+
+def job_status(job_id, url=WORKER_URL):
+    return _request("GET", f"/kerja/{job_id}", url=url)
+
+
+# ------------------------------------------------------------------------------
+# Perkhidmatan
+# ------------------------------------------------------------------------------
+class JobStore:
+    """Simpanan kekal status kerja (satu sambungan, dilindungi kunci)."""
+
+    def __init__(self, path):
+        self._conn = connect(path, check_same_thread=False)
+        self._conn.execute(JOBS_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _row(self, row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["parameter"] = json.loads(job["parameter"])
+        if job["berjaya"] is not None: job["berjaya"] = bool(job["berjaya"])
+        return job
+
+    def create(self, jenis, params):
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO kerja(id, jenis, parameter, status, dicipta) VALUES (?, ?, ?, 'menunggu', ?)",
+                               (job_id, jenis, json.dumps(params, ensure_ascii=False), _now()))
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE kerja SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                               (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM kerja WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def recent(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM kerja ORDER BY dicipta DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM kerja WHERE status IN ('menunggu', 'berjalan') ORDER BY dicipta").fetchall()
+        return [self._row(row) for row in rows]
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def load_handlers():
+    """Import modul berat sekali sahaja (model dlib dimuatkan semasa import face_recognition)."""
+    import numpy as np
+    import face_recognition
+    import enroll_student
+    import delete_student
+    face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))   # Panaskan pengesan HOG
+    return {
+        "enroll": lambda p: enroll_student.enroll_student_data(p["nama_pelajar"], p["no_matrik"]),
+        "reenroll": lambda p: enroll_student.enroll_student_data(p["nama_pelajar"], p["no_matrik"], update=True),
+        "delete": lambda p: delete_student.delete_student_by_no_matrik(p["no_matrik"]),
+    }
+
+
+class EnrollWorker:
+    def __init__(self, handlers, jobs_db=JOBS_DB, concurrency=None, max_pending=MAX_PENDING):
+        self.handlers = handlers
+        self.store = JobStore(jobs_db)
+        self.concurrency = concurrency or CONCURRENCY
+        self.queues = {jenis: queue.Queue(maxsize=max_pending) for jenis in handlers}
+        self._active = set()             # no_matrik dengan kerja yang belum selesai
+        self._active_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for job in self.store.unfinished():
+            print(f"🔁 Menyambung semula kerja {job['id']} ({job['jenis']}) yang terganggu.")
+            try: self._enqueue(job); self._active.add(job["parameter"].get("no_matrik"))
+            except queue.Full: self.store.update(job["id"], status="gagal", berjaya=0, mesej="Baris gilir penuh semasa restart.", tamat=_now())
+        for jenis in self.handlers:
+            for i in range(self.concurrency.get(jenis, 1)):
+                thread = threading.Thread(target=self._run, args=(jenis,), name=f"kerja-{jenis}-{i}", daemon=True)
+                thread.start(); self._threads.append(thread)
+        return self
+
+    def _enqueue(self, job):
+        self.queues[job["jenis"]].put_nowait(job["id"])
+
+    def submit(self, payload):
+        """Pulangkan (kod HTTP, badan)."""
+        jenis = payload.get("jenis")
+        if jenis not in self.handlers:
+            return 400, {"mesej": f"Jenis kerja '{jenis}' tidak dikenali."}
+        params = {k: str(payload.get(k) or '').strip() for k in REQUIRED_FIELDS[jenis]}
+        missing = [k for k, v in params.items() if not v]
+        if missing:
+            return 400, {"mesej": f"Medan diperlukan: {', '.join(missing)}."}
+        with self._active_lock:
+            if params["no_matrik"] in self._active:
+                return 409, {"mesej": f"Kerja untuk '{params['no_matrik']}' sedang diproses."}
+            if self.queues[jenis].full():
+                return 503, {"mesej": "Baris gilir penuh. Cuba sebentar lagi."}
+            self._active.add(params["no_matrik"])
+        job = self.store.create(jenis, params)
+        try:
+            self._enqueue(job)
+        except queue.Full:
+            with self._active_lock: self._active.discard(params["no_matrik"])
+            self.store.update(job["id"], status="gagal", berjaya=0, mesej="Baris gilir penuh.", tamat=_now())
+            return 503, {"mesej": "Baris gilir penuh. Cuba sebentar lagi."}
+        job["kedudukan"] = self.queues[jenis].qsize()
+        return 202, job
+
+    def _run(self, jenis):
+        handler = self.handlers[jenis]
+        while True:
+            job_id = self.queues[jenis].get()
+            job = self.store.get(job_id)
+            self.store.update(job_id, status="berjalan", mula=_now())
+            start = time.perf_counter()
+            try:
+                success, message = handler(job["parameter"])
+            except Exception as e:
+                success, message = False, f"Ralat tidak dijangka: {e}"
+            elapsed = time.perf_counter() - start
+            self.store.update(job_id, status="selesai" if success else "gagal", berjaya=int(success),
+                              mesej=message, tamat=_now(), tempoh_s=round(elapsed, 3))
+            with self._active_lock: self._active.discard(job["parameter"].get("no_matrik"))
+            print(f"{'✅' if success else '❌'} [{jenis}] {job_id} ({elapsed:.2f} s): {message}")
+
+
+def serve(worker, host, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(code); self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data))); self.end_headers(); self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/kerja": return self._send(404, {"mesej": "Tidak ditemui."})
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'{}')
+            except ValueError:
+                return self._send(400, {"mesej": "JSON tidak sah."})
+            self._send(*worker.submit(payload))
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path == "/kerja":
+                try: limit = int(dict(p.split("=", 1) for p in query.split("&") if "=" in p).get("had", 20))
+                except ValueError: limit = 20
+                return self._send(200, {"kerja": worker.store.recent(limit)})
+            if path.startswith("/kerja/"):
+                job = worker.store.get(path[len("/kerja/"):])
+                return self._send(200, job) if job else self._send(404, {"mesej": "Kerja tidak ditemui."})
+            self._send(404, {"mesej": "Tidak ditemui."})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"✅ Pekerja pendaftaran sedia di http://{host}:{port} (keserentakan: {worker.concurrency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nℹ️ Pekerja dihentikan.")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Perkhidmatan pekerja pendaftaran/pemadaman pelajar")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--enroll-workers", type=int, default=CONCURRENCY["enroll"])
+    parser.add_argument("--jobs-db", default=JOBS_DB)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        handlers = load_handlers()
+    except ImportError as e:
+        print(f"❌ Gagal memuatkan modul pendaftaran: {e}", file=sys.stderr); sys.exit(1)
+    print(f"🔄 Model dimuatkan dalam {time.perf_counter() - t0:.1f} s.")
+    worker = EnrollWorker(handlers, jobs_db=args.jobs_db,
+                          concurrency={**CONCURRENCY, "enroll": args.enroll_workers}).start()
+    serve(worker, args.host, args.port)
@@ -0,0 +1,179 @@
+"""
+enrollment_cache.py - Tangkapan pendaftaran berstrim: pemilihan frame, penulis latar belakang dan cache encoding
+
+- FrameSelector memilih hanya keratan wajah yang tajam dan cukup berbeza daripada keratan yang
+  sudah diterima (lakaran kecil skala kelabu), dengan jarak masa minimum, supaya 30 gambar tidak
+  diambil dalam satu saat daripada frame yang hampir sama.
+- CaptureWriter menulis JPEG dan mengira encoding 128-d dalam thread latar belakang (gelung
+  paparan capture_images.py tidak pernah menunggu cv2.imwrite atau dlib). Encoding dikira daripada
+  fail JPEG yang ditulis melalui encode_image(), laluan yang sama dengan enroll_student.py, jadi
+  manifest yang dibina secara berperingkat sama dengan binaan semula penuh.
+- Setiap folder pelajar mempunyai manifest (encodings.jsonl): satu baris JSON bagi setiap gambar
+  dengan saiz, masa ubah suai dan encoding. enroll_student.py hanya meng-encode gambar yang belum
+  ada dalam manifest (cth. gambar tambahan untuk daftar semula) dan memuktamadkan purata vektor
+  yang sudah dikira, tanpa membaca dan menyahkod semula semua gambar.
+"""
+
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+MANIFEST_NAME = "encodings.jsonl"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, int(stat.st_mtime)
+
+
+def load_manifest(folder):
+    """Pulangkan {nama fail: rekod} daripada manifest folder (rekod terkini menang)."""
+    manifest, path = {}, os.path.join(folder, MANIFEST_NAME)
+    if not os.path.exists(path): return manifest
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try: record = json.loads(line)
+            except ValueError: continue   # Baris terakhir mungkin separuh ditulis
+            manifest[record["fail"]] = record
+    return manifest
+
+
+def append_manifest(folder, entries):
+    """entries: senarai (laluan gambar, encoding atau None jika tiada wajah)."""
+    with open(os.path.join(folder, MANIFEST_NAME), 'a', encoding='utf-8') as f:
+        for path, encoding in entries:
+            size, mtime = _file_key(path)
+            f.write(json.dumps({"fail": os.path.basename(path), "saiz": size, "mtime": mtime,
+                                "encoding": None if encoding is None else np.round(encoding, 6).tolist()}) + "\n")
+
+
+def cached_record(manifest, path):
+    """Rekod manifest bagi gambar jika masih sah (saiz dan masa ubah suai sama), jika tidak None."""
+    record = manifest.get(os.path.basename(path))
+    return record if record is not None and (record["saiz"], record["mtime"]) == _file_key(path) else None
+
+
+def next_image_index(folder):
+    """Nombor gambar seterusnya: gambar tambahan disimpan selepas gambar sedia ada, bukan menimpanya."""
+    numbers = [int(name.split('.')[0]) for name in os.listdir(folder) if re.fullmatch(r'\d+\.jpe?g', name.lower())]
+    return max(numbers, default=0) + 1
+
+
+def encode_image(face_recognition, path):
+    """Encoding wajah pertama dalam fail gambar (atau None). Satu-satunya laluan encoding bagi manifest."""
+    encodings = face_recognition.face_encodings(face_recognition.load_image_file(path))
+    return encodings[0] if encodings else None
+
+
+def representative_encoding(folder, image_paths=None):
+    """
+    Purata encoding bagi gambar dalam folder. Hanya gambar yang tiada (atau berubah) dalam manifest
+    di-encode; hasilnya ditambah ke manifest. Pulangkan (encoding atau None, statistik).
+    """
+    import face_recognition
+    if image_paths is None:
+        image_paths = [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    manifest = load_manifest(folder)
+    vectors, fresh, stats = [], [], Counter()
+    for path in image_paths:
+        record = cached_record(manifest, path)
+        if record is not None:
+            stats["cache"] += 1
+            if record["encoding"] is not None: vectors.append(record["encoding"])
+            continue
+        try:
+            encoding = encode_image(face_recognition, path)
+        except Exception as e:
+            print(f"Amaran: Tidak dapat memproses {path}: {e}", file=sys.stderr); stats["gagal"] += 1; continue
+        stats["baharu"] += 1
+        fresh.append((path, encoding))
+        if encoding is not None: vectors.append(encoding)
+        else: print(f"Amaran: Tiada wajah dikesan dalam {path}", file=sys.stderr)
+    if fresh: append_manifest(folder, fresh)
+    stats["vektor"] = len(vectors)
+    return (np.mean(np.asarray(vectors, dtype=np.float64), axis=0) if vectors else None), dict(stats)
+
+
+class FrameSelector:
+    def __init__(self, min_sharpness=60.0, min_difference=10.0, min_interval=0.2, thumb_size=24):
+        self.min_sharpness = min_sharpness    # Varians Laplacian minimum (pada keratan 96x96)
+        self.min_difference = min_difference  # Purata beza mutlak minimum lakaran berbanding setiap keratan diterima
+        self.min_interval = min_interval      # Jarak masa minimum antara dua keratan diterima (saat)
+        self.thumb_size = thumb_size
+        self.thumbs = []
+        self.counts = Counter()
+        self._last = 0.0
+
+    def consider(self, crop_bgr, now=None):
+        """Pulangkan True jika keratan patut disimpan (dan merekodkannya sebagai diterima)."""
+        now = time.monotonic() if now is None else now
+        reason = None
+        if now - self._last < self.min_interval:
+            reason = "terlalu_cepat"
+        else:
+            gray = cv2.cvtColor(cv2.resize(crop_bgr, (96, 96)), cv2.COLOR_BGR2GRAY)
+            thumb = cv2.resize(gray, (self.thumb_size, self.thumb_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+            thumb -= thumb.mean()   # Abaikan perubahan kecerahan menyeluruh
+            if cv2.Laplacian(gray, cv2.CV_64F).var() < self.min_sharpness:
+                reason = "kabur"
+            elif self.thumbs and min(float(np.abs(thumb - t).mean()) for t in self.thumbs) < self.min_difference:
+                reason = "serupa"
+        self.counts[reason or "diterima"] += 1
+        if reason: return False
+        self.thumbs.append(thumb); self._last = now
+        return True
+
+
+class CaptureWriter:
+    def __init__(self, folder, start_index=1, encode=True):
+        self.folder = folder
+        self.next_index = start_index
+        self.encode = encode
+        self.written = self.encoded = self.no_face = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="penulis-tangkapan", daemon=True)
+        self._thread.start()
+
+    def submit(self, crop_bgr):
+        """Serahkan keratan wajah tanpa menyekat. Pulangkan laluan fail."""
+        path = os.path.join(self.folder, f"{self.next_index}.jpg"); self.next_index += 1
+        self._queue.put((path, crop_bgr))
+        return path
+
+    def close(self):
+        """Tunggu semua gambar ditulis dan di-encode."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        face_recognition = None
+        if self.encode:
+            try:
+                import face_recognition
+            except ImportError as e:   # Gambar tetap ditulis; enroll_student.py meng-encode kemudian
+                print(f"⚠️ face_recognition tidak dapat dimuatkan ({e}); gambar disimpan tanpa encoding.")
+        while True:
+            item = self._queue.get()
+            if item is None: break
+            path, crop_bgr = item
+            # Satu item yang gagal tidak boleh menamatkan thread (gambar seterusnya mesti tetap ditulis)
+            try:
+                if not cv2.imwrite(path, crop_bgr):
+                    print(f"⚠️ Gagal menulis {path}"); continue
+                self.written += 1
+                if face_recognition is None: continue
+                encoding = encode_image(face_recognition, path)
+                if encoding is None: self.no_face += 1
+                else: self.encoded += 1
+                append_manifest(self.folder, [(path, encoding)])
+            except Exception as e:
+                print(f"⚠️ Gagal memproses {path}: {e}")
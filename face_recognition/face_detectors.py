@@ -0,0 +1,149 @@
+"""
+face_detectors.py - Antara muka pengesan wajah yang boleh ditukar (HOG, CNN, Haar, DNN SSD, YuNet)
+
+Semua pengesan menerima imej RGB (seperti rgb_small_frame) dan memulangkan kotak dalam format
+face_recognition (top, right, bottom, left) pada koordinat imej itu, jadi tracker, gerbang
+kualiti dan face_encodings tidak perlu tahu pengesan mana yang digunakan.
+
+    hog    face_recognition / dlib HOG (lalai; tiada fail model tambahan)
+    cnn    face_recognition / dlib CNN (tepat tetapi sangat perlahan tanpa GPU)
+    haar   cv2.CascadeClassifier (pantas; lebih banyak positif palsu)
+    dnn    OpenCV DNN ResNet-10 SSD 300x300 (Caffe)
+    yunet  OpenCV FaceDetectorYN (ONNX, CPU)
+
+Pengesan yang sama digunakan oleh recognize_faces.py (DETECTION_MODEL) dan capture_images.py
+(FACE_DETECTOR), supaya wajah yang ditangkap semasa pendaftaran dipotong seperti ia dikesan
+semasa pengecaman. Fail model DNN/YuNet tidak disertakan; muat turun dari repositori
+opencv/opencv (samples/dnn/face_detector) dan opencv/opencv_zoo (models/face_detection_yunet)
+ke MODEL_DIR. Bandingkan kelajuan dan recall dengan bench_detectors.py.
+"""
+
+import os
+import threading
+
+import cv2
+
+DEFAULT_DETECTOR = "hog"
+MODEL_DIR = "models"
+HAAR_CASCADE_PATH = "haarcascade_frontalface_default.xml"
+DNN_CONFIG_PATH = os.path.join(MODEL_DIR, "deploy.prototxt")
+DNN_MODEL_PATH = os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+YUNET_MODEL_PATH = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+
+
+def _require(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Fail model '{path}' tidak dijumpai (lihat face_detectors.py untuk sumber muat turun).")
+    return path
+
+
+def _clip_boxes(rects, width, height):
+    """(x, y, w, h) -> (top, right, bottom, left) yang dipotong kepada sempadan imej."""
+    boxes = []
+    for x, y, w, h in rects:
+        left, top = max(0, int(x)), max(0, int(y))
+        right, bottom = min(width, int(x + w)), min(height, int(y + h))
+        if right > left and bottom > top: boxes.append((top, right, bottom, left))
+    return boxes
+
+
+class FaceDetector:
+    name = None
+
+    def detect(self, rgb_image):
+        """Pulangkan senarai kotak (top, right, bottom, left) dalam koordinat rgb_image."""
+        raise NotImplementedError
+
+
+class DlibDetector(FaceDetector):
+    def __init__(self, model="hog", upsample=1):
+        import face_recognition
+        self._face_recognition = face_recognition
+        self.name, self.model, self.upsample = model, model, upsample
+
+    def detect(self, rgb_image):
+        return self._face_recognition.face_locations(rgb_image, number_of_times_to_upsample=self.upsample, model=self.model)
+
+
+class HaarDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, cascade_path=HAAR_CASCADE_PATH, scale_factor=1.1, min_neighbors=5, min_size=20):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("Binaan OpenCV ini tiada cv2.CascadeClassifier (modul objdetect).")
+        self.classifier = cv2.CascadeClassifier(_require(cascade_path))
+        self.scale_factor, self.min_neighbors, self.min_size = scale_factor, min_neighbors, min_size
+
+    def detect(self, rgb_image):
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        rects = self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                                 minSize=(self.min_size, self.min_size))
+        return _clip_boxes(rects, gray.shape[1], gray.shape[0])
+
+
+class SSDDetector(FaceDetector):
+    name = "dnn"
+
+    def __init__(self, config_path=DNN_CONFIG_PATH, model_path=DNN_MODEL_PATH, confidence=0.5, input_size=300):
+        self.net = cv2.dnn.readNet(_require(model_path), _require(config_path))
+        self.confidence, self.input_size = confidence, input_size
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        # Model dilatih pada BGR dengan min B=104, G=177, R=123. blobFromImage menukar RGB->BGR (swapRB)
+        # dahulu, kemudian menolak min mengikut susunan saluran output, jadi min diberi dalam susunan BGR
+        blob = cv2.dnn.blobFromImage(rgb_image, 1.0, (self.input_size, self.input_size), (104, 177, 123), swapRB=True)
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)   # [_, _, keyakinan, x1, y1, x2, y2] (nisbah)
+        detections = detections[detections[:, 2] >= self.confidence]
+        rects = [(x1 * width, y1 * height, (x2 - x1) * width, (y2 - y1) * height) for x1, y1, x2, y2 in detections[:, 3:7]]
+        return _clip_boxes(rects, width, height)
+
+
+class YuNetDetector(FaceDetector):
+    name = "yunet"
+
+    def __init__(self, model_path=YUNET_MODEL_PATH, score_threshold=0.7, nms_threshold=0.3, top_k=500):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("Binaan OpenCV ini tiada cv2.FaceDetectorYN (perlukan OpenCV >= 4.5.4).")
+        self.detector = cv2.FaceDetectorYN.create(_require(model_path), "", (320, 320), score_threshold, nms_threshold, top_k)
+        self._input_size = (320, 320)
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        if self._input_size != (width, height):
+            self.detector.setInputSize((width, height)); self._input_size = (width, height)
+        _, faces = self.detector.detect(cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR))
+        if faces is None: return []
+        return _clip_boxes(faces[:, :4], width, height)   # Lajur lain: 5 landmark + skor
+
+
+DETECTORS = {
+    "hog": lambda **kw: DlibDetector("hog", **kw),
+    "cnn": lambda **kw: DlibDetector("cnn", **kw),
+    "haar": HaarDetector,
+    "dnn": SSDDetector,
+    "yunet": YuNetDetector,
+}
+
+_local = threading.local()
+
+
+def create_detector(name=DEFAULT_DETECTOR, **options):
+    """Bina pengesan baharu. ValueError jika nama tidak dikenali; FileNotFoundError jika fail model tiada."""
+    if name not in DETECTORS:
+        raise ValueError(f"Pengesan '{name}' tidak dikenali (pilihan: {', '.join(DETECTORS)}).")
+    return DETECTORS[name](**options)
+
+
+def get_detector(name=DEFAULT_DETECTOR):
+    """
+    Pengesan yang dikongsi bagi setiap thread (model dimuatkan sekali bagi setiap thread/proses pekerja).
+    cv2.dnn.Net dan FaceDetectorYN tidak selamat dipanggil serentak dari beberapa thread.
+    """
+    cache = getattr(_local, "detectors", None)
+    if cache is None: cache = _local.detectors = {}
+    detector = cache.get(name)
+    if detector is None:
+        detector = cache[name] = create_detector(name)
+    return detector
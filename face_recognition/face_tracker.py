@@ -0,0 +1,90 @@
+"""
+face_tracker.py - Penjejak wajah ringan (berasaskan IoU) untuk AttendanceSystem
+
+Setiap wajah yang dikesan diberi id trek yang kekal walaupun kotak bergerak
+beberapa piksel, jadi identiti pelajar dan keadaan kelipan mata (liveness, dikunci
+dengan id trek) dibawa oleh trek, bukan oleh tuple (top, right, bottom, left) yang tepat.
+
+Pengesanan penuh hanya perlu dijalankan setiap N frame, atau apabila ada trek
+yang hilang. Trek yang identitinya telah disahkan tidak perlu di-encode semula.
+"""
+
+
+def box_iou(a, b):
+    """IoU bagi dua kotak dalam format face_recognition (top, right, bottom, left)."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+class FaceTrack:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.info = None           # Maklumat pelajar yang dipadankan (None = tidak dikenali)
+        self.match_hits = 0        # Bilangan padanan berturut-turut kepada pelajar yang sama
+        self.confirmed = False     # True jika identiti sudah disahkan (encoding boleh dilangkau)
+        self.misses = 0
+        self.landmarks = None      # Landmark frame terakhir (untuk anggaran pose gerbang kualiti)
+
+    def observe_match(self, info, confirm_hits):
+        if info is None:
+            self.info, self.match_hits, self.confirmed = None, 0, False
+            return
+        if self.info is not None and self.info['id'] == info['id']:
+            self.match_hits += 1
+        else:
+            self.info, self.match_hits = info, 1
+        self.confirmed = self.match_hits >= confirm_hits
+
+
+class FaceTracker:
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_misses=2, confirm_hits=2):
+        self.detect_every = detect_every    # Jalankan pengesanan penuh sekurang-kurangnya setiap N frame
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses        # Buang trek selepas N pengesanan berturut-turut tanpa padanan
+        self.confirm_hits = confirm_hits
+        self.tracks = []
+        self.frames_since_detection = 0
+        self._next_id = 1
+
+    def needs_detection(self):
+        return (not self.tracks or self.frames_since_detection + 1 >= self.detect_every
+                or any(t.misses for t in self.tracks))
+
+    def tick(self):
+        """Panggil pada frame yang tidak menjalankan pengesanan."""
+        self.frames_since_detection += 1
+
+    def rescale(self, factor):
+        """Skala semula kotak semua trek apabila skala pengesanan berubah (identiti dan id trek dikekalkan)."""
+        for track in self.tracks:
+            track.box = tuple(int(round(v * factor)) for v in track.box)
+            track.landmarks = None
+
+    def active_tracks(self):
+        return [t for t in self.tracks if t.misses == 0]
+
+    def update(self, boxes):
+        """Padankan kotak pengesanan kepada trek sedia ada. Pulangkan trek mengikut susunan kotak."""
+        self.frames_since_detection = 0
+        pairs = sorted(((box_iou(t.box, box), ti, bi) for ti, t in enumerate(self.tracks) for bi, box in enumerate(boxes)), reverse=True)
+        assigned, used_tracks = [None] * len(boxes), set()
+        for iou, ti, bi in pairs:
+            if iou < self.iou_threshold: break
+            if ti in used_tracks or assigned[bi] is not None: continue
+            track = self.tracks[ti]; track.box, track.misses = boxes[bi], 0
+            assigned[bi] = track; used_tracks.add(ti)
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks: track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                assigned[bi] = FaceTrack(self._next_id, box); self._next_id += 1
+                self.tracks.append(assigned[bi])
+        return assigned
@@ -0,0 +1,174 @@
+"""
+fake_mjpeg_server.py - Pelayan MJPEG tiruan tempatan untuk menguji tanpa kamera Raspberry Pi
+
+Menghidangkan /video dalam format yang sama seperti raspberry_pi/rasp_stream_camera.py
+(multipart/x-mixed-replace; boundary=frame, dengan Content-Length) pada kadar FPS tetap.
+Frame diambil dari folder gambar (cth. dataset/<Nama>), fail video (.mp4/.avi), rakaman
+stream MJPEG (.mjpeg, cth. daripada bench_mjpeg.py --record) atau dijana secara sintetik.
+
+Setiap bahagian membawa pengepala X-Frame-Index (indeks frame dalam sumber) supaya
+penanda aras boleh memadankan frame yang diterima dengan masa ia dihantar (sent_at).
+Mod --realtime berkelakuan seperti Pi: klien yang perlahan terlepas frame (dikira dalam
+frames_skipped) dan bukannya melambatkan sumber. --once memainkan sumber sekali sahaja.
+
+CARA GUNA:
+# Tiga "bilik darjah" tiruan pada port 8101-8103
+$ python fake_mjpeg_server.py --count 3 --base-port 8101 --images dataset/Ali --fps 15
+# Main semula rakaman kelas sekali pada 15 fps
+$ python fake_mjpeg_server.py --source rakaman.mjpeg --fps 15 --once --realtime
+"""
+
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from mjpeg_reader import MJPEGReader
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+RECORDING_EXTENSIONS = ('.mjpeg', '.mjpg')
+
+
+def synthetic_jpegs(n_frames=30, width=640, height=480, label="BILIK"):
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur((rng.random((height, width, 3)) * 255).astype(np.uint8), (0, 0), 5)
+    frames = []
+    for i in range(n_frames):
+        frame = np.roll(base, i * 8, axis=1)
+        cv2.putText(frame, f"{label} {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        frames.append(cv2.imencode('.jpg', frame)[1].tobytes())
+    return frames
+
+
+def folder_jpegs(folder, width=None):
+    frames = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS): continue
+        image = cv2.imread(os.path.join(folder, name))
+        if image is None: continue
+        if width and image.shape[1] != width:
+            image = cv2.resize(image, (width, int(image.shape[0] * width / image.shape[1])))
+        frames.append(cv2.imencode('.jpg', image)[1].tobytes())
+    if not frames: raise ValueError(f"Tiada gambar dalam '{folder}'.")
+    return frames
+
+
+def recording_jpegs(path):
+    # Rakaman stream mentah: JPEG diambil terus tanpa encode semula
+    with open(path, 'rb') as f:
+        frames = list(MJPEGReader([f.read()]).iter_jpegs())
+    if not frames: raise ValueError(f"Tiada frame JPEG dalam '{path}'.")
+    return frames
+
+
+def video_jpegs(path, width=None, max_frames=None):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened(): raise ValueError(f"Gagal membuka video '{path}'.")
+    frames = []
+    try:
+        while max_frames is None or len(frames) < max_frames:
+            ret, image = cap.read()
+            if not ret: break
+            if width and image.shape[1] != width:
+                image = cv2.resize(image, (width, int(image.shape[0] * width / image.shape[1])))
+            frames.append(cv2.imencode('.jpg', image)[1].tobytes())
+    finally:
+        cap.release()
+    if not frames: raise ValueError(f"Tiada frame dalam video '{path}'.")
+    return frames
+
+
+def load_source(source, width=None):
+    """Folder gambar, rakaman .mjpeg atau fail video -> senarai bait JPEG."""
+    if os.path.isdir(source): return folder_jpegs(source, width)
+    if source.lower().endswith(RECORDING_EXTENSIONS): return recording_jpegs(source)
+    return video_jpegs(source, width)
+
+
+class FakeMJPEGServer:
+    def __init__(self, frames, port=0, fps=15.0, host="127.0.0.1", loop=True, realtime=False):
+        self.frames = frames
+        self.fps = fps
+        self.loop = loop              # False: tutup stream selepas satu laluan
+        self.realtime = realtime      # True: langkau frame apabila klien ketinggalan (seperti Pi)
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.sent_at = {}             # indeks frame -> time.monotonic() kali pertama dihantar
+        self.finished = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/video':
+                    self.send_error(404); return
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                interval, i, next_at = 1.0 / server.fps, 0, time.monotonic()
+                total = len(server.frames)
+                try:
+                    while not server._stop.is_set() and (server.loop or i < total):
+                        index = i % total
+                        jpg = server.frames[index]; i += 1
+                        server.sent_at.setdefault(index, time.monotonic())
+                        self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\nX-Frame-Index: ' + str(index).encode() +
+                                         b'\r\nContent-Length: ' + str(len(jpg)).encode() + b'\r\n\r\n' + jpg + b'\r\n')
+                        server.frames_sent += 1
+                        next_at += interval
+                        behind = time.monotonic() - next_at
+                        if server.realtime and behind > interval:
+                            skipped = int(behind / interval)
+                            if not server.loop: skipped = min(skipped, total - i)
+                            i += skipped; next_at += skipped * interval; server.frames_skipped += skipped
+                        time.sleep(max(0.0, next_at - time.monotonic()))
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    if not server.loop: server.finished.set()
+
+            def log_message(self, *args):
+                pass
+
+        self._stop = threading.Event()
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}/video"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name=f"mjpeg-palsu-{self.port}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set(); self._httpd.shutdown(); self._httpd.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pelayan MJPEG tiruan tempatan")
+    parser.add_argument("--count", type=int, default=1, help="Bilangan pelayan (satu bagi setiap bilik)")
+    parser.add_argument("--base-port", type=int, default=8101)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--images", help="Folder gambar untuk dihidangkan (lalai: frame sintetik)")
+    parser.add_argument("--source", help="Folder gambar, fail video atau rakaman .mjpeg untuk dimain semula")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--once", action="store_true", help="Main sumber sekali sahaja, kemudian tutup stream")
+    parser.add_argument("--realtime", action="store_true", help="Langkau frame apabila klien ketinggalan (seperti Pi)")
+    args = parser.parse_args()
+
+    servers = []
+    for i in range(args.count):
+        source = args.source or args.images
+        frames = load_source(source, args.width) if source else synthetic_jpegs(width=args.width, label=f"BILIK {i + 1}")
+        servers.append(FakeMJPEGServer(frames, port=args.base_port + i, fps=args.fps, host="0.0.0.0",
+                                       loop=not args.once, realtime=args.realtime).start())
+        print(f"📡 Stream tiruan {i + 1}: http://127.0.0.1:{args.base_port + i}/video ({len(frames)} frame, {args.fps:g} fps)")
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers: server.stop()
+        print("\nℹ️ Pelayan tiruan dihentikan.")
@@ -0,0 +1,156 @@
+"""
+gallery_matcher.py - Pemadan wajah berasaskan matriks untuk AttendanceSystem
+
+Galeri wajah pelajar disimpan sebagai satu matriks float32 yang bersebelahan
+(contiguous) bersama norma yang telah dikira lebih awal. Semua wajah dalam satu
+frame dipadankan dengan seluruh galeri menggunakan satu operasi matriks.
+
+Apabila bilangan pelajar melebihi ANN_THRESHOLD, indeks anggaran (IVF) digunakan:
+galeri dibahagikan kepada beberapa kelompok (centroid kasar), hanya kelompok
+terdekat diperiksa dan calon disusun semula (re-rank) dengan jarak sebenar.
+"""
+
+import numpy as np
+
+
+class GalleryMatcher:
+    def __init__(self, tolerance=0.45, ann_threshold=5000, n_probe=8, kmeans_iters=10, seed=0):
+        self.tolerance = tolerance
+        self.ann_threshold = ann_threshold  # Saiz roster minimum untuk guna indeks anggaran
+        self.n_probe = n_probe              # Bilangan kelompok terdekat yang diperiksa
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+
+        self.matrix = np.empty((0, 128), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+        self.infos = []
+        self.info_by_id = {}
+        self.centroids = None
+        self.lists = None
+
+    def __len__(self):
+        return len(self.infos)
+
+    @property
+    def uses_ann(self):
+        return self.centroids is not None
+
+    def build(self, encodings, infos):
+        """Bina semula galeri daripada senarai encoding dan maklumat pelajar yang sepadan."""
+        if len(encodings) != len(infos):
+            raise ValueError("Bilangan encoding dan maklumat pelajar tidak sepadan.")
+        if isinstance(encodings, np.ndarray) and encodings.ndim == 2:
+            # Matriks float32 bersebelahan (cth. dari EncodingStore yang dipetakan) digunakan tanpa salinan
+            self.matrix = np.ascontiguousarray(encodings, dtype=np.float32)
+        elif len(encodings):
+            self.matrix = np.ascontiguousarray(np.vstack(encodings), dtype=np.float32)
+        else:
+            self.matrix = np.empty((0, 128), dtype=np.float32)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self.infos = list(infos)
+        self.info_by_id = {info["id"]: info for info in self.infos}
+        self._build_index()
+
+    def get_info(self, student_id):
+        return self.info_by_id.get(student_id)
+
+    def with_changes(self, removed_ids=(), added_encodings=(), added_infos=(), updated_infos=()):
+        """
+        Pulangkan matcher baharu dengan hanya perubahan roster (delta) digunakan; matcher ini
+        tidak diubah supaya gelung frame boleh terus menggunakannya sehingga pertukaran.
+        Indeks anggaran sedia ada dikekalkan: baris baharu diletakkan dalam kelompok terdekat.
+        """
+        removed = set(removed_ids) | {info["id"] for info in added_infos}
+        updated = {info["id"]: info for info in updated_infos}
+        keep = np.array([info["id"] not in removed for info in self.infos], dtype=bool)
+        new = GalleryMatcher(self.tolerance, self.ann_threshold, self.n_probe, self.kmeans_iters, self.seed)
+        added = np.asarray(added_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        new.matrix = np.ascontiguousarray(np.vstack([self.matrix[keep], added]))
+        new.sq_norms = np.concatenate([self.sq_norms[keep], np.einsum('ij,ij->i', added, added)])
+        new.infos = [updated.get(info["id"], info) for info, k in zip(self.infos, keep) if k] + list(added_infos)
+        new.info_by_id = {info["id"]: info for info in new.infos}
+        n = len(new.matrix)
+        if self.uses_ann and n >= self.ann_threshold:
+            remap = np.cumsum(keep) - 1
+            lists = [remap[lst[keep[lst]]] for lst in self.lists]
+            if len(added):
+                first = int(keep.sum())
+                assign = np.argmin(self._sq_distances(added, new.sq_norms[first:], self.centroids), axis=1)
+                for c in np.unique(assign):
+                    lists[c] = np.concatenate([lists[c], first + np.flatnonzero(assign == c)])
+            new.centroids, new.lists = self.centroids, lists
+        else:
+            new._build_index()
+        return new
+
+    def _build_index(self):
+        self.centroids, self.lists = None, None
+        n = len(self.matrix)
+        if n < self.ann_threshold or n == 0:
+            return
+        n_lists = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+        centroids = self.matrix[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmin(self._sq_distances(self.matrix, self.sq_norms, centroids), axis=1)
+            for c in range(n_lists):
+                members = self.matrix[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        assign = np.argmin(self._sq_distances(self.matrix, self.sq_norms, centroids), axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+
+    @staticmethod
+    def _sq_distances(queries, query_sq_norms, gallery, gallery_sq_norms=None):
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g
+        if gallery_sq_norms is None:
+            gallery_sq_norms = np.einsum('ij,ij->i', gallery, gallery)
+        d = query_sq_norms[:, None] + gallery_sq_norms[None, :] - 2.0 * (queries @ gallery.T)
+        return np.maximum(d, 0.0, out=d)
+
+    def distances(self, face_encodings):
+        """Jarak Euclidean penuh (bilangan wajah x saiz galeri) dalam satu operasi."""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        return np.sqrt(self._sq_distances(queries, q_norms, self.matrix, self.sq_norms))
+
+    def match(self, face_encodings):
+        """
+        Padankan semua wajah dalam satu frame. Pulangkan senarai (info, jarak) bagi setiap
+        wajah; info ialah None jika jarak terbaik melebihi toleransi.
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self.matrix) == 0:
+            return [(None, float('inf'))] * len(face_encodings)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+
+        if not self.uses_ann:
+            d = self._sq_distances(queries, q_norms, self.matrix, self.sq_norms)
+            best = np.argmin(d, axis=1)
+            best_d = np.sqrt(d[np.arange(len(queries)), best])
+        else:
+            best, best_d = self._ann_search(queries, q_norms)
+
+        results = []
+        for idx, dist in zip(best, best_d):
+            dist = float(dist)
+            results.append((self.infos[idx] if dist <= self.tolerance else None, dist))
+        return results
+
+    def _ann_search(self, queries, q_norms):
+        centroid_d = self._sq_distances(queries, q_norms, self.centroids)
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(centroid_d, n_probe - 1, axis=1)[:, :n_probe]
+        best = np.empty(len(queries), dtype=np.int64)
+        best_d = np.empty(len(queries), dtype=np.float32)
+        for i, probe in enumerate(probes):
+            candidates = np.concatenate([self.lists[c] for c in probe])
+            if len(candidates) == 0:
+                candidates = np.arange(len(self.matrix))
+            d = self._sq_distances(queries[i:i + 1], q_norms[i:i + 1], self.matrix[candidates], self.sq_norms[candidates])[0]
+            j = int(np.argmin(d))
+            best[i], best_d[i] = candidates[j], np.sqrt(d[j])
+        return best, best_d
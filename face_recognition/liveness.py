@@ -0,0 +1,53 @@
+"""
+liveness.py - Pengesanan kelipan mata (liveness) berasaskan EAR untuk AttendanceSystem
+
+eye_aspect_ratios() mengira EAR bagi semua wajah sekali gus dalam satu laluan NumPy
+(tiada tatasusunan kecil bagi setiap mata). BlinkDetector ialah mesin keadaan kelipan
+yang tidak bergantung pada gelung frame: ia hanya menerima kunci (cth. (id trek, id
+pelajar)) dan nilai EAR, jadi boleh diuji dengan jujukan EAR buatan.
+
+Landmark hanya perlu diminta untuk wajah yang dipadankan tetapi belum hadir; pelajar
+yang sudah hadir dan wajah tidak dikenali tidak memerlukan liveness.
+"""
+
+import numpy as np
+
+EYE_KEYS = ('left_eye', 'right_eye')
+
+
+def eye_aspect_ratios(landmarks_list):
+    """EAR purata (mata kiri + kanan) bagi setiap dict face_landmarks. Pulangkan tatasusunan (N,)."""
+    if not landmarks_list:
+        return np.empty(0, dtype=np.float32)
+    eyes = np.array([[landmarks[k] for k in EYE_KEYS] for landmarks in landmarks_list], dtype=np.float32)   # (N, 2, 6, 2)
+    vertical = np.linalg.norm(eyes[:, :, [1, 2]] - eyes[:, :, [5, 4]], axis=-1).sum(axis=-1)   # A + B
+    horizontal = np.linalg.norm(eyes[:, :, 0] - eyes[:, :, 3], axis=-1)                          # C
+    return (vertical / (2.0 * np.maximum(horizontal, 1e-6))).mean(axis=1)
+
+
+class BlinkDetector:
+    """Kelipan = EAR di bawah ambang sekurang-kurangnya consec_frames frame berturut-turut, kemudian mata dibuka."""
+
+    def __init__(self, threshold=0.25, consec_frames=2):
+        self.threshold = threshold
+        self.consec_frames = consec_frames
+        self.counters = {}          # kunci -> bilangan frame berturut-turut mata tertutup
+
+    def update(self, keys, ears):
+        """Kemas kini keadaan bagi setiap kunci. Pulangkan senarai bool: True jika kelipan lengkap pada frame ini."""
+        if not len(keys): return []
+        ears = np.asarray(ears, dtype=np.float32)
+        counts = np.fromiter((self.counters.get(key, 0) for key in keys), dtype=np.int32, count=len(keys))
+        closed = ears < self.threshold
+        blinked = ~closed & (counts >= self.consec_frames)
+        self.counters.update(zip(keys, np.where(closed, counts + 1, 0).tolist()))
+        return blinked.tolist()
+
+    def prune(self, keep_keys):
+        """Buang keadaan bagi kunci yang tiada lagi (trek hilang atau identiti bertukar)."""
+        keep_keys = set(keep_keys)
+        for key in [k for k in self.counters if k not in keep_keys]:
+            del self.counters[key]
+
+    def reset(self):
+        self.counters.clear()
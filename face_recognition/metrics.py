@@ -0,0 +1,263 @@
+"""
+metrics.py - Instrumentasi ringan: pemasa peringkat, histogram, kaunter dan tolok
+
+Metrik disimpan dalam memori proses dan didedahkan dalam format teks Prometheus
+(/metrics) atau JSON (/metrics?format=json):
+    - serve(port)            pelayan HTTP kecil dalam thread (untuk recognize_faces.py)
+    - instrument_flask(app)  kependaman setiap laluan Flask + laluan /metrics (app.py, rasp_nrf.py)
+
+Suis mati: DCAS_METRICS=0 dalam persekitaran, atau disable(). Apabila dimatikan, time()
+memulangkan konteks kosong yang dikongsi dan observe()/inc() pulang serta-merta: tiada
+bacaan jam, tiada kunci dan tiada peruntukan memori. instrument_flask() dan serve() tidak
+memasang apa-apa jika metrik dimatikan semasa ia dipanggil.
+
+Contoh:
+    DETECT = metrics.histogram("dcas_peringkat_saat", "Masa setiap peringkat", peringkat="detect")
+    with DETECT.time(): ...
+    metrics.counter("dcas_wajah_total", "Wajah dikesan", jenis="dikenali").inc()
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+# Sempadan baldi (saat): 0.5 ms hingga 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, labels):
+        self._registry, self.labels = registry, labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self._registry.enabled: return
+        with self._lock: self.value += amount
+
+    def snapshot(self):
+        return {"label": dict(self.labels), "nilai": self.value}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        if not self._registry.enabled: return
+        self.value = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, labels, buckets=DEFAULT_BUCKETS):
+        self._registry, self.labels = registry, labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # Baldi terakhir = +Inf
+        self.count, self.sum = 0, 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not self._registry.enabled: return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1; self.count += 1; self.sum += value
+
+    def time(self):
+        """Konteks pemasa: `with histogram.time(): ...` (konteks kosong jika metrik dimatikan)."""
+        return _Timer(self) if self._registry.enabled else _NOOP_TIMER
+
+    def quantile(self, q):
+        # Anggaran daripada sempadan atas baldi (cukup untuk melihat di mana masa dihabiskan)
+        if not self.count: return None
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= target: return bound
+        return float('inf')
+
+    def snapshot(self):
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {"label": dict(self.labels), "bilangan": self.count, "jumlah_s": round(self.sum, 6),
+                "purata_ms": round(self.sum / self.count * 1000, 3) if self.count else None,
+                "p50_ms_maks": p50 * 1000 if p50 not in (None, float('inf')) else p50,
+                "p95_ms_maks": p95 * 1000 if p95 not in (None, float('inf')) else p95}
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}       # nama -> {"help", "kind", "children": {label tuple: metrik}}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._metrics.setdefault(name, {"help": help_text, "kind": cls.kind, "children": {}})
+            if family["kind"] != cls.kind:
+                raise ValueError(f"Metrik '{name}' sudah didaftarkan sebagai {family['kind']}.")
+            child = family["children"].get(key)
+            if child is None:
+                child = family["children"][key] = cls(self, key, **kwargs)
+            return child
+
+    def counter(self, name, help_text="", **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", **labels):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def snapshot(self):
+        with self._lock:
+            families = {name: (f["kind"], list(f["children"].values())) for name, f in self._metrics.items()}
+        return {name: {"jenis": kind, "siri": [child.snapshot() for child in children]} for name, (kind, children) in families.items()}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            families = [(name, f["help"], f["kind"], list(f["children"].values())) for name, f in sorted(self._metrics.items())]
+        for name, help_text, kind, children in families:
+            if help_text: lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for child in children:
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(child.labels)} {child.value}"); continue
+                cumulative = 0
+                for bound, n in zip(child.buckets + (float('inf'),), child.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(child.labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(child.labels)} {child.sum}")
+                lines.append(f"{name}_count{_labels(child.labels)} {child.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    # Format teks Prometheus: \ -> \\, " -> \", baris baharu -> \n
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+REGISTRY = Registry(enabled=os.environ.get("DCAS_METRICS", "1") != "0")
+
+
+def enabled():
+    return REGISTRY.enabled
+
+
+def enable():
+    REGISTRY.enabled = True
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+def counter(name, help_text="", **labels):
+    return REGISTRY.counter(name, help_text, **labels)
+
+
+def gauge(name, help_text="", **labels):
+    return REGISTRY.gauge(name, help_text, **labels)
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+    return REGISTRY.histogram(name, help_text, buckets=buckets, **labels)
+
+
+def render(fmt="prometheus"):
+    """Pulangkan (badan, jenis kandungan) dalam format Prometheus atau JSON."""
+    if fmt == "json":
+        return json.dumps(REGISTRY.snapshot(), ensure_ascii=False), "application/json"
+    return REGISTRY.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+
+
+def serve(port=9108, host="127.0.0.1"):
+    """Mulakan pelayan /metrics dalam thread daemon. Pulangkan pelayan, atau None jika metrik dimatikan."""
+    if not REGISTRY.enabled: return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path not in ("/metrics", "/metrics.json"):
+                self.send_error(404); return
+            body, content_type = render("json" if path.endswith(".json") or "format=json" in query else "prometheus")
+            data = body.encode("utf-8")
+            self.send_response(200); self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data))); self.end_headers(); self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrik", daemon=True).start()
+    return server
+
+
+def instrument_flask(app, endpoint="/metrics"):
+    """Rekod kependaman setiap laluan Flask dan tambah laluan /metrics. Tiada apa-apa dipasang jika metrik dimatikan."""
+    if not REGISTRY.enabled: return app
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None and REGISTRY.enabled:
+            route = request.url_rule.rule if request.url_rule else "tidak_ditemui"
+            histogram("dcas_http_permintaan_saat", "Kependaman permintaan HTTP (hingga pengepala respons)",
+                      laluan=route, kaedah=request.method).observe(time.perf_counter() - start)
+            counter("dcas_http_permintaan_total", "Bilangan permintaan HTTP", laluan=route, kaedah=request.method,
+                    kod=response.status_code).inc()
+        return response
+
+    def metrics_view():
+        body, content_type = render("json" if request.args.get("format") == "json" else "prometheus")
+        return Response(body, mimetype=content_type.split(";")[0], content_type=content_type)
+
+    app.add_url_rule(endpoint, "metrics", metrics_view)
+    return app
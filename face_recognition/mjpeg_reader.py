@@ -0,0 +1,151 @@
+"""
+mjpeg_reader.py - Pembaca stream MJPEG berperingkat (incremental) tanpa salinan berulang
+
+Penimbal disimpan sebagai satu bytearray dan imbasan disambung dari kedudukan
+terakhir, jadi setiap bait hanya diimbas sekali. Jika bahagian multipart
+mempunyai pengepala Content-Length, panjang itu digunakan terus tanpa mencari
+penanda EOI. Saiz penimbal dihadkan supaya stream yang rosak tidak memenuhi memori.
+
+Frame dinyahkod terus daripada penimbal dengan cv2.imdecode, dengan pilihan
+nyahkod pada skala dikurangkan (1/2, 1/4, 1/8) menggunakan IMREAD_REDUCED_COLOR_*.
+
+iter_parts() turut memulangkan pengepala setiap bahagian multipart (cth. metadata
+X-Roi / X-Faces daripada titik akhir /faces pada Raspberry Pi).
+"""
+
+import re
+import time
+
+import cv2
+import numpy as np
+import requests
+
+SOI, EOI = b'\xff\xd8', b'\xff\xd9'
+CONTENT_LENGTH_RE = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+HEADER_RE = re.compile(rb'^([A-Za-z0-9-]+):[ \t]*(.*?)\r?$', re.MULTILINE)
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class MJPEGReader:
+    def __init__(self, chunks, decode_scale=1, max_buffer=8 * 1024 * 1024):
+        if decode_scale not in DECODE_FLAGS:
+            raise ValueError(f"decode_scale mesti salah satu daripada {sorted(DECODE_FLAGS)}")
+        self.chunks = chunks
+        self.decode_flag = DECODE_FLAGS[decode_scale]
+        self.max_buffer = max_buffer
+        self.frames_parsed = 0
+        self.frames_corrupt = 0
+        self.overflows = 0
+        self.decode_time = 0.0    # Jumlah masa cv2.imdecode (saat), untuk penanda aras
+        self._buf = bytearray()
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self._soi = -1            # Kedudukan SOI frame semasa (-1 jika belum dijumpai)
+        self._soi_from = 0        # Kedudukan untuk sambung mencari SOI
+        self._eoi_from = 0        # Kedudukan untuk sambung mencari EOI
+        self._length = None       # Panjang daripada Content-Length (jika ada)
+
+    def feed(self, chunk):
+        self._buf += chunk
+        if len(self._buf) > self.max_buffer:
+            # Stream rosak atau tiada penanda: buang penimbal dan segerakkan semula
+            self.overflows += 1
+            self._buf.clear(); self._reset_scan()
+
+    def next_span(self):
+        """Pulangkan (mula, akhir) JPEG lengkap seterusnya dalam penimbal, atau None jika belum lengkap."""
+        buf = self._buf
+        if self._soi == -1:
+            soi = buf.find(SOI, self._soi_from)
+            if soi == -1:
+                # Simpan bait terakhir sahaja kerana ia mungkin separuh daripada penanda SOI
+                self._soi_from = max(0, len(buf) - 1)
+                return None
+            self._soi, self._eoi_from = soi, soi + 2
+            match = CONTENT_LENGTH_RE.search(buf, 0, soi)
+            self._length = int(match.group(1)) if match else None
+        if self._length is not None:
+            end = self._soi + self._length
+            return (self._soi, end) if len(buf) >= end else None
+        eoi = buf.find(EOI, self._eoi_from)
+        if eoi == -1:
+            self._eoi_from = max(self._soi + 2, len(buf) - 1)
+            return None
+        return self._soi, eoi + 2
+
+    def consume(self, end):
+        del self._buf[:end]
+        self._reset_scan()
+
+    def iter_jpegs(self):
+        """Hasilkan bait JPEG mentah (satu salinan data termampat bagi setiap frame)."""
+        for chunk in self.chunks:
+            self.feed(chunk)
+            span = self.next_span()
+            while span is not None:
+                start, end = span
+                with memoryview(self._buf) as view:
+                    jpg = bytes(view[start:end])
+                self.consume(end); self.frames_parsed += 1
+                yield jpg
+                span = self.next_span()
+
+    def iter_parts(self):
+        """Hasilkan (pengepala, frame BGR) bagi setiap bahagian; kunci pengepala dalam huruf kecil."""
+        for chunk in self.chunks:
+            self.feed(chunk)
+            span = self.next_span()
+            while span is not None:
+                start, end = span
+                headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in HEADER_RE.findall(self._buf, 0, start)}
+                t0 = time.perf_counter()
+                with memoryview(self._buf) as view:
+                    frame = cv2.imdecode(np.frombuffer(view[start:end], dtype=np.uint8), self.decode_flag)
+                self.decode_time += time.perf_counter() - t0
+                self.consume(end); self.frames_parsed += 1
+                if frame is None:
+                    self.frames_corrupt += 1
+                else:
+                    yield headers, frame
+                span = self.next_span()
+
+    def iter_frames(self):
+        """Hasilkan frame BGR yang dinyahkod terus daripada penimbal."""
+        for chunk in self.chunks:
+            self.feed(chunk)
+            span = self.next_span()
+            while span is not None:
+                start, end = span
+                t0 = time.perf_counter()
+                with memoryview(self._buf) as view:
+                    frame = cv2.imdecode(np.frombuffer(view[start:end], dtype=np.uint8), self.decode_flag)
+                self.decode_time += time.perf_counter() - t0
+                self.consume(end); self.frames_parsed += 1
+                if frame is None:
+                    self.frames_corrupt += 1
+                else:
+                    yield frame
+                span = self.next_span()
+
+
+def stream_frames(url, decode_scale=1, chunk_size=65536, timeout=10):
+    """
+    Sambung ke URL MJPEG (serta-merta, jadi ralat sambungan dibangkitkan di sini) dan
+    pulangkan penjana frame BGR. Stream ditutup apabila penjana ditutup.
+    """
+    stream = requests.get(url, stream=True, timeout=timeout)
+    stream.raise_for_status()
+    return _response_frames(stream, decode_scale, chunk_size)
+
+
+def _response_frames(stream, decode_scale, chunk_size):
+    try:
+        yield from MJPEGReader(stream.iter_content(chunk_size=chunk_size), decode_scale=decode_scale).iter_frames()
+    finally:
+        stream.close()
@@ -0,0 +1,261 @@
+"""
+multi_camera.py - Perkhidmatan pengecaman berbilang kamera (satu proses untuk banyak bilik darjah)
+
+Satu proses membaca N stream MJPEG (satu bagi setiap bilik) dan berkongsi:
+- satu galeri/GalleryMatcher (dimuatkan sekali, dikemas kini oleh RosterWatcher),
+- satu pool pekerja pengesanan (thread atau process) dengan bilangan teras yang tetap,
+- satu AttendanceCommitter untuk pangkalan data.
+
+Setiap bilik mempunyai keadaan sesi sendiri (RoomSession): penjejak wajah, kelipan mata,
+pelajar yang telah hadir dan senarai imbasan terkini.
+
+Penjadualan: penjadual memberikan pekerja yang bebas kepada bilik secara round-robin.
+Setiap bilik hanya boleh mempunyai 'max_inflight' frame dalam pemprosesan, jadi bilik
+yang sibuk tidak boleh menghabiskan semua pekerja. Polisi buang frame bagi setiap bilik:
+'queue_size' (1 = sentiasa frame terkini, frame lama dibuang) dan 'max_fps' (had kadar
+pengesanan, cth. untuk bilik yang kurang penting).
+
+Konfigurasi (JSON):
+{
+  "workers": 4, "use_processes": false,
+  "kamera": [
+    {"bilik": "BK1", "url": "http://192.168.10.11:8000/video"},
+    {"bilik": "BK2", "url": "http://192.168.10.12:8000/video", "decode_scale": 2, "max_fps": 5,
+     "relay_url": "http://192.168.10.12:5000/trigger-relay"}
+  ]
+}
+
+CARA GUNA:
+$ python multi_camera.py --config kamera.json
+# Ujian tanpa kamera: 4 pelayan MJPEG tiruan tempatan selama 60 saat
+$ python multi_camera.py --fake 4 --duration 60
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import requests
+
+from recognize_faces import AttendanceSystem, analyze_faces
+from recognition_pipeline import DropOldestQueue
+from mjpeg_reader import stream_frames
+from relay_client import RelayClient
+
+
+class _RoomCommitter:
+    """Serahkan acara kepada committer yang dikongsi dan tandakan bilik asalnya."""
+
+    def __init__(self, committer, room_name):
+        self.committer, self.room_name = committer, room_name
+
+    def submit(self, student_id):
+        # Bilik ditanda sebelum acara masuk baris gilir, supaya on_committed sentiasa melihatnya
+        return self.committer.submit(student_id, bilik=self.room_name)
+
+
+class RoomSession(AttendanceSystem):
+    """Keadaan sesi satu bilik. Galeri, committer dan pool pekerja dimiliki oleh MultiCameraService."""
+
+    def __init__(self, config, defaults):
+        super().__init__()
+        self.ROOM = config["bilik"]
+        self.STREAM_URL = config["url"]
+        self.HEADLESS = True
+        self.DECODE_SCALE = config.get("decode_scale", defaults.DECODE_SCALE)
+        self.DETECTION_SCALE = config.get("detection_scale", defaults.DETECTION_SCALE)
+        self.DETECTION_MODEL = defaults.DETECTION_MODEL
+        self.MAX_FPS = config.get("max_fps")                 # None = sepantas pekerja membenarkan
+        self.MAX_INFLIGHT = config.get("max_inflight", 1)
+        self.RELAY_URL = config.get("relay_url")             # None = guna relay perkhidmatan
+        self.frames = DropOldestQueue(config.get("queue_size", 1))
+        self.in_flight, self.next_due, self.last_seq = 0, 0.0, 0
+        self.frames_ingested = self.frames_processed = self.frames_stale = self.reconnects = 0
+
+    def record_attendance(self, student_id):
+        recorded = super().record_attendance(student_id)
+        if recorded: print(f"🏫 [{self.ROOM}] {self.matcher.get_info(student_id)['nama']} hadir.")
+        return recorded
+
+    def ready(self, now):
+        return self.in_flight < self.MAX_INFLIGHT and now >= self.next_due and len(self.frames) > 0
+
+
+class MultiCameraService:
+    def __init__(self, config, workers=None, use_processes=None):
+        self.hub = AttendanceSystem()          # Pemilik galeri, pemerhati roster, committer dan relay
+        self.hub.HEADLESS = True
+        self.workers = workers or config.get("workers") or os.cpu_count() or 1
+        self.use_processes = config.get("use_processes", False) if use_processes is None else use_processes
+        self.rooms = [RoomSession(cam, self.hub) for cam in config["kamera"]]
+        if len({r.ROOM for r in self.rooms}) != len(self.rooms):
+            raise ValueError("Nama 'bilik' dalam konfigurasi mesti unik.")
+        self.rooms_by_name = {r.ROOM: r for r in self.rooms}
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+        self._ready = threading.Condition()    # Diberi isyarat apabila frame tiba atau pekerja bebas
+        self._rr = 0                           # Penunjuk round-robin
+        self._matcher = None
+        self._threads = []
+
+    # --- Galeri dikongsi -------------------------------------------------------
+    def sync_gallery(self):
+        """Tukar galeri baharu (jika ada) dan kongsi rujukan yang sama dengan semua bilik."""
+        self.hub.apply_pending_roster()
+        if self.hub.matcher is self._matcher: return
+        self._matcher = self.hub.matcher
+        for room in self.rooms:
+            room.matcher, room.known_face_info_all, room.known_face_info_reco = self.hub.matcher, self.hub.known_face_info_all, self.hub.matcher.infos
+            for track in room.tracker.tracks:
+                if track.info is not None: track.observe_match(room.matcher.get_info(track.info["id"]), room.tracker.confirm_hits)
+
+    def _on_committed(self, events):
+        by_room = {}
+        for event in events: by_room.setdefault(event.get("bilik"), set()).add(event["id_pelajar"])
+        for name, ids in by_room.items():
+            room = self.rooms_by_name.get(name)
+            if room is None: continue
+            for student in room.scanned_students_list:
+                if student["id"] in ids: student["disimpan"] = True
+            (room.relay or self.hub.relay).notify()
+        print(f"💾 {len(events)} rekod kehadiran disimpan ({', '.join(str(n) for n in by_room)}).")
+
+    # --- Peringkat ingest (satu thread bagi setiap bilik) -------------------------
+    def _ingest_loop(self, room):
+        seq, backoff = 0, 1.0
+        while not self.stop_event.is_set():
+            try:
+                frames = stream_frames(room.STREAM_URL, decode_scale=room.DECODE_SCALE, chunk_size=room.MJPEG_CHUNK_SIZE)
+                print(f"✅ [{room.ROOM}] Disambung ke {room.STREAM_URL}"); backoff = 1.0
+                try:
+                    for frame in frames:
+                        if self.stop_event.is_set(): break
+                        seq += 1; room.frames_ingested += 1
+                        room.frames.put((seq, room.prepare_frame(frame)))
+                        with self._ready: self._ready.notify()
+                finally:
+                    frames.close()
+            except (requests.exceptions.RequestException, OSError) as e:
+                print(f"⚠️ [{room.ROOM}] Stream gagal: {e}")
+            if self.stop_event.is_set(): break
+            room.reconnects += 1
+            self.stop_event.wait(backoff); backoff = min(backoff * 2, 10.0)
+
+    # --- Penjadual: pekerja bebas -> bilik seterusnya (round-robin) ---------------
+    def _next_room(self):
+        now = time.monotonic()
+        for i in range(len(self.rooms)):
+            room = self.rooms[(self._rr + i) % len(self.rooms)]
+            if room.ready(now):
+                self._rr = (self._rr + i + 1) % len(self.rooms)
+                return room
+        return None
+
+    def _schedule_loop(self):
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        slots = threading.BoundedSemaphore(self.workers)
+        with executor_cls(max_workers=self.workers) as executor:
+            while not self.stop_event.is_set():
+                slots.acquire()
+                room = None
+                with self._ready:
+                    while room is None and not self.stop_event.is_set():
+                        room = self._next_room()
+                        if room is None: self._ready.wait(0.05)   # Juga meliputi had max_fps
+                    if room is None:
+                        slots.release(); break
+                    try: seq, rgb_small_frame = room.frames.get(timeout=0)
+                    except (queue.Empty, TypeError):
+                        slots.release(); continue
+                    room.in_flight += 1
+                    if room.MAX_FPS: room.next_due = time.monotonic() + 1.0 / room.MAX_FPS
+                future = executor.submit(analyze_faces, rgb_small_frame, room.DETECTION_MODEL)
+                future.add_done_callback(lambda f, room=room, seq=seq, small=rgb_small_frame: self._on_detected(f, room, seq, small, slots))
+
+    def _on_detected(self, future, room, seq, rgb_small_frame, slots):
+        with self._ready:
+            room.in_flight -= 1; slots.release(); self._ready.notify()
+        try: self.results.put((room, seq, rgb_small_frame, future.result()))
+        except Exception as e: print(f"⚠️ [{room.ROOM}] Ralat pengesanan (frame {seq}): {e}")
+
+    # --- Padanan + liveness (thread utama) ---------------------------------------
+    def run(self, duration=None, status_interval=30.0):
+        self.hub.load_known_faces_from_db()
+        if not len(self.hub.matcher): print("❌ KRITIKAL: Tiada data wajah sah."); return
+        self.hub.start_background_services()
+        self.hub.committer.on_committed = self._on_committed
+        for room in self.rooms:
+            room.committer = _RoomCommitter(self.hub.committer, room.ROOM)
+            room.relay = RelayClient(room.RELAY_URL, coalesce_window=room.RELAY_COALESCE_WINDOW) if room.RELAY_URL else None
+        self.sync_gallery()
+        for room in self.rooms:
+            self._threads.append(threading.Thread(target=self._ingest_loop, args=(room,), name=f"ingest-{room.ROOM}", daemon=True))
+        self._threads.append(threading.Thread(target=self._schedule_loop, name="penjadual", daemon=True))
+        for thread in self._threads: thread.start()
+        print(f"🟢 {len(self.rooms)} kamera, {self.workers} pekerja ({'process' if self.use_processes else 'thread'} pool).")
+        deadline = time.monotonic() + duration if duration else None
+        next_status = time.monotonic() + status_interval
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                try: room, seq, rgb_small_frame, (face_locations, face_encodings) = self.results.get(timeout=0.5)
+                except queue.Empty: room = None
+                if room is not None:
+                    if seq <= room.last_seq:
+                        room.frames_stale += 1
+                    else:
+                        room.last_seq = seq; room.frames_processed += 1
+                        self.sync_gallery()
+                        room.process_faces(face_locations, face_encodings, rgb_small_frame)
+                if time.monotonic() >= next_status:
+                    next_status += status_interval; self.print_status()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            with self._ready: self._ready.notify_all()
+            for room in self.rooms: room.frames.close()
+            for thread in self._threads: thread.join(timeout=5)
+            self.hub.roster_watcher.stop(); self.hub.committer.close(); self.hub.relay.close()
+            for room in self.rooms:
+                if room.relay: room.relay.close()
+            print("\n⏹️ Perkhidmatan dihentikan."); self.print_status()
+
+    def print_status(self):
+        print("📊 bilik        diterima  diproses  dibuang  sambung-semula  hadir")
+        for r in self.rooms:
+            dropped = r.frames.dropped + r.frames_stale
+            print(f"   {r.ROOM:<12}{r.frames_ingested:>9}{r.frames_processed:>10}{dropped:>9}{r.reconnects:>16}{len(r.session_present_ids):>7}")
+
+
+def fake_config(count):
+    """Mulakan 'count' pelayan MJPEG tiruan tempatan dan pulangkan konfigurasi yang sepadan."""
+    from fake_mjpeg_server import FakeMJPEGServer, synthetic_jpegs
+    servers = [FakeMJPEGServer(synthetic_jpegs(label=f"BILIK {i + 1}"), fps=15).start() for i in range(count)]
+    return {"kamera": [{"bilik": f"BILIK{i + 1}", "url": s.url} for i, s in enumerate(servers)]}, servers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Perkhidmatan pengecaman berbilang kamera")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--config", help="Fail konfigurasi JSON dengan senarai 'kamera'")
+    source.add_argument("--fake", type=int, metavar="N", help="Uji dengan N pelayan MJPEG tiruan tempatan")
+    parser.add_argument("--workers", type=int, default=None, help="Bilangan pekerja pengesanan (lalai: konfigurasi atau semua teras)")
+    parser.add_argument("--processes", action="store_true", default=None, help="Guna process pool untuk pengesanan")
+    parser.add_argument("--duration", type=float, default=None, help="Berhenti selepas N saat (lalai: sehingga Ctrl+C)")
+    parser.add_argument("--status-interval", type=float, default=30.0)
+    args = parser.parse_args()
+
+    servers = []
+    if args.fake:
+        config, servers = fake_config(args.fake)
+    else:
+        with open(args.config, encoding='utf-8') as f: config = json.load(f)
+    try:
+        MultiCameraService(config, workers=args.workers, use_processes=args.processes).run(
+            duration=args.duration, status_interval=args.status_interval)
+    finally:
+        for server in servers: server.stop()
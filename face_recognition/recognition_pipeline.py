@@ -0,0 +1,125 @@
+"""
+recognition_pipeline.py - Mod pengecaman berperingkat (pipelined) untuk AttendanceSystem
+
+Tiga peringkat berjalan serentak dan disambungkan oleh baris gilir terhad:
+1. Ingest/decode  : membaca stream MJPEG dan menyahkod frame (thread sendiri).
+2. Pengesanan     : pengesanan wajah + encoding pada thread/process pool.
+3. Paparan/commit : padanan, liveness, rekod kehadiran dan cv2.imshow (thread utama,
+                   pada kadar DISPLAY_FPS; tiada paparan dalam mod headless).
+
+Polisi baris gilir: "buang frame lama, sentiasa proses yang terkini". Baris gilir
+tidak pernah menyekat pengeluar; jika penuh, item tertua dibuang supaya stream
+tidak pernah tertunggak walaupun kamera lebih laju daripada CPU.
+"""
+
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class DropOldestQueue:
+    """Baris gilir terhad yang membuang item tertua apabila penuh (put tidak pernah menyekat)."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond: return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft(); self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Pulangkan item seterusnya, None jika baris gilir ditutup dan kosong, atau queue.Empty jika tamat masa."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                raise queue.Empty
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class RecognitionPipeline:
+    def __init__(self, system, analyze_fn, workers=None, use_processes=False, queue_size=1):
+        self.system = system
+        self.analyze_fn = analyze_fn
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.frame_queue = DropOldestQueue(queue_size)    # ingest -> pengesanan
+        self.result_queue = DropOldestQueue(queue_size)   # pengesanan -> paparan/commit
+        self.stop_event = threading.Event()
+        self.frames_ingested = 0
+        self.frames_processed = 0
+        self.frames_stale = 0
+
+    def _ingest_loop(self, stream):
+        seq = 0
+        try:
+            for frame in self.system.iter_stream_frames(stream):
+                if self.stop_event.is_set(): break
+                seq += 1; self.frames_ingested = seq
+                self.frame_queue.put((seq, frame, self.system.prepare_frame(frame)))
+        except Exception as e:
+            if not self.stop_event.is_set(): print(f"❌ Ralat peringkat ingest: {e}")
+        finally:
+            self.frame_queue.close()
+
+    def _detect_loop(self):
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        slots = threading.BoundedSemaphore(self.workers)
+        with executor_cls(max_workers=self.workers) as executor:
+            while not self.stop_event.is_set():
+                # Tunggu pekerja bebas dahulu, kemudian ambil frame terkini (frame lama telah dibuang)
+                slots.acquire()
+                item = self.frame_queue.get()
+                if item is None:
+                    slots.release(); break
+                seq, frame, rgb_small_frame = item
+                future = executor.submit(self.analyze_fn, rgb_small_frame, self.system.DETECTION_MODEL)
+                future.add_done_callback(lambda f, seq=seq, frame=frame, small=rgb_small_frame: self._on_detected(f, seq, frame, small, slots))
+        self.result_queue.close()
+
+    def _on_detected(self, future, seq, frame, rgb_small_frame, slots):
+        slots.release()
+        try: self.result_queue.put((seq, frame, rgb_small_frame, future.result()))
+        except Exception as e: print(f"⚠️ Ralat peringkat pengesanan (frame {seq}): {e}")
+
+    def run(self, stream):
+        ingest = threading.Thread(target=self._ingest_loop, args=(stream,), name="ingest", daemon=True)
+        detect = threading.Thread(target=self._detect_loop, name="pengesanan", daemon=True)
+        print(f"🧵 Mod pipeline: {self.workers} pekerja ({'process' if self.use_processes else 'thread'} pool)")
+        ingest.start(); detect.start()
+        last_seq = 0
+        try:
+            while True:
+                try: item = self.result_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if not self.system.show_and_poll_keys(None): break
+                    continue
+                if item is None: break
+                seq, frame, rgb_small_frame, (face_locations, face_encodings) = item
+                # Keputusan boleh tiba tidak mengikut turutan apabila ada beberapa pekerja
+                if seq <= last_seq:
+                    self.frames_stale += 1; continue
+                last_seq = seq; self.frames_processed += 1
+                # Landmark liveness diminta di sini hanya untuk wajah yang dikenali tetapi belum hadir
+                detections = self.system.process_faces(face_locations, face_encodings, rgb_small_frame)
+                if not self.system.present_frame(frame, detections): break
+        finally:
+            self.stop_event.set(); self.frame_queue.close()
+            detect.join(timeout=5)
+            dropped = self.frame_queue.dropped + self.result_queue.dropped + self.frames_stale
+            print(f"📈 Pipeline: {self.frames_ingested} frame diterima, {self.frames_processed} diproses, {dropped} dibuang.")
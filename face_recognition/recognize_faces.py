@@ -3,16 +3,52 @@ import face_recognition
 import numpy as np
 import cv2
 import os
-from datetime import datetime
 import requests
-from PIL import Image
-from io import BytesIO
 import traceback
+import argparse
+import threading
+import time
+from gallery_matcher import GalleryMatcher
+from recognition_pipeline import RecognitionPipeline
+from mjpeg_reader import MJPEGReader
+from face_tracker import FaceTracker
+from attendance_committer import AttendanceCommitter
+from relay_client import RelayClient
+from encoding_store import EncodingStore, DEFAULT_STORE_PATH
+from roster_watcher import RosterWatcher
+from db_schema import connect
+from detection_governor import DetectionGovernor, QualityGate
+from liveness import BlinkDetector, eye_aspect_ratios
+from face_detectors import DEFAULT_DETECTOR, DETECTORS, get_detector
+import metrics
+
+# Metrik (metrics.py): kos hampir sifar apabila dimatikan dengan --no-metrics atau DCAS_METRICS=0
+STAGE = {name: metrics.histogram("dcas_peringkat_saat", "Masa setiap peringkat pengecaman", peringkat=name)
+         for name in ("decode", "prepare", "detect", "encode", "landmarks", "match", "render")}
+FACES = {kind: metrics.counter("dcas_wajah_total", "Wajah dikesan / dipadankan", jenis=kind)
+         for kind in ("dikesan", "dikenali", "tidak_dikenali")}
+BLINKS = metrics.counter("dcas_kelipan_disahkan_total", "Kelipan mata yang disahkan (liveness)")
+
+def analyze_faces(rgb_small_frame, model=DEFAULT_DETECTOR):
+    # Peringkat pengesanan + encoding. Fungsi peringkat modul supaya boleh dihantar ke ProcessPoolExecutor.
+    # Landmark tidak dikira di sini: hanya wajah yang perlu liveness memintanya selepas padanan.
+    with STAGE["detect"].time(): face_locations = get_detector(model).detect(rgb_small_frame)
+    FACES["dikesan"].inc(len(face_locations))
+    with STAGE["encode"].time(): face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+    return face_locations, face_encodings
 
 class AttendanceSystem:
     def __init__(self):
         self.DB_NAME = "attendance_system.db"
+        self.ENCODING_STORE_PATH = DEFAULT_STORE_PATH
+        self.SPOOL_PATH = "kehadiran_spool.jsonl"   # Spool acara kehadiran yang belum di-commit
+        self.COMMIT_WINDOW = 0.2                    # Tetingkap group commit (saat)
+        self.ROSTER_POLL_INTERVAL = 2.0             # Kekerapan semakan perubahan roster (saat)
+        self.RELAY_URL = "http://192.168.10.1:5000/trigger-relay"
+        self.RELAY_COALESCE_WINDOW = 1.0            # Gabungkan pencetus relay dalam tempoh ini (saat)
         self.STREAM_URL = "http://192.168.10.1:8000/video"
+        self.EDGE_MODE = False                      # Guna /faces: keratan wajah + kotak Haar daripada Pi
+        self.EDGE_STREAM_URL = "http://192.168.10.1:8000/faces"
         self.WINDOW_NAME = 'Sistem Pengecaman Wajah Kehadiran'
         self.TOTAL_SCREEN_WIDTH, self.SCREEN_HEIGHT = 1600, 900
         self.STUDENT_LIST_PANEL_WIDTH = 500
@@ -20,19 +56,47 @@ class AttendanceSystem:
         self.PANEL_INFO_HEIGHT = 200
         self.MAX_STUDENTS_IN_DISPLAY_LIST = 7
         self.FACE_MATCHING_TOLERANCE = 0.45
+        self.DETECTION_SCALE, self.DETECTION_MODEL = 0.25, DEFAULT_DETECTOR   # Pengesan: face_detectors.DETECTORS
+        self.DECODE_SCALE = 1          # Nyahkod JPEG pada 1/2, 1/4 atau 1/8 resolusi (1 = penuh)
+        self.MJPEG_CHUNK_SIZE = 65536
+        self.ANN_THRESHOLD = 5000      # Guna indeks anggaran apabila roster melebihi saiz ini
         
         self.EAR_THRESHOLD = 0.25      # Naikkan sedikit untuk lebih sensitiviti
         self.EAR_CONSEC_FRAMES = 2     # Kurangkan frame untuk pengesanan lebih pantas
+        self.DETECT_EVERY_N_FRAMES = 5 # Pengesanan HOG penuh setiap N frame (1 = setiap frame)
+        self.ADAPTIVE_DETECTION = True # Gabenor: tala skala pengesanan/detect_every/langkauan mengikut bajet
+        self.TARGET_FRAME_MS = 80.0    # Bajet purata masa analisis setiap frame (ms)
+        self.DETECTION_SCALES = (0.2, 0.25, 0.33, 0.5)
+        self.GOVERNOR_LOG_PATH = "governor_log.jsonl"
+        self.QUALITY_GATE = True       # Langkau encoding bagi wajah kecil/kabur/menoleh
+        self.QUALITY_MIN_FACE, self.QUALITY_MIN_SHARPNESS, self.QUALITY_MAX_YAW = 20, 30.0, 0.35
+        self.HEADLESS = False          # Tiada paparan: langkau komposit dan imshow sepenuhnya
+        self.DISPLAY_FPS = 15          # Kadar paparan maksimum, bebas daripada kadar pengecaman
+        self.STATUS_LOG_INTERVAL = 30.0  # Mod headless: cetak status setiap N saat
+        self.METRICS_PORT = 9108       # /metrics (Prometheus) dan /metrics.json pada 127.0.0.1; None = tiada pelayan
         
-        self.known_face_encodings, self.known_face_info_all, self.known_face_info_reco = [], [], []
-        self.session_present_ids, self.scanned_students_list, self.face_blink_counters = set(), [], {}
+        self.known_face_info_all, self.known_face_info_reco = [], []
+        self.session_present_ids, self.scanned_students_list = set(), []
         self.COLOR_BG_PANEL, self.COLOR_TEXT_HEADER = (40, 40, 40), (255, 255, 255)
         self.COLOR_TEXT_PRESENT, self.COLOR_TEXT_ABSENT = (0, 255, 0), (200, 200, 200)
         self.COLOR_BOX_PRESENT, self.COLOR_BOX_LIVENESS, self.COLOR_BOX_UNKNOWN = (0, 255, 0), (0, 255, 255), (0, 0, 255)
         self.CHECK_MARK, self.CROSS_MARK = "[HADIR]", "[BELUM]"
+        self.matcher = GalleryMatcher(tolerance=self.FACE_MATCHING_TOLERANCE, ann_threshold=self.ANN_THRESHOLD)
+        self.tracker = FaceTracker(detect_every=self.DETECT_EVERY_N_FRAMES)
+        self.blink_detector = BlinkDetector(self.EAR_THRESHOLD, self.EAR_CONSEC_FRAMES)
+        self.quality_gate = QualityGate(self.QUALITY_MIN_FACE, self.QUALITY_MIN_SHARPNESS, self.QUALITY_MAX_YAW)
+        self.governor, self._frame_index, self._last_detections = None, 0, []
+        self._detect_ms, self._face_heights = None, []
+        self.committer, self.relay, self.roster_watcher = None, None, None
+        self._pending_roster, self._roster_lock = None, threading.Lock()
+        # Penimbal paparan yang diperuntukkan sekali; panel dilukis semula hanya apabila keadaan berubah
+        self._canvas, self._video_roi, self._panel_keys = None, None, {}
+        self._last_display = self._last_status_log = 0.0
+        self.frames_seen = self.frames_displayed = 0
+        self._edge_frame, self._edge_boxes = None, None   # Mod tepi: frame penuh yang ditampal + kotak semasa
 
     def create_connection(self):
-        try: return sqlite3.connect(self.DB_NAME)
+        try: return connect(self.DB_NAME)
         except sqlite3.Error as e: print(f"❌ Ralat sambungan DB: {e}"); return None
 
     def load_known_faces_from_db(self):
@@ -43,53 +107,81 @@ class AttendanceSystem:
             cursor = conn.cursor()
             cursor.execute("SELECT id_pelajar, nama_pelajar, no_matrik, path_encoding_wajah FROM pelajar")
             records = cursor.fetchall()
-            self.known_face_encodings.clear(); self.known_face_info_all.clear(); self.known_face_info_reco.clear()
+            self.known_face_info_all.clear(); self.known_face_info_reco.clear()
+            # Stor encoding dipetakan terus ke memori; fail .npy lama masih disokong sebagai sandaran
+            store_ids, store_matrix = np.empty(0, dtype=np.int64), np.empty((0, 128), dtype=np.float32)
+            if os.path.exists(self.ENCODING_STORE_PATH):
+                store_ids, store_matrix = EncodingStore(self.ENCODING_STORE_PATH).load()
+            store_row = {int(sid): row for row, sid in enumerate(store_ids)}
+            rows, store_infos, legacy_encodings, legacy_infos = [], [], [], []
             for id_pelajar, nama, no_matrik, path in records:
                 student_info = {"id": id_pelajar, "nama": nama, "no_matrik": no_matrik or "N/A"}
                 self.known_face_info_all.append(student_info)
-                if path and os.path.exists(path):
+                if id_pelajar in store_row:
+                    rows.append(store_row[id_pelajar]); store_infos.append(student_info)
+                elif path and path.endswith('.npy') and os.path.exists(path):
                     try:
-                        encoding = np.load(path)
-                        self.known_face_encodings.append(encoding); self.known_face_info_reco.append(student_info)
+                        legacy_encodings.append(np.load(path)); legacy_infos.append(student_info)
                     except Exception as e: print(f"⚠️ Gagal memuatkan encoding untuk {nama}: {e}")
-            print(f"✅ Data dimuatkan: {len(self.known_face_encodings)} wajah dikenali.")
+            # Jika setiap baris stor digunakan mengikut susunan, matriks yang dipetakan digunakan tanpa salinan
+            gallery = store_matrix if rows == list(range(len(store_matrix))) else store_matrix[rows]
+            if legacy_encodings: gallery = np.vstack([gallery] + legacy_encodings)
+            self.known_face_info_reco.extend(store_infos + legacy_infos)
+            self.matcher.build(gallery, self.known_face_info_reco)
+            print(f"✅ Data dimuatkan: {len(self.matcher)} wajah dikenali.")
         finally: conn.close()
 
+    def start_background_services(self):
+        self.roster_watcher = RosterWatcher(self.DB_NAME, self.ENCODING_STORE_PATH, self.known_face_info_all,
+                                            poll_interval=self.ROSTER_POLL_INTERVAL, on_change=self._on_roster_change).start()
+        self.relay = RelayClient(self.RELAY_URL, coalesce_window=self.RELAY_COALESCE_WINDOW)
+        self.committer = AttendanceCommitter(self.DB_NAME, spool_path=self.SPOOL_PATH, commit_window=self.COMMIT_WINDOW,
+                                             on_committed=self._on_attendance_committed).start()
+
+    def _on_roster_change(self, delta):
+        # Dipanggil dari thread pemerhati: bina galeri baharu di sini supaya gelung frame tidak terhenti
+        added = [info for info in delta["added"] if info["id"] in delta["encodings"]]
+        with self._roster_lock:
+            # Bina di atas galeri yang belum ditukar (jika ada) supaya delta berturut-turut tidak hilang
+            base_matcher, base_info_all = self._pending_roster or (self.matcher, self.known_face_info_all)
+        matcher = base_matcher.with_changes(removed_ids=delta["removed"], added_encodings=[delta["encodings"][i["id"]] for i in added],
+                                            added_infos=added, updated_infos=delta["updated"])
+        removed, updated = set(delta["removed"]), {info["id"]: info for info in delta["updated"]}
+        info_all = [updated.get(i["id"], i) for i in base_info_all if i["id"] not in removed] + delta["added"]
+        with self._roster_lock:
+            self._pending_roster = (matcher, info_all)
+
+    def apply_pending_roster(self):
+        """Tukar galeri baharu pada sempadan frame (hanya pertukaran rujukan)."""
+        if self._pending_roster is None: return
+        with self._roster_lock:
+            self.matcher, self.known_face_info_all = self._pending_roster
+            self._pending_roster = None
+        self.known_face_info_reco = self.matcher.infos
+        for track in self.tracker.tracks:
+            if track.info is not None: track.observe_match(self.matcher.get_info(track.info["id"]), self.tracker.confirm_hits)
+        print(f"✅ Galeri dikemas kini: {len(self.matcher)} wajah dikenali.")
+
     def record_attendance(self, student_id):
+        """Serahkan acara kehadiran kepada committer latar belakang tanpa menyekat gelung frame."""
         if student_id in self.session_present_ids:
             return False
-        conn = self.create_connection()
-        if not conn: 
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO kehadiran(id_pelajar, masa_masuk) VALUES (?, datetime('now', 'localtime'))", (student_id,))
-            conn.commit()
-            self.session_present_ids.add(student_id)
-            info = next((i for i in self.known_face_info_reco if i["id"] == student_id), None)
-            if info:
-                self.scanned_students_list.insert(0, {"nama": info["nama"], "no_matrik": info["no_matrik"], "timestamp": datetime.now().strftime("%H:%M:%S")})
-                self.scanned_students_list = self.scanned_students_list[:self.MAX_STUDENTS_IN_DISPLAY_LIST]
-            
-            try:
-                url = "http://192.168.10.1:5000/trigger-relay"
-                print(f"🚀 Menghantar arahan ke Raspberry Pi di {url}...")
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    print("✅ Arahan berjaya dihantar dan diterima oleh Raspberry Pi.")
-                else:
-                    print(f"⚠️ Ralat dari server Raspberry Pi: {response.status_code} - {response.text}")
-            except requests.exceptions.RequestException as e:
-                print(f"‼️ Gagal menyambung ke Raspberry Pi: {e}")
-            return True
-        except sqlite3.Error as e:
-            print(f"❌ Ralat semasa merekod kehadiran: {e}"); return False
-        finally:
-            if conn: conn.close()
+        event = self.committer.submit(student_id)
+        self.session_present_ids.add(student_id)
+        info = self.matcher.get_info(student_id)
+        if info:
+            self.scanned_students_list.insert(0, {"id": student_id, "nama": info["nama"], "no_matrik": info["no_matrik"],
+                                                  "timestamp": event["masa_masuk"].split(' ')[1], "disimpan": False})
+            self.scanned_students_list = self.scanned_students_list[:self.MAX_STUDENTS_IN_DISPLAY_LIST]
+        return True
 
-    def _calculate_ear(self, eye):
-        A = np.linalg.norm(np.array(eye[1]) - np.array(eye[5])); B = np.linalg.norm(np.array(eye[2]) - np.array(eye[4])); C = np.linalg.norm(np.array(eye[0]) - np.array(eye[3]))
-        return (A + B) / (2.0 * C)
+    def _on_attendance_committed(self, events):
+        # Dipanggil dari thread committer selepas acara berjaya disimpan ke pangkalan data
+        committed_ids = {e["id_pelajar"] for e in events}
+        for student in self.scanned_students_list:
+            if student["id"] in committed_ids: student["disimpan"] = True
+        print(f"💾 {len(events)} rekod kehadiran disimpan.")
+        self.relay.notify()
 
     def draw_detected_students_panel(self, canvas):
         y_start = self.SCREEN_HEIGHT - self.PANEL_INFO_HEIGHT; panel_width = self.VIDEO_AREA_WIDTH
@@ -98,7 +190,9 @@ class AttendanceSystem:
         y_pos = y_start + 55
         for student in self.scanned_students_list:
             text = f"{student['nama']} ({student['no_matrik']}) - {student['timestamp']}"
-            cv2.putText(canvas, text, (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, self.COLOR_TEXT_PRESENT, 1); y_pos += 25
+            if not student['disimpan']: text += " (menyimpan...)"
+            color = self.COLOR_TEXT_PRESENT if student['disimpan'] else self.COLOR_BOX_LIVENESS
+            cv2.putText(canvas, text, (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1); y_pos += 25
 
     def draw_full_student_list_panel(self, canvas):
         x_start = self.VIDEO_AREA_WIDTH
@@ -114,87 +208,269 @@ class AttendanceSystem:
                 if i < len(self.known_face_info_all) - 1: cv2.putText(canvas, "...", (x_start + 10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, self.COLOR_TEXT_HEADER, 1)
                 break
 
-    def run(self):
-        self.load_known_faces_from_db()
-        if not self.known_face_encodings: print("❌ KRITIKAL: Tiada data wajah sah."); return
+    def connect_stream(self):
         try:
-            print(f"🔄 Menyambung ke stream MJPEG di: {self.STREAM_URL}"); stream = requests.get(self.STREAM_URL, stream=True, timeout=10); byte_data = b''
-            print("✅ Sambungan ke stream berjaya.")
-        except requests.exceptions.RequestException as e: print(f"❌ Gagal sambung ke stream MJPEG: {e}"); return
+            url = self.EDGE_STREAM_URL if self.EDGE_MODE else self.STREAM_URL
+            print(f"🔄 Menyambung ke stream MJPEG di: {url}"); stream = requests.get(url, stream=True, timeout=10)
+            print("✅ Sambungan ke stream berjaya."); return stream
+        except requests.exceptions.RequestException as e: print(f"❌ Gagal sambung ke stream MJPEG: {e}"); return None
+
+    def iter_stream_frames(self, stream):
+        """Peringkat ingest/decode: hasilkan frame BGR daripada stream MJPEG."""
+        reader = MJPEGReader(stream.iter_content(chunk_size=self.MJPEG_CHUNK_SIZE), decode_scale=self.DECODE_SCALE)
+        decoded = 0.0
+        for frame in self.iter_edge_frames(reader) if self.EDGE_MODE else reader.iter_frames():
+            STAGE["decode"].observe(reader.decode_time - decoded); decoded = reader.decode_time
+            yield frame
+
+    def iter_edge_frames(self, reader):
+        """
+        Mod tepi: Pi hanya menghantar keratan ROI yang mengandungi wajah (dan lakaran kecil sekali-sekala).
+        Keratan ditampal ke dalam frame penuh yang dikekalkan supaya paparan dan penjejak tidak berubah,
+        dan kotak Haar daripada Pi (X-Faces) disimpan untuk menggantikan pengesanan HOG.
+        """
+        d = self.DECODE_SCALE
+        for headers, crop in reader.iter_parts():
+            try:
+                width, height = (int(v) for v in headers["x-frame-size"].split("x"))
+                x, y, w, h = (int(v) // d for v in headers["x-roi"].split(","))
+                boxes = [[int(v) for v in b.split(",")] for b in headers.get("x-faces", "").split(";") if b]
+            except (KeyError, ValueError):
+                continue   # Bukan bahagian daripada /faces
+            if self._edge_frame is None or self._edge_frame.shape[:2] != (height // d, width // d):
+                self._edge_frame = np.zeros((height // d, width // d, 3), dtype=np.uint8)
+            roi = self._edge_frame[y:y + h, x:x + w]
+            if roi.size == 0: continue
+            if crop.shape[:2] == roi.shape[:2]: roi[:] = crop
+            else: cv2.resize(crop, (roi.shape[1], roi.shape[0]), dst=roi)   # Lakaran kecil atau saiz nyahkod berbeza
+            # (x, y, w, h) frame penuh -> (top, right, bottom, left) pada skala pengesanan (gabenor mungkin mengubahnya)
+            s = self.DETECTION_SCALE
+            self._edge_boxes = [(int(by * s), int((bx + bw) * s), int((by + bh) * s), int(bx * s)) for bx, by, bw, bh in boxes]
+            yield self._edge_frame.copy()
+
+    @property
+    def detection_resize(self):
+        # Skala pengesanan relatif kepada frame yang telah dinyahkod (mungkin sudah dikecilkan)
+        return self.DETECTION_SCALE * self.DECODE_SCALE
+
+    def prepare_frame(self, frame):
+        fx = self.detection_resize
+        with STAGE["prepare"].time():
+            small_frame = frame if fx == 1 else cv2.resize(frame, (0, 0), fx=fx, fy=fx)
+            return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+    def match_encodings(self, encodings):
+        with STAGE["match"].time(): results = self.matcher.match(encodings)
+        known = sum(1 for info, _ in results if info is not None)
+        FACES["dikenali"].inc(known); FACES["tidak_dikenali"].inc(len(results) - known)
+        return results
+
+    def process_faces(self, face_locations, face_encodings, rgb_small_frame):
+        """Peringkat padanan + liveness untuk keputusan pengesanan penuh (semua wajah sudah di-encode)."""
+        self.apply_pending_roster()
+        tracks = self.tracker.update(face_locations)
+        for track, (info, _) in zip(tracks, self.match_encodings(face_encodings)):
+            track.observe_match(info, self.tracker.confirm_hits)
+        return self.apply_liveness(tracks, rgb_small_frame)
+
+    def analyze_tracked(self, rgb_small_frame):
+        """
+        Pengesanan penuh hanya setiap DETECT_EVERY_N_FRAMES frame atau apabila trek hilang.
+        Encoding 128-d hanya dikira untuk trek yang identitinya belum disahkan.
+        Dalam mod tepi kotak Haar daripada Pi digunakan terus pada setiap frame (tiada HOG).
+        Wajah yang gagal gerbang kualiti tidak di-encode pada frame ini (dicuba semula kemudian).
+        """
+        self.apply_pending_roster()
+        self._detect_ms, boxes = None, None
+        if self.EDGE_MODE and self._edge_boxes is not None:
+            boxes = self._edge_boxes
+        elif self.tracker.needs_detection():
+            t0 = time.perf_counter()
+            boxes = get_detector(self.DETECTION_MODEL).detect(rgb_small_frame)
+            self._detect_ms = (time.perf_counter() - t0) * 1000
+            STAGE["detect"].observe(self._detect_ms / 1000); FACES["dikesan"].inc(len(boxes))
+        if boxes is not None:
+            self.tracker.update(boxes); self._face_heights = [b[2] - b[0] for b in boxes]
+        else:
+            self.tracker.tick(); self._face_heights = []
+        tracks = self.tracker.active_tracks()
+        pending = [t for t in tracks if not t.confirmed]
+        if pending and self.QUALITY_GATE:
+            pending = [t for t in pending if self.quality_gate.check(rgb_small_frame, t.box, t.landmarks) is None]
+        if pending:
+            with STAGE["encode"].time(): encodings = face_recognition.face_encodings(rgb_small_frame, [t.box for t in pending])
+            for track, (info, _) in zip(pending, self.match_encodings(encodings)):
+                track.observe_match(info, self.tracker.confirm_hits)
+        return self.apply_liveness(tracks, rgb_small_frame)
+
+    def analyze_frame(self, frame):
+        """Mod biasa: analisis satu frame di bawah kawalan gabenor (langkauan frame + pemerhatian masa)."""
+        self._frame_index += 1
+        governor = self.governor
+        if governor is not None and self._frame_index % governor.skip:
+            return self._last_detections   # Frame dilangkau: papar keputusan terakhir
+        t0 = time.perf_counter()
+        detections = self.analyze_tracked(self.prepare_frame(frame))
+        if governor is not None:
+            frame_ms = (time.perf_counter() - t0) * 1000
+            decision = governor.observe(frame_ms, self._detect_ms, self._face_heights)
+            if decision and decision["skala"] != decision["skala_lama"]:
+                self.tracker.rescale(decision["skala"] / decision["skala_lama"])
+                self.DETECTION_SCALE = decision["skala"]
+            self.tracker.detect_every = governor.detect_every
+        self._last_detections = detections
+        return detections
+
+    def apply_liveness(self, tracks, rgb_small_frame):
+        """
+        Semakan kelipan mata + rekod kehadiran. Pulangkan senarai (lokasi, nama, warna, ear) untuk dilukis.
+        Landmark hanya diminta untuk wajah yang dikenali tetapi belum hadir, dan EAR dikira sekali gus.
+        """
+        needs = [t for t in tracks if t.info is not None and t.info['id'] not in self.session_present_ids]
+        ears = {}
+        if needs:
+            with STAGE["landmarks"].time(): landmarks_list = face_recognition.face_landmarks(rgb_small_frame, [t.box for t in needs])
+            values = eye_aspect_ratios(landmarks_list)
+            # Kunci termasuk id pelajar supaya pertukaran identiti trek bermula dengan keadaan kelipan baharu
+            blinked = self.blink_detector.update([(t.id, t.info['id']) for t in needs], values)
+            for track, landmarks, ear, done in zip(needs, landmarks_list, values.tolist(), blinked):
+                track.landmarks, ears[track.id] = landmarks, ear
+                if done:
+                    print(f"✅ Kelipan disahkan untuk {track.info['nama']}!"); BLINKS.inc(); self.record_attendance(track.info['id'])
+        self.blink_detector.prune((t.id, t.info['id']) for t in self.tracker.tracks if t.info is not None)
+        detections = []
+        for track in tracks:
+            info = track.info
+            if info is None:
+                name, color = "Tidak Dikenali", self.COLOR_BOX_UNKNOWN
+            elif track.id in ears and info['id'] not in self.session_present_ids:
+                name, color = f"{info['nama']} (Sila Kelip Mata)", self.COLOR_BOX_LIVENESS
+            else:
+                name, color = info['nama'], self.COLOR_BOX_PRESENT
+            detections.append((track.box, name, color, ears.get(track.id) if color == self.COLOR_BOX_LIVENESS else None))
+        return detections
+
+    def setup_window(self):
+        if self.HEADLESS: return
         cv2.namedWindow(self.WINDOW_NAME, cv2.WINDOW_NORMAL); cv2.resizeWindow(self.WINDOW_NAME, self.TOTAL_SCREEN_WIDTH, self.SCREEN_HEIGHT)
-        cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN); print("🟢 Memulakan pengecaman...")
-        detection_scale = 0.25; display_h = self.SCREEN_HEIGHT - self.PANEL_INFO_HEIGHT; scale_x, scale_y = None, None
+        cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+    def render_frame(self, frame, detections):
+        display_h = self.SCREEN_HEIGHT - self.PANEL_INFO_HEIGHT; h, w = frame.shape[:2]
+        scale_x, scale_y = self.VIDEO_AREA_WIDTH / w, display_h / h; detection_scale = self.detection_resize
+        if self._canvas is None:
+            # Canvas tunggal; kawasan video, panel bawah dan panel sisi tidak bertindih
+            self._canvas = np.zeros((self.SCREEN_HEIGHT, self.TOTAL_SCREEN_WIDTH, 3), dtype=np.uint8)
+            self._video_roi = self._canvas[:display_h, :self.VIDEO_AREA_WIDTH]
+        canvas, video = self._canvas, self._video_roi
+        if (w, h) == (self.VIDEO_AREA_WIDTH, display_h): video[:] = frame
+        else: cv2.resize(frame, (self.VIDEO_AREA_WIDTH, display_h), dst=video)
+        # Kotak dilukis pada paparan (view) kawasan video supaya terpotong dan tidak mengotorkan panel
+        for (top, right, bottom, left), name, color, ear_to_display in detections:
+            l, t, r, b = int(left / detection_scale * scale_x), int(top / detection_scale * scale_y), int(right / detection_scale * scale_x), int(bottom / detection_scale * scale_y)
+            cv2.rectangle(video, (l, t), (r, b), color, 2); cv2.rectangle(video, (l, b - 25), (r, b), color, cv2.FILLED)
+            cv2.putText(video, name, (l + 6, b - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+            
+            # [PERUBAHAN] Tambah paparan nilai EAR jika ia sedang dikira
+            if ear_to_display is not None:
+                cv2.putText(video, f"EAR: {ear_to_display:.2f}", (l, t - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+        # Panel hanya berubah apabila kehadiran ditanda/disimpan atau roster ditukar
+        keys = {"bawah": tuple((s['id'], s['disimpan']) for s in self.scanned_students_list),
+                "sisi": (id(self.known_face_info_all), len(self.known_face_info_all), len(self.session_present_ids))}
+        if keys["bawah"] != self._panel_keys.get("bawah"): self.draw_detected_students_panel(canvas)
+        if keys["sisi"] != self._panel_keys.get("sisi"): self.draw_full_student_list_panel(canvas)
+        self._panel_keys = keys
+        return canvas
+
+    def present_frame(self, frame, detections):
+        """Paparkan pada kadar DISPLAY_FPS sahaja (frame lain hanya dianalisis). Pulangkan False untuk berhenti."""
+        self.frames_seen += 1
+        now = time.monotonic()
+        if self.HEADLESS:
+            if now - self._last_status_log >= self.STATUS_LOG_INTERVAL:
+                self._last_status_log = now
+                print(f"🧾 {self.frames_seen} frame dianalisis, {len(self.session_present_ids)}/{len(self.known_face_info_all)} hadir.")
+            return True
+        if now - self._last_display < 1.0 / self.DISPLAY_FPS: return True
+        self._last_display = now; self.frames_displayed += 1
+        with STAGE["render"].time(): canvas = self.render_frame(frame, detections)
+        return self.show_and_poll_keys(canvas)
+
+    def show_and_poll_keys(self, canvas):
+        """Paparkan canvas dan proses kekunci. Pulangkan False jika pengguna menekan 'q'."""
+        if self.HEADLESS: return True
+        if canvas is not None: cv2.imshow(self.WINDOW_NAME, canvas)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'): return False
+        elif key == ord('f'): cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+        elif key == ord('n'): cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_NORMAL)
+        return True
+
+    def print_summary(self):
+        print("\n📊 ===== RUMUSAN SESI KEHADIRAN =====")
+        if self.session_present_ids:
+            print(f"Jumlah hadir: {len(self.session_present_ids)}/{len(self.known_face_info_all)}")
+            for student in reversed(self.scanned_students_list): print(f"- {student['nama']} ({student['no_matrik']}) @ {student['timestamp']}")
+        else: print("❗ Tiada kehadiran direkodkan.")
+
+    def run(self, pipelined=False, workers=None, use_processes=False):
+        self.load_known_faces_from_db()
+        if not len(self.matcher): print("❌ KRITIKAL: Tiada data wajah sah."); return
+        try: get_detector(self.DETECTION_MODEL)   # Muatkan model sekarang supaya fail model yang tiada dilaporkan lebih awal
+        except (OSError, RuntimeError, ValueError, cv2.error) as e: print(f"❌ Pengesan '{self.DETECTION_MODEL}' gagal dimuatkan: {e}"); return
+        stream = self.connect_stream()
+        if stream is None: return
+        self.start_background_services(); self.setup_window(); print("🟢 Memulakan pengecaman...")
+        try:
+            if self.METRICS_PORT and metrics.serve(self.METRICS_PORT): print(f"📈 Metrik: http://127.0.0.1:{self.METRICS_PORT}/metrics")
+        except OSError as e: print(f"⚠️ Pelayan metrik tidak dapat dimulakan: {e}")
         try:
-            for chunk in stream.iter_content(chunk_size=4096):
-                byte_data += chunk; start = byte_data.find(b'\xff\xd8'); end = byte_data.find(b'\xff\xd9')
-                if start == -1 or end == -1 or end <= start: continue
-                jpg = byte_data[start:end+2]; byte_data = byte_data[end+2:]
-                try: frame = cv2.cvtColor(np.array(Image.open(BytesIO(jpg))), cv2.COLOR_RGB2BGR)
-                except Exception: continue
-                if scale_x is None: h, w, _ = frame.shape; scale_x = self.VIDEO_AREA_WIDTH / w; scale_y = display_h / h
-                small_frame = cv2.resize(frame, (0, 0), fx=detection_scale, fy=detection_scale)
-                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-                canvas = np.zeros((self.SCREEN_HEIGHT, self.TOTAL_SCREEN_WIDTH, 3), dtype=np.uint8)
-                canvas[:display_h, :self.VIDEO_AREA_WIDTH] = cv2.resize(frame, (self.VIDEO_AREA_WIDTH, display_h))
-                face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-                face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame, face_locations)
-                current_face_keys = set(face_locations)
-                for key in list(self.face_blink_counters.keys()):
-                    if key not in current_face_keys: del self.face_blink_counters[key]
-                for (top, right, bottom, left), face_encoding, face_landmarks in zip(face_locations, face_encodings, face_landmarks_list):
-                    face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                    best_match_index = np.argmin(face_distances)
-                    name, color = "Tidak Dikenali", self.COLOR_BOX_UNKNOWN
-                    
-                    # [PERUBAHAN] Sediakan pembolehubah untuk memaparkan nilai EAR
-                    ear_to_display = None
-                    
-                    if face_distances[best_match_index] <= self.FACE_MATCHING_TOLERANCE:
-                        info = self.known_face_info_reco[best_match_index]; student_id = info['id']
-                        if student_id in self.session_present_ids:
-                            name, color = info['nama'], self.COLOR_BOX_PRESENT
-                        else:
-                            name, color = f"{info['nama']} (Sila Kelip Mata)", self.COLOR_BOX_LIVENESS
-                            ear = (self._calculate_ear(face_landmarks['left_eye']) + self._calculate_ear(face_landmarks['right_eye'])) / 2.0
-                            
-                            # [PERUBAHAN] Simpan nilai EAR untuk dipaparkan
-                            ear_to_display = ear
-                            
-                            face_key = (top, right, bottom, left)
-                            if ear < self.EAR_THRESHOLD:
-                                self.face_blink_counters[face_key] = self.face_blink_counters.get(face_key, 0) + 1
-                            else:
-                                if self.face_blink_counters.get(face_key, 0) >= self.EAR_CONSEC_FRAMES:
-                                    print(f"✅ Kelipan disahkan untuk {info['nama']}!"); self.record_attendance(student_id)
-                                self.face_blink_counters[face_key] = 0
-                                
-                    l, t, r, b = int(left / detection_scale * scale_x), int(top / detection_scale * scale_y), int(right / detection_scale * scale_x), int(bottom / detection_scale * scale_y)
-                    cv2.rectangle(canvas, (l, t), (r, b), color, 2); cv2.rectangle(canvas, (l, b - 25), (r, b), color, cv2.FILLED)
-                    cv2.putText(canvas, name, (l + 6, b - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-                    
-                    # [PERUBAHAN] Tambah paparan nilai EAR jika ia sedang dikira
-                    if ear_to_display is not None:
-                        cv2.putText(canvas, f"EAR: {ear_to_display:.2f}", (l, t - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-
-                self.draw_detected_students_panel(canvas); self.draw_full_student_list_panel(canvas); cv2.imshow(self.WINDOW_NAME, canvas)
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'): break
-                elif key == ord('f'): cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-                elif key == ord('n'): cv2.setWindowProperty(self.WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_NORMAL)
+            if pipelined:
+                RecognitionPipeline(self, analyze_faces, workers=workers, use_processes=use_processes).run(stream)
+                return
+            if self.ADAPTIVE_DETECTION:
+                self.governor = DetectionGovernor(self.DETECTION_SCALES, self.DETECTION_SCALE, target_ms=self.TARGET_FRAME_MS,
+                                                  detect_every=self.DETECT_EVERY_N_FRAMES, log_path=self.GOVERNOR_LOG_PATH)
+            for frame in self.iter_stream_frames(stream):
+                if not self.present_frame(frame, self.analyze_frame(frame)): break
+        except KeyboardInterrupt:
+            pass   # Cara biasa untuk berhenti dalam mod headless
         finally:
-            cv2.destroyAllWindows(); print("\n⏹️ Program dihentikan.")
-            print("\n📊 ===== RUMUSAN SESI KEHADIRAN =====")
-            if self.session_present_ids:
-                print(f"Jumlah hadir: {len(self.session_present_ids)}/{len(self.known_face_info_all)}")
-                for student in reversed(self.scanned_students_list): print(f"- {student['nama']} ({student['no_matrik']}) @ {student['timestamp']}")
-            else: print("❗ Tiada kehadiran direkodkan.")
+            stream.close(); self.roster_watcher.stop(); self.committer.close(); self.relay.close()
+            if not self.HEADLESS: cv2.destroyAllWindows()
+            if self.QUALITY_GATE: print("🔍 Gerbang kualiti: " + ", ".join(f"{k}={v}" for k, v in self.quality_gate.counts.items()))
+            print("📟 Relay: " + ", ".join(f"{k}={v}" for k, v in self.relay.counters.items()))
+            print(f"🖥️ Paparan: {self.frames_displayed}/{self.frames_seen} frame dipaparkan."); print("\n⏹️ Program dihentikan.")
+            self.print_summary()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sistem pengecaman wajah kehadiran")
+    parser.add_argument("--pipeline", action="store_true", help="Jalankan peringkat ingest, pengesanan dan paparan secara selari")
+    parser.add_argument("--workers", type=int, default=None, help="Bilangan pekerja pengesanan (lalai: semua teras CPU)")
+    parser.add_argument("--decode-scale", type=int, choices=[1, 2, 4, 8], default=1, help="Nyahkod frame pada resolusi dikurangkan")
+    parser.add_argument("--detect-every", type=int, default=5, help="Jalankan pengesanan wajah penuh setiap N frame (mod biasa)")
+    parser.add_argument("--detector", choices=list(DETECTORS), default=DEFAULT_DETECTOR, help="Pengesan wajah (lihat face_detectors.py)")
+    parser.add_argument("--processes", action="store_true", help="Guna process pool untuk pengesanan (bukan thread pool)")
+    parser.add_argument("--headless", action="store_true", help="Tanpa paparan (pelayan/tanpa kiosk); hentikan dengan Ctrl+C")
+    parser.add_argument("--display-fps", type=float, default=15, help="Kadar paparan maksimum (mod paparan)")
+    parser.add_argument("--target-ms", type=float, default=80.0, help="Bajet purata masa analisis setiap frame untuk gabenor (ms)")
+    parser.add_argument("--fixed-scale", action="store_true", help="Matikan gabenor: skala dan kekerapan pengesanan tetap")
+    parser.add_argument("--no-metrics", action="store_true", help="Matikan instrumentasi metrik sepenuhnya")
+    parser.add_argument("--metrics-port", type=int, default=9108, help="Port pelayan /metrics (0 = tiada pelayan)")
+    parser.add_argument("--edge", action="store_true", help="Terima keratan wajah + kotak Haar daripada /faces (rasp_stream_camera.py --edge)")
+    args = parser.parse_args()
     try:
+        if args.no_metrics: metrics.disable()
         system = AttendanceSystem()
-        system.run()
+        system.METRICS_PORT = args.metrics_port or None
+        system.HEADLESS, system.DISPLAY_FPS = args.headless, max(1.0, args.display_fps)
+        system.DECODE_SCALE, system.EDGE_MODE = args.decode_scale, args.edge
+        system.DETECTION_MODEL = args.detector
+        system.ADAPTIVE_DETECTION, system.TARGET_FRAME_MS = not args.fixed_scale, max(1.0, args.target_ms)
+        system.tracker.detect_every = system.DETECT_EVERY_N_FRAMES = max(1, args.detect_every)
+        system.run(pipelined=args.pipeline, workers=args.workers, use_processes=args.processes)
     except Exception as e:
         print("\n\n" + "="*50 + "\n    ‼️   RALAT KRITIKAL   ‼️\n" + "="*50)
         print(f"RALAT: {e}"); print("\nButiran Teknikal:"); traceback.print_exc()
-    finally: input("\nTekan Enter untuk keluar...")
+    finally:
+        if not args.headless: input("\nTekan Enter untuk keluar...")
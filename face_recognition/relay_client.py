@@ -0,0 +1,144 @@
+"""
+relay_client.py - Klien notifikasi relay ke Raspberry Pi (rasp_nrf.py /trigger-relay)
+
+- Sesi HTTP keep-alive yang kekal (tiada sambungan TCP baharu bagi setiap pelajar).
+- notify() tidak menyekat: permintaan dimasukkan ke baris gilir dan dihantar oleh thread sendiri.
+- Letusan notifikasi dalam tetingkap coalesce_window digabungkan menjadi satu RELAY_ON.
+- Cuba semula dengan backoff eksponen; pemutus litar (circuit breaker) dibuka selepas
+  beberapa kegagalan berturut-turut supaya Pi yang tidak dapat dihubungi tidak melambatkan apa-apa.
+- Kaunter: sent, coalesced, failed, rejected (ditolak semasa litar terbuka).
+
+CARA GUNA (uji dengan pelayan tiruan tempatan):
+$ python relay_client.py --stand-in
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+DEFAULT_RELAY_URL = "http://192.168.10.1:5000/trigger-relay"
+RELAY_OUTCOMES = {k: metrics.counter("dcas_relay_total", "Hasil notifikasi relay", hasil=k) for k in ("sent", "coalesced", "failed", "rejected")}
+RELAY_LATENCY = metrics.histogram("dcas_relay_permintaan_saat", "Kependaman permintaan HTTP ke relay Pi")
+
+
+class RelayClient:
+    def __init__(self, url=DEFAULT_RELAY_URL, coalesce_window=1.0, timeout=2.0, max_retries=3, backoff=0.5,
+                 failure_threshold=3, reset_timeout=30.0):
+        self.url = url
+        self.coalesce_window = coalesce_window  # Notifikasi dalam tempoh ini digabungkan (saat)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff                  # Kelewatan asas backoff (saat), digandakan setiap percubaan
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout      # Tempoh litar kekal terbuka sebelum percubaan semula (saat)
+        self.counters = {"sent": 0, "coalesced": 0, "failed": 0, "rejected": 0}
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
+        self._thread = threading.Thread(target=self._run, name="relay-client", daemon=True)
+        self._thread.start()
+
+    def _count(self, outcome):
+        self.counters[outcome] += 1; RELAY_OUTCOMES[outcome].inc()
+
+    @property
+    def circuit_open(self):
+        return time.monotonic() < self._circuit_open_until
+
+    def notify(self):
+        """Minta relay diaktifkan. Tidak pernah menyekat pemanggil."""
+        with self._cond:
+            if self.circuit_open:
+                self._count("rejected"); return False
+            if self._pending: self._count("coalesced")
+            self._pending += 1
+            self._cond.notify()
+        return True
+
+    def close(self, timeout=5):
+        with self._cond:
+            self._closed = True; self._cond.notify()
+        self._thread.join(timeout)
+        self.session.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending: return
+            # Tunggu tetingkap coalesce supaya letusan digabungkan menjadi satu permintaan
+            if not self._closed: time.sleep(self.coalesce_window)
+            with self._cond:
+                self._pending = 0
+            self._send()
+
+    def _send(self):
+        for attempt in range(self.max_retries):
+            try:
+                with RELAY_LATENCY.time(): response = self.session.get(self.url, timeout=self.timeout)
+                if response.status_code == 200:
+                    self._count("sent"); self._consecutive_failures = 0
+                    print("✅ Arahan berjaya dihantar dan diterima oleh Raspberry Pi.")
+                    return True
+                print(f"⚠️ Ralat dari server Raspberry Pi: {response.status_code} - {response.text}")
+            except requests.exceptions.RequestException as e:
+                print(f"‼️ Gagal menyambung ke Raspberry Pi (percubaan {attempt + 1}/{self.max_retries}): {e}")
+            if attempt + 1 < self.max_retries and not self._closed:
+                time.sleep(self.backoff * (2 ** attempt))
+        self._count("failed"); self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self._circuit_open_until = time.monotonic() + self.reset_timeout
+            print(f"⛔ Litar relay dibuka selama {self.reset_timeout:.0f} saat selepas {self._consecutive_failures} kegagalan berturut-turut.")
+        return False
+
+
+def _start_stand_in_server(port, fail=False):
+    """Pelayan tiruan tempatan untuk /trigger-relay yang mengira permintaan yang diterima."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # Benarkan keep-alive
+
+        def do_GET(self):
+            received.append(time.monotonic())
+            code, body = (500, b'{"status": "error"}') if fail else (200, b'{"status": "success"}')
+            self.send_response(code); self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Klien relay Raspberry Pi")
+    parser.add_argument("--url", default=DEFAULT_RELAY_URL)
+    parser.add_argument("--stand-in", action="store_true", help="Uji terhadap pelayan tiruan tempatan")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--burst", type=int, default=30, help="Bilangan notifikasi serentak")
+    args = parser.parse_args()
+
+    url = args.url
+    if args.stand_in:
+        server, received = _start_stand_in_server(args.port)
+        url = f"http://127.0.0.1:{args.port}/trigger-relay"
+    client = RelayClient(url, coalesce_window=0.5)
+    for _ in range(args.burst): client.notify()
+    client.close(timeout=15)
+    print(f"📊 Kaunter: {client.counters}")
+    if args.stand_in:
+        print(f"📥 Pelayan tiruan menerima {len(received)} permintaan untuk {args.burst} notifikasi.")
+        server.shutdown()
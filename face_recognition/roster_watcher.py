@@ -0,0 +1,104 @@
+"""
+roster_watcher.py - Pengesan perubahan roster pelajar untuk muat semula galeri secara langsung
+
+Thread latar belakang memegang satu sambungan SQLite dan menyemak PRAGMA data_version
+(nilai ini berubah hanya apabila sambungan LAIN membuat commit) dan bilangan baris stor
+encoding. Hanya apabila salah satu berubah, senarai 'pelajar' dibaca dan dibandingkan dengan salinan terakhir untuk
+menghasilkan delta: pelajar ditambah, dipadam atau dikemas kini. Encoding bagi
+pelajar baharu sahaja dibaca dari stor encoding.
+
+Pelajar yang didaftar semula (EncodingStore.replace) dikesan melalui baris stor yang
+ditambah sejak semakan terakhir; mereka dihantar sebagai dipadam + ditambah supaya
+galeri menggantikan encoding lama.
+"""
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from encoding_store import EncodingStore
+from db_schema import connect
+
+
+class RosterWatcher:
+    def __init__(self, db_name, store_path, initial_infos, poll_interval=2.0, on_change=None):
+        self.db_name = db_name
+        self.store_path = store_path
+        self.poll_interval = poll_interval
+        self.on_change = on_change       # Panggilan balik(delta) dari thread pemerhati
+        self.snapshot = {info["id"]: (info["nama"], info["no_matrik"]) for info in initial_infos}
+        self.reloads = 0
+        self._store_rows = self._store_count()
+        self._conn = None
+        self._data_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="roster-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(self.poll_interval + 1)
+
+    def _run(self):
+        self._conn = connect(self.db_name)
+        try:
+            while not self._stop.wait(self.poll_interval):
+                try:
+                    delta = self.poll()
+                    if delta and self.on_change: self.on_change(delta)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Ralat semasa menyemak perubahan roster: {e}")
+        finally:
+            self._conn.close()
+
+    def poll(self):
+        """Pulangkan delta roster jika ada perubahan sejak semakan terakhir, atau None."""
+        if self._conn is None: self._conn = connect(self.db_name)
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version and self._store_count() == self._store_rows: return None
+        self._data_version = version
+        rows = self._conn.execute("SELECT id_pelajar, nama_pelajar, no_matrik, path_encoding_wajah FROM pelajar").fetchall()
+        current = {sid: (nama, no_matrik or "N/A") for sid, nama, no_matrik, _ in rows}
+        paths = {sid: path for sid, _, _, path in rows}
+        added_ids = [sid for sid in current if sid not in self.snapshot]
+        removed_ids = [sid for sid in self.snapshot if sid not in current]
+        updated_ids = [sid for sid in current if sid in self.snapshot and current[sid] != self.snapshot[sid]]
+        reencoded_ids = [sid for sid in self._appended_store_ids() if sid in self.snapshot and sid in current]
+        self.snapshot = current
+        if not (added_ids or removed_ids or updated_ids or reencoded_ids):
+            return None   # Perubahan pada jadual lain (cth. 'kehadiran')
+        info = lambda sid: {"id": sid, "nama": current[sid][0], "no_matrik": current[sid][1]}
+        encodings = self._load_encodings(added_ids + reencoded_ids, paths)
+        reencoded_ids = [sid for sid in reencoded_ids if sid in encodings]
+        updated_ids = [sid for sid in updated_ids if sid not in reencoded_ids]
+        self.reloads += 1
+        print(f"🔁 Roster berubah: +{len(added_ids)} -{len(removed_ids)} ~{len(updated_ids)} pelajar, "
+              f"{len(reencoded_ids)} encoding dikemas kini.")
+        return {"added": [info(sid) for sid in added_ids + reencoded_ids], "removed": removed_ids + reencoded_ids,
+                "updated": [info(sid) for sid in updated_ids], "encodings": encodings}
+
+    def _store_count(self):
+        # Hanya pengepala 64 bait dibaca; daftar semula menukar stor tanpa mengubah jadual 'pelajar'
+        return EncodingStore(self.store_path).count if os.path.exists(self.store_path) else 0
+
+    def _appended_store_ids(self):
+        if not os.path.exists(self.store_path): return set()
+        rows = self._store_rows
+        self._store_rows, ids = EncodingStore(self.store_path).ids_since(rows)
+        return ids if self._store_rows >= rows else set()   # Stor dipadatkan: indeks baris bermula semula
+
+    def _load_encodings(self, student_ids, paths):
+        if not student_ids: return {}
+        encodings = EncodingStore(self.store_path).lookup(student_ids) if os.path.exists(self.store_path) else {}
+        for sid in student_ids:
+            path = paths.get(sid)
+            if sid not in encodings and path and path.endswith('.npy') and os.path.exists(path):
+                try: encodings[sid] = np.load(path).astype(np.float32)
+                except Exception as e: print(f"⚠️ Gagal memuatkan encoding untuk pelajar {sid}: {e}")
+        return encodings
@@ -17,10 +17,19 @@ http://<Alamat IP Raspberry Pi Anda>:5000/trigger-relay
 # Import pustaka yang diperlukan
 from RF24 import RF24, RF24_PA_LOW, RF24_250KBPS
 from flask import Flask, jsonify, request
+import os
+import sys
 import time
 import socket
 import logging # Untuk logging yang lebih baik
 
+# metrics.py (dari folder face_recognition/) adalah pilihan: salin ke Pi bersama skrip ini untuk /metrics
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'face_recognition'))
+try:
+    import metrics
+except ImportError:
+    metrics = None
+
 # Konfigurasi Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -107,6 +116,8 @@ class NRF24L01Handler:
 
 app = Flask(__name__)
 nrf_handler = NRF24L01Handler() # Inisialisasi NRF handler
+if metrics:
+    metrics.instrument_flask(app)   # Kependaman /trigger-relay + /metrics (matikan dengan DCAS_METRICS=0)
 
 # Fungsi untuk mendapatkan alamat IP tempatan Raspberry Pi
 def get_ip_address():
@@ -140,6 +151,7 @@ def trigger_relay_endpoint():
         logger.info("GET diterima, hantar RELAY_ON")
 
     success = nrf_handler.send_signal(message_to_send)
+    if metrics: metrics.counter("dcas_nrf_hantar_total", "Penghantaran isyarat NRF ke Arduino", hasil="berjaya" if success else "gagal").inc()
 
     if success:
         return jsonify({"status": "success", "message": f"NRF signal '{message_to_send}' sent."}), 200
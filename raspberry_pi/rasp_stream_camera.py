@@ -1,45 +1,351 @@
-from flask import Flask, Response
+"""
+rasp_stream_camera.py - Pelayan stream MJPEG kamera Raspberry Pi (satu tangkapan, ramai penonton)
+
+Satu thread tangkapan membuka kamera SEKALI, meng-encode setiap frame ke JPEG SEKALI dan
+menyimpannya dalam slot "frame terkini" yang dikongsi. Setiap klien HTTP /video hanya
+membaca slot itu: klien yang perlahan terus melompat ke frame terbaharu (frame yang
+terlepas dikira sebagai 'dibuang') dan tidak pernah membina baris gilir.
+
+Mod tepi (--edge): satu thread penapis menjalankan pengesan murah pada Pi — perbezaan
+gerakan pada frame kelabu kecil, dan Haar cascade (seperti capture_images.py) hanya apabila
+ada gerakan atau wajah baru dilihat. /faces hanya menerbitkan keratan ROI yang mengandungi
+calon wajah, dengan metadata dalam pengepala setiap bahagian:
+    X-Frame-Size: 640x480          saiz frame penuh
+    X-Roi: x,y,w,h                 kedudukan keratan dalam frame penuh
+    X-Faces: x,y,w,h;x,y,w,h       kotak wajah Haar (koordinat frame penuh, kosong = tiada)
+Tanpa wajah, lakaran kecil seluruh frame dihantar setiap HEARTBEAT_INTERVAL saat sahaja
+supaya paparan Mini PC tidak beku. Dalam mod tepi frame /video hanya di-encode apabila
+ada klien /video.
+
+Titik akhir:
+    /video   stream MJPEG (multipart/x-mixed-replace; boundary=frame)
+    /faces   stream MJPEG keratan wajah + metadata (mod tepi sahaja)
+    /stats   statistik JSON: kadar tangkapan, masa encode, penapis tepi dan frame dihantar/dibuang setiap klien
+
+CARA GUNA:
+$ python3 rasp_stream_camera.py --width 640 --height 480 --fps 15 --quality 80
+$ python3 rasp_stream_camera.py --edge      # Mini PC: python recognize_faces.py --edge
+"""
+
+import argparse
+import itertools
+import os
+import threading
+import time
+
 import cv2
 import numpy as np
+from flask import Flask, Response, abort, jsonify, request
 
 app = Flask(__name__)
 
-def create_error_frame():
+
+class Config:
+    CAMERA_INDEX = 0
+    WIDTH, HEIGHT = 640, 480
+    FPS = 15
+    JPEG_QUALITY = 80
+    REOPEN_DELAY = 3.0      # Cuba buka semula kamera selepas N saat jika gagal
+    FLASK_HOST = '0.0.0.0'
+    FLASK_PORT = 8000
+    # Mod tepi (penapis wajah pada Pi)
+    EDGE_MODE = False
+    HAAR_CASCADE_PATH = 'haarcascade_frontalface_default.xml'
+    EDGE_DETECT_WIDTH = 320        # Lebar frame kelabu untuk gerakan + Haar
+    MOTION_THRESHOLD = 0.01        # Pecahan piksel berubah untuk dianggap ada gerakan
+    FACE_HOLD = 1.0                # Teruskan Haar selama N saat selepas wajah terakhir dilihat
+    FORCE_DETECT_INTERVAL = 2.0    # Haar sekurang-kurangnya setiap N saat (wajah yang tidak bergerak)
+    MIN_FACE_SIZE = 40             # Saiz wajah minimum (piksel frame penuh)
+    ROI_MARGIN = 0.3               # Margin sekeliling wajah dalam keratan (pecahan saiz wajah)
+    HEARTBEAT_INTERVAL = 1.0       # Lakaran kecil apabila tiada wajah (saat)
+    HEARTBEAT_SCALE = 0.25
+
+
+def create_error_frame(width=640, height=480, quality=80):
     # Cipta imej hitam sebagai placeholder ralat
-    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
     # Tulis teks ralat pada imej
-    cv2.putText(frame, "Kamera Gagal Dibuka", (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    ret, buffer = cv2.imencode('.jpg', frame)
+    cv2.putText(frame, "Kamera Gagal Dibuka", (50, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
     return buffer.tobytes()
 
-def gen_frames():
-    cap = cv2.VideoCapture(0)
 
-    if not cap.isOpened():
-        print("❌ Kamera gagal dibuka")
-        # Hantar satu frame ralat dan berhenti
-        error_frame = create_error_frame()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + error_frame + b'\r\n')
-        return
+class FrameSlot:
+    """Slot 'JPEG terkini' yang dikongsi oleh semua klien satu titik akhir."""
+
+    def __init__(self, stop_event):
+        self.seq = 0                 # Nombor bahagian terkini dalam slot
+        self.jpeg = None             # Bait JPEG terkini (dikongsi oleh semua klien)
+        self.headers = b''           # Pengepala tambahan bahagian terkini (cth. X-Roi)
+        self.clients = {}            # id klien -> statistik
+        self._client_ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._stop = stop_event
+
+    def publish(self, jpeg, headers=b''):
+        with self._cond:
+            self.seq += 1; self.jpeg, self.headers = jpeg, headers
+            self._cond.notify_all()
+
+    def clear(self):
+        # Buang JPEG lapuk supaya klien baharu tidak menerima frame lama
+        with self._cond: self.jpeg = None
+
+    def subscribe(self, remote_addr=None):
+        """Penjana bahagian MJPEG untuk satu klien: sentiasa bahagian terbaharu, tanpa baris gilir."""
+        client_id = next(self._client_ids)
+        stats = {"id": client_id, "alamat": remote_addr, "disambung": time.strftime('%Y-%m-%d %H:%M:%S'),
+                 "dihantar": 0, "dibuang": 0}
+        with self._cond:
+            self.clients[client_id] = stats
+            last = self.seq - 1 if self.jpeg is not None else self.seq
+        try:
+            while not self._stop.is_set():
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self.seq > last and self.jpeg is not None, timeout=5):
+                        continue
+                    seq, jpeg, headers = self.seq, self.jpeg, self.headers
+                if last and seq - last > 1: stats["dibuang"] += seq - last - 1
+                last = seq
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n' + headers +
+                       b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+                stats["dihantar"] += 1
+        finally:
+            with self._cond: self.clients.pop(client_id, None)
+
+    def client_stats(self):
+        with self._cond:
+            return [dict(c) for c in self.clients.values()]
+
+
+class FrameBroadcaster:
+    def __init__(self, camera_index=0, width=640, height=480, fps=15, quality=80, encode_on_demand=False):
+        self.camera_index = camera_index
+        self.width, self.height, self.fps, self.quality = width, height, fps, quality
+        self.encode_on_demand = encode_on_demand   # Mod tepi: encode /video hanya jika ada klien
+        self.camera_ok = False
+        self.frames_captured = self.frames_encoded = 0
+        self.encode_time = 0.0
+        self.started_at = time.monotonic()
+        self._stop = threading.Event()
+        self.video = FrameSlot(self._stop)
+        self.raw_seq, self.raw_frame = 0, None      # Frame BGR terkini untuk penapis tepi
+        self._raw_cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._capture_loop, name="tangkapan-kamera", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout=5)
+
+    def wait_raw(self, after_seq, timeout=1.0):
+        """Tunggu frame mentah lebih baharu daripada after_seq. Pulangkan (seq, frame) atau (after_seq, None)."""
+        with self._raw_cond:
+            if not self._raw_cond.wait_for(lambda: self.raw_seq > after_seq, timeout=timeout):
+                return after_seq, None
+            return self.raw_seq, self.raw_frame
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("❌ Gagal baca frame")
-            break
+    def _open_camera(self):
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            return None
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # Elak frame lama tertunggak dalam pemacu
+        return cap
 
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
+    def _capture_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while not self._stop.is_set():
+            cap = self._open_camera()
+            if cap is None:
+                print("❌ Kamera gagal dibuka")
+                self.camera_ok = False
+                self.video.publish(create_error_frame(self.width, self.height, self.quality))
+                self._stop.wait(Config.REOPEN_DELAY); continue
+            self.camera_ok = True
+            print(f"✅ Kamera dibuka ({self.width}x{self.height} @ {self.fps} fps, kualiti {self.quality})")
+            try:
+                while not self._stop.is_set():
+                    ret, frame = cap.read()
+                    if not ret:
+                        print("❌ Gagal baca frame"); break
+                    if frame.shape[1] != self.width or frame.shape[0] != self.height:
+                        frame = cv2.resize(frame, (self.width, self.height))   # Kamera tidak menyokong resolusi diminta
+                    self.frames_captured += 1
+                    with self._raw_cond:
+                        self.raw_seq += 1; self.raw_frame = frame
+                        self._raw_cond.notify_all()
+                    if self.encode_on_demand and not self.video.clients:
+                        self.video.clear(); continue
+                    t0 = time.perf_counter()
+                    ret, buffer = cv2.imencode('.jpg', frame, params)
+                    self.encode_time += time.perf_counter() - t0
+                    if ret:
+                        self.frames_encoded += 1
+                        self.video.publish(buffer.tobytes())
+            finally:
+                cap.release(); self.camera_ok = False
+            self._stop.wait(Config.REOPEN_DELAY)
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    def subscribe(self, remote_addr=None):
+        return self.video.subscribe(remote_addr)
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        jpeg = self.video.jpeg
+        return {"kamera_ok": self.camera_ok, "resolusi": f"{self.width}x{self.height}", "fps_sasaran": self.fps,
+                "kualiti_jpeg": self.quality, "frame_ditangkap": self.frames_captured, "frame_diencode": self.frames_encoded,
+                "fps_tangkapan": round(self.frames_captured / elapsed, 2),
+                "purata_encode_ms": round(self.encode_time / self.frames_encoded * 1000, 2) if self.frames_encoded else None,
+                "saiz_jpeg_terkini": len(jpeg) if jpeg else 0, "klien": self.video.client_stats()}
+
+
+class EdgeFilter:
+    """Penapis wajah pada Pi: gerakan -> Haar -> terbitkan keratan ROI ke slot /faces."""
+
+    def __init__(self, broadcaster, cascade_path=None, quality=80):
+        cascade_path = cascade_path or Config.HAAR_CASCADE_PATH
+        if not os.path.exists(cascade_path) and hasattr(cv2, 'data'):
+            cascade_path = os.path.join(cv2.data.haarcascades, os.path.basename(cascade_path))
+        self.detector = cv2.CascadeClassifier(cascade_path)
+        if self.detector.empty():
+            raise FileNotFoundError(f"Fail Haar cascade '{cascade_path}' tidak ditemui.")
+        self.broadcaster = broadcaster
+        self.quality = quality
+        self.slot = FrameSlot(broadcaster._stop)
+        self.frames_checked = self.motion_frames = self.haar_runs = 0
+        self.parts_faces = self.heartbeats = 0
+        self.bytes_published = 0
+        self.haar_time = 0.0
+        self._background = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._filter_loop, name="penapis-tepi", daemon=True)
+        self._thread.start()
+        return self
+
+    def _motion(self, gray):
+        # Pecahan piksel yang berbeza daripada latar belakang purata bergerak
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        if self._background is None:
+            self._background = blurred.astype(np.float32)
+            return 1.0
+        diff = cv2.absdiff(blurred, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(blurred, self._background, 0.1)
+        return np.count_nonzero(diff > 25) / diff.size
+
+    def _filter_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        seq, last_face_at, last_haar_at, last_heartbeat = 0, 0.0, 0.0, 0.0
+        while not self.broadcaster._stop.is_set():
+            seq, frame = self.broadcaster.wait_raw(seq)
+            if frame is None: continue
+            self.frames_checked += 1
+            height, width = frame.shape[:2]
+            scale = Config.EDGE_DETECT_WIDTH / width
+            small = cv2.resize(frame, (Config.EDGE_DETECT_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            now = time.monotonic()
+            moving = bool(self._motion(gray) >= Config.MOTION_THRESHOLD)
+            if moving: self.motion_frames += 1
+            faces = ()
+            if moving or now - last_face_at < Config.FACE_HOLD or now - last_haar_at >= Config.FORCE_DETECT_INTERVAL:
+                t0 = time.perf_counter()
+                min_size = max(12, int(Config.MIN_FACE_SIZE * scale))
+                faces = self.detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+                self.haar_time += time.perf_counter() - t0; self.haar_runs += 1; last_haar_at = now
+            if len(faces):
+                last_face_at = now
+                boxes = [tuple(int(round(v / scale)) for v in face) for face in faces]
+                x0, y0, x1, y1 = width, height, 0, 0
+                for x, y, w, h in boxes:
+                    m = int(Config.ROI_MARGIN * max(w, h))
+                    x0, y0 = min(x0, x - m), min(y0, y - m)
+                    x1, y1 = max(x1, x + w + m), max(y1, y + h + m)
+                x0, y0, x1, y1 = max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+                ret, buffer = cv2.imencode('.jpg', frame[y0:y1, x0:x1], params)
+                faces_header = ";".join(",".join(map(str, box)) for box in boxes)
+                self.parts_faces += 1
+            elif now - last_heartbeat >= Config.HEARTBEAT_INTERVAL:
+                x0, y0, x1, y1 = 0, 0, width, height
+                thumb = cv2.resize(frame, (0, 0), fx=Config.HEARTBEAT_SCALE, fy=Config.HEARTBEAT_SCALE, interpolation=cv2.INTER_AREA)
+                ret, buffer = cv2.imencode('.jpg', thumb, params)
+                faces_header = ""
+                self.heartbeats += 1; last_heartbeat = now
+            else:
+                continue
+            if not ret: continue
+            jpeg = buffer.tobytes()
+            self.bytes_published += len(jpeg)
+            self.slot.publish(jpeg, (f"X-Frame-Size: {width}x{height}\r\n"
+                                     f"X-Roi: {x0},{y0},{x1 - x0},{y1 - y0}\r\n"
+                                     f"X-Faces: {faces_header}\r\n").encode())
+
+    def stats(self):
+        return {"frame_disemak": self.frames_checked, "frame_bergerak": self.motion_frames, "larian_haar": self.haar_runs,
+                "purata_haar_ms": round(self.haar_time / self.haar_runs * 1000, 2) if self.haar_runs else None,
+                "bahagian_wajah": self.parts_faces, "degupan": self.heartbeats,
+                "bait_diterbitkan": self.bytes_published, "klien": self.slot.client_stats()}
+
+
+broadcaster = None
+edge_filter = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    global broadcaster, edge_filter
+    with _broadcaster_lock:
+        if broadcaster is None:
+            broadcaster = FrameBroadcaster(Config.CAMERA_INDEX, Config.WIDTH, Config.HEIGHT, Config.FPS, Config.JPEG_QUALITY,
+                                           encode_on_demand=Config.EDGE_MODE).start()
+            if Config.EDGE_MODE:
+                edge_filter = EdgeFilter(broadcaster, quality=Config.JPEG_QUALITY).start()
+        return broadcaster
 
-    cap.release()
 
 @app.route('/video')
 def video():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(get_broadcaster().subscribe(request.remote_addr), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route('/faces')
+def faces():
+    get_broadcaster()
+    if edge_filter is None: abort(404, description="Mod tepi tidak diaktifkan (jalankan dengan --edge).")
+    return Response(edge_filter.slot.subscribe(request.remote_addr), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route('/stats')
+def stats():
+    data = get_broadcaster().stats()
+    if edge_filter is not None: data["tepi"] = edge_filter.stats()
+    return jsonify(data)
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    parser = argparse.ArgumentParser(description="Pelayan stream MJPEG kamera Raspberry Pi")
+    parser.add_argument("--camera", type=int, default=Config.CAMERA_INDEX)
+    parser.add_argument("--width", type=int, default=Config.WIDTH)
+    parser.add_argument("--height", type=int, default=Config.HEIGHT)
+    parser.add_argument("--fps", type=int, default=Config.FPS)
+    parser.add_argument("--quality", type=int, default=Config.JPEG_QUALITY, help="Kualiti JPEG (1-100)")
+    parser.add_argument("--port", type=int, default=Config.FLASK_PORT)
+    parser.add_argument("--edge", action="store_true", help="Aktifkan penapis wajah pada Pi dan titik akhir /faces")
+    parser.add_argument("--cascade", default=Config.HAAR_CASCADE_PATH, help="Fail Haar cascade untuk mod tepi")
+    args = parser.parse_args()
+    Config.CAMERA_INDEX, Config.WIDTH, Config.HEIGHT = args.camera, args.width, args.height
+    Config.FPS, Config.JPEG_QUALITY = args.fps, max(1, min(100, args.quality))
+    Config.EDGE_MODE, Config.HAAR_CASCADE_PATH = args.edge, args.cascade
+
+    get_broadcaster()   # Mula tangkapan sekarang supaya klien pertama tidak menunggu kamera dibuka
+    # Tiada reloader: proses kedua akan cuba membuka kamera yang sama
+    app.run(host=Config.FLASK_HOST, port=args.port, threaded=True, use_reloader=False)